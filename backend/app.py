@@ -1,5 +1,5 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response
 from flask_cors import CORS
 import sys
 import os
@@ -10,7 +10,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
     from rag_service import RAGService
     from gemini_service import GeminiService  
-    from create_missing_embeddings import EmbeddingCreator, load_db_config
+    from create_missing_embeddings import EmbeddingCreator, load_db_config, EMBEDDING_TABLES
+    from embedding_jobs import EmbeddingJobManager
+    from model_registry import warm_up, warm_up_in_background, loaded_models
+    from db_pool import all_pool_stats
+    from risk_store import RiskRefreshWorker
+    from response_cache import ResponseCache, InvalidationListener, publish_invalidation
 except ImportError as e:
     print(f"❌ Import hatası: {e}")
     print("Ana dizindeki Python dosyalarına erişilemiyor.")
@@ -50,6 +55,9 @@ app.json.default = json_serializer
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# /api/tables/stats, /api/brands ve /api/dashboard/sales-data yanıt önbelleği
+response_cache = ResponseCache()
+
 # Servisleri başlat
 try:
     rag_service = RAGService()
@@ -58,6 +66,8 @@ try:
     # Veritabanı konfigürasyonunu yükle
     db_config = load_db_config()
     embedding_creator = EmbeddingCreator(db_config)
+    # Embedding yazıldığında istatistik yanıtları tüm worker'larda eskir
+    embedding_jobs = EmbeddingJobManager(embedding_creator, on_write=lambda table: invalidate_caches())
     
     logger.info("✅ Tüm servisler başlatıldı")
 except Exception as e:
@@ -65,6 +75,161 @@ except Exception as e:
     rag_service = None
     gemini_service = None
     embedding_creator = None
+    embedding_jobs = None
+
+def apply_invalidation(key=None):
+    """Bu süreçteki önbellekleri düşür (tümü temizlenirken dış DDL'e karşı şema kataloğu dahil)"""
+    response_cache.invalidate(key)
+    if key is None and rag_service:
+        rag_service.schema_catalog.invalidate()
+
+def invalidate_caches(key=None):
+    """Önbellekleri bu süreçte düşür ve diğer worker'lara yayınla"""
+    apply_invalidation(key)
+    if not embedding_creator:
+        return
+    try:
+        publish_invalidation(embedding_creator.db_pool, key)
+    except Exception as e:
+        # Yayın başarısızsa diğer worker'lar TTL dolunca tazelenir
+        logger.warning(f"⚠️ Önbellek geçersiz kılma yayınlanamadı: {e}")
+
+# Diğer worker'ların geçersiz kılmaları (CACHE_INVALIDATION_BROADCAST=false: sadece TTL)
+cache_invalidation_listener = None
+if embedding_creator and os.getenv('CACHE_INVALIDATION_BROADCAST', 'true').lower() == 'true':
+    cache_invalidation_listener = InvalidationListener(db_config, apply_invalidation)
+
+# Kalıcı risk skorlarını arka planda güncel tut (RISK_REFRESH_INTERVAL_SECONDS=0 kapatır)
+risk_refresh_worker = None
+if rag_service and float(os.getenv('RISK_REFRESH_INTERVAL_SECONDS', '600')) > 0:
+    risk_refresh_worker = RiskRefreshWorker(
+        rag_service.risk_store,
+        lambda: [t.replace('_embeddings', '') for t in rag_service.get_available_tables()]
+    )
+
+def start_background_services():
+    """Risk güncelleyici ve önbellek dinleyici thread'lerini başlat (preload modunda her worker'da fork sonrası çağrılır)"""
+    if risk_refresh_worker:
+        risk_refresh_worker.start()
+    if cache_invalidation_listener:
+        cache_invalidation_listener.start()
+
+def stop_background_services():
+    """Worker kapanırken arka plan işlerini durdur"""
+    if risk_refresh_worker:
+        risk_refresh_worker.stop()
+    if cache_invalidation_listener:
+        cache_invalidation_listener.stop()
+    if embedding_jobs:
+        embedding_jobs.shutdown()
+    if rag_service:
+        rag_service.table_fanout.shutdown()
+
+# gunicorn preload (APP_PRELOAD=true, gunicorn.conf.py): modeller fork öncesi master'da yüklenir ve
+# worker'lar arasında copy-on-write paylaşılır; thread'ler fork'a taşınamadığı için post_fork'ta başlar
+PRELOAD_MODE = os.getenv('APP_PRELOAD', 'false').lower() == 'true'
+if rag_service and os.getenv('EMBEDDING_WARMUP', 'true').lower() == 'true':
+    if PRELOAD_MODE:
+        warm_up([rag_service.embedding_service.model_name])
+    else:
+        # Sorgu modelini arka planda önceden yükle; backfill modeli ilk embedding işinde yüklenir
+        warm_up_in_background([rag_service.embedding_service.model_name])
+
+if not PRELOAD_MODE:
+    start_background_services()
+
+# Flask ve ASGI (asgi_app.py) route'larının ortak kullandığı yardımcılar
+def format_search_results(results):
+    """Arama sonuçlarını React için formatla"""
+    formatted_results = []
+    for result in results:
+        formatted_result = {
+            'id': result['product_id'],
+            'name': result['product_name'],
+            'similarity': result['similarity'],
+            'source_table': result['source_table'],
+            'combined_text': result.get('combined_text', ''),
+            'details': result.get('product_details', {}),
+            'risk_analysis': result.get('product_details', {}).get('risk_analysis', {})
+        }
+        formatted_results.append(formatted_result)
+    return formatted_results
+
+def build_analysis_context(product_details):
+    """AI ürün analizi için context"""
+    risk_data = product_details.get('risk_analysis', {})
+    
+    return f"""
+        ÜRÜN BİLGİLERİ:
+        - Ürün Adı: {product_details.get('name', 'N/A')}
+        - Fiyat: {product_details.get('price', 'N/A')} TL
+        - Rating: {product_details.get('rating', 'N/A')}/5
+        - Marka: {product_details.get('brand', 'N/A')}
+        
+        RİSK ANALİZİ:
+        - Genel Risk Skoru: {risk_data.get('overall_risk', 'N/A')}/10
+        - Fiyat Riski: {risk_data.get('price_risk', 'N/A')}/10
+        - Rating Riski: {risk_data.get('rating_risk', 'N/A')}/10
+        - Rekabet Riski: {risk_data.get('competition_risk', 'N/A')}/10
+        - Risk Seviyesi: {risk_data.get('risk_level', 'N/A')}
+        - Satıcı Önerisi: {risk_data.get('seller_recommendation', 'N/A')}
+        
+        TÜM ÜRÜN VERİLERİ:
+        {json.dumps(product_details, ensure_ascii=False, indent=2, default=json_serializer)}
+        """
+
+def build_chat_prompt(message, search_results):
+    """AI sohbet için ilgili ürünlerle zenginleştirilmiş prompt"""
+    # Context oluştur
+    context = ""
+    if search_results:
+        context = "İlgili ürünler:\n"
+        for i, result in enumerate(search_results, 1):
+            context += f"{i}. {result['product_name']} (Benzerlik: {result['similarity']:.2f})\n"
+            if 'product_details' in result:
+                details = result['product_details']
+                context += f"   - Fiyat: ₺{details.get('price', 'N/A')}\n"
+                context += f"   - Marka: {details.get('brand', 'N/A')}\n"
+                context += f"   - Rating: {details.get('rating', 'N/A')}\n\n"
+    
+    # Satıcı odaklı AI prompt
+    return f"""
+        Sen uzman bir e-ticaret satış danışmanısın. Satıcıya yönelik tavsiyelerde bulun.
+        
+        Satıcı sorusu: {message}
+
+        İlgili ürün verileri:
+        {context}
+
+        SATIÇI PERSPEKTİFİNDEN yanıt ver:
+        - Risk analizleri yap
+        - Karlılık değerlendirmesi sun
+        - Satış stratejileri öner
+        - Rekabet durumunu analiz et
+        - Fiyatlandırma tavsiyeleri ver
+        
+        Türkçe, profesyonel ve satıcı odaklı bir dille cevap ver.
+        """
+
+def cached_json_response(key, build_payload):
+    """
+    build_payload() sonucunu önbellekten ver; If-None-Match eşleşirse gövdesiz 304 döndür
+
+    build_payload içinde fırlatılan hatalar route'a iletilir; boş sonuçlar önbelleğe alınmaz.
+    """
+    def compute():
+        payload = build_payload()
+        return app.json.dumps(payload).encode('utf-8'), bool(payload.get('data'))
+
+    body, etag = response_cache.get_or_compute(key, compute)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Tarayıcı her seferinde ETag ile doğrulasın (değişmediyse 304)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -75,7 +240,37 @@ def health_check():
             'rag_service': rag_service is not None,
             'gemini_service': gemini_service is not None,
             'embedding_creator': embedding_creator is not None
-        }
+        },
+        'db_pool': all_pool_stats(),
+        'models': loaded_models(),
+        'embedding_cache': rag_service.embedding_service.cache.stats() if rag_service else None,
+        'embedding_batcher': rag_service.embedding_service.batcher.stats() if rag_service else None,
+        'response_cache': response_cache.stats(),
+        'schema_catalog': rag_service.schema_catalog.stats() if rag_service else None,
+        'table_fanout': rag_service.table_fanout.stats() if rag_service else None,
+        'risk_refresh_leader': risk_refresh_worker.is_leader if risk_refresh_worker else None,
+        'cache_invalidations_received': cache_invalidation_listener.received if cache_invalidation_listener else None
+    })
+
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_stats():
+    """Bağlantı havuzu doluluk ve bekleme metrikleri"""
+    return jsonify({
+        'success': True,
+        'data': all_pool_stats()
+    })
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def invalidate_response_cache():
+    """Ürün/embedding yazan dış süreçler (ETL, CLI backfill) için önbelleği temizle (?key=; yoksa şema kataloğu dahil)"""
+    key = request.args.get('key')
+    if key and key not in response_cache.ttls:
+        return jsonify({'error': f'Unknown cache key: {key}'}), 400
+    
+    invalidate_caches(key)
+    return jsonify({
+        'success': True,
+        'data': response_cache.stats()
     })
 
 @app.route('/api/tables/stats', methods=['GET'])
@@ -85,25 +280,28 @@ def get_table_stats():
         if not rag_service:
             return jsonify({'error': 'RAG service not available'}), 500
             
-        stats = rag_service.get_table_stats()
-        
-        # React için uygun format
-        formatted_stats = []
-        for table_name, table_data in stats.items():
-            formatted_stats.append({
-                'name': table_name.replace('_', ' ').title(),
-                'total_products': table_data['total_products'],
-                'embeddings_count': table_data['embeddings_count'],
-                'avg_price': table_data['avg_price'],
-                'avg_rating': table_data['avg_rating'],
-                'embedding_coverage': table_data['embedding_coverage']
-            })
+        def build_payload():
+            stats = rag_service.get_table_stats()
+            
+            # React için uygun format
+            formatted_stats = []
+            for table_name, table_data in stats.items():
+                formatted_stats.append({
+                    'name': table_name.replace('_', ' ').title(),
+                    'total_products': table_data['total_products'],
+                    'embeddings_count': table_data['embeddings_count'],
+                    'avg_price': table_data['avg_price'],
+                    'avg_rating': table_data['avg_rating'],
+                    'embedding_coverage': table_data['embedding_coverage']
+                })
+            
+            return {
+                'success': True,
+                'data': formatted_stats,
+                'total_tables': len(formatted_stats)
+            }
         
-        return jsonify({
-            'success': True,
-            'data': formatted_stats,
-            'total_tables': len(formatted_stats)
-        })
+        return cached_json_response('table_stats', build_payload)
         
     except Exception as e:
         logger.error(f"❌ Tablo istatistik hatası: {e}")
@@ -116,11 +314,9 @@ def get_brands():
         if not rag_service:
             return jsonify({'error': 'RAG service not available'}), 500
             
-        brands = rag_service.get_all_brands()
-        
-        return jsonify({
+        return cached_json_response('brands', lambda: {
             'success': True,
-            'data': brands
+            'data': rag_service.get_all_brands()
         })
         
     except Exception as e:
@@ -134,15 +330,67 @@ def get_sales_data():
         if not rag_service:
             return jsonify({'error': 'RAG service not available'}), 500
             
-        sales_data = rag_service.get_sales_data_for_dashboard()
+        return cached_json_response('sales_data', lambda: {
+            'success': True,
+            'data': rag_service.get_sales_data_for_dashboard()
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Satış verileri hatası: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/tables/<source_table>/risk-scores', methods=['GET'])
+def get_table_risk_scores(source_table):
+    """Bir kategorinin tüm ürünleri için toplu risk skorları (JSON ya da ?format=csv)"""
+    try:
+        if not rag_service:
+            return jsonify({'error': 'RAG service not available'}), 500
+        
+        # Tablo adı SQL'e gömüldüğü için sadece bilinen tablolar kabul edilir
+        if f"{source_table}_embeddings" not in rag_service.get_available_tables():
+            return jsonify({'error': 'Unknown table'}), 404
+        
+        scored = rag_service.score_table_risks(source_table)
+        
+        if request.args.get('format') == 'csv':
+            return app.response_class(
+                scored.to_csv(index=False),
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename={source_table}_risk_scores.csv'}
+            )
         
         return jsonify({
             'success': True,
-            'data': sales_data
+            'data': json.loads(scored.to_json(orient='records', force_ascii=False, default_handler=str)),
+            'total': len(scored)
         })
         
     except Exception as e:
-        logger.error(f"❌ Satış verileri hatası: {e}")
+        logger.error(f"❌ Toplu risk skoru hatası: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/risk/ranking', methods=['GET'])
+def get_risk_ranking():
+    """Saklı risk skorlarına göre sıralı ürünler (?source_table=&order=asc|desc&limit=)"""
+    try:
+        if not rag_service:
+            return jsonify({'error': 'RAG service not available'}), 500
+        
+        source_table = request.args.get('source_table')
+        limit = min(int(request.args.get('limit', 20)), 500)
+        descending = request.args.get('order', 'desc') != 'asc'
+        
+        ranking = rag_service.risk_store.top_risks(source_table, limit, descending)
+        
+        return jsonify({
+            'success': True,
+            'data': ranking,
+            'total': len(ranking),
+            'last_refresh': risk_refresh_worker.last_run if risk_refresh_worker else None
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Risk sıralama hatası: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/search', methods=['POST'])
@@ -162,20 +410,7 @@ def search_products():
         
         # Arama yap
         results = rag_service.search_with_filters(query, filters, limit)
-        
-        # React için format düzenle
-        formatted_results = []
-        for result in results:
-            formatted_result = {
-                'id': result['product_id'],
-                'name': result['product_name'],
-                'similarity': result['similarity'],
-                'source_table': result['source_table'],
-                'combined_text': result.get('combined_text', ''),
-                'details': result.get('product_details', {}),
-                'risk_analysis': result.get('product_details', {}).get('risk_analysis', {})
-            }
-            formatted_results.append(formatted_result)
+        formatted_results = format_search_results(results)
         
         return jsonify({
             'success': True,
@@ -237,25 +472,7 @@ def ai_analyze_product():
         
         # AI analizi için context hazırla
         risk_data = product_details.get('risk_analysis', {})
-        
-        context = f"""
-        ÜRÜN BİLGİLERİ:
-        - Ürün Adı: {product_details.get('name', 'N/A')}
-        - Fiyat: {product_details.get('price', 'N/A')} TL
-        - Rating: {product_details.get('rating', 'N/A')}/5
-        - Marka: {product_details.get('brand', 'N/A')}
-        
-        RİSK ANALİZİ:
-        - Genel Risk Skoru: {risk_data.get('overall_risk', 'N/A')}/10
-        - Fiyat Riski: {risk_data.get('price_risk', 'N/A')}/10
-        - Rating Riski: {risk_data.get('rating_risk', 'N/A')}/10
-        - Rekabet Riski: {risk_data.get('competition_risk', 'N/A')}/10
-        - Risk Seviyesi: {risk_data.get('risk_level', 'N/A')}
-        - Satıcı Önerisi: {risk_data.get('seller_recommendation', 'N/A')}
-        
-        TÜM ÜRÜN VERİLERİ:
-        {json.dumps(product_details, ensure_ascii=False, indent=2, default=json_serializer)}
-        """
+        context = build_analysis_context(product_details)
         
         # AI analizi yap
         analysis = gemini_service.analyze_product_with_context(query, context, "")
@@ -288,37 +505,7 @@ def ai_chat():
         
         # İlgili ürünleri ara
         search_results = rag_service.search_products(message, limit=5)
-        
-        # Context oluştur
-        context = ""
-        if search_results:
-            context = "İlgili ürünler:\n"
-            for i, result in enumerate(search_results, 1):
-                context += f"{i}. {result['product_name']} (Benzerlik: {result['similarity']:.2f})\n"
-                if 'product_details' in result:
-                    details = result['product_details']
-                    context += f"   - Fiyat: ₺{details.get('price', 'N/A')}\n"
-                    context += f"   - Marka: {details.get('brand', 'N/A')}\n"
-                    context += f"   - Rating: {details.get('rating', 'N/A')}\n\n"
-        
-        # Satıcı odaklı AI prompt
-        prompt = f"""
-        Sen uzman bir e-ticaret satış danışmanısın. Satıcıya yönelik tavsiyelerde bulun.
-        
-        Satıcı sorusu: {message}
-
-        İlgili ürün verileri:
-        {context}
-
-        SATIÇI PERSPEKTİFİNDEN yanıt ver:
-        - Risk analizleri yap
-        - Karlılık değerlendirmesi sun
-        - Satış stratejileri öner
-        - Rekabet durumunu analiz et
-        - Fiyatlandırma tavsiyeleri ver
-        
-        Türkçe, profesyonel ve satıcı odaklı bir dille cevap ver.
-        """
+        prompt = build_chat_prompt(message, search_results)
         
         response = gemini_service.generate_response(prompt)
         
@@ -336,23 +523,74 @@ def ai_chat():
 
 @app.route('/api/embeddings/create', methods=['POST'])
 def create_embeddings():
-    """Eksik embedding'leri oluştur"""
+    """Eksik embedding'ler için arka plan işleri başlat (tablo başına bir iş)"""
     try:
-        if not embedding_creator:
+        if not embedding_jobs:
             return jsonify({'error': 'Embedding creator not available'}), 500
-            
-        # Embedding oluşturma işlemini başlat
-        embedding_creator.create_missing_embeddings()
+        
+        data = request.get_json(silent=True) or {}
+        tables = data.get('tables') or ([data['table_name']] if data.get('table_name') else EMBEDDING_TABLES)
+        
+        invalid = [table for table in tables if table not in EMBEDDING_TABLES]
+        if invalid:
+            return jsonify({'error': f'Invalid tables: {invalid}'}), 400
+        
+        batch_size = int(data.get('batch_size', 500))
+        retry_failed = bool(data.get('retry_failed', False))
+        
+        jobs = [embedding_jobs.submit(table, batch_size, retry_failed) for table in tables]
         
         return jsonify({
             'success': True,
-            'message': 'Embedding creation process started'
-        })
+            'message': 'Embedding creation process started',
+            'jobs': [job.to_dict() for job in jobs]
+        }), 202
         
     except Exception as e:
         logger.error(f"❌ Embedding oluşturma hatası: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/embeddings/jobs', methods=['GET'])
+def list_embedding_jobs():
+    """Embedding işlerinin listesi"""
+    if not embedding_jobs:
+        return jsonify({'error': 'Embedding creator not available'}), 500
+    
+    return jsonify({
+        'success': True,
+        'data': embedding_jobs.list_jobs()
+    })
+
+@app.route('/api/embeddings/jobs/<job_id>', methods=['GET'])
+def get_embedding_job(job_id):
+    """İş durumu, ilerleme ve hız"""
+    if not embedding_jobs:
+        return jsonify({'error': 'Embedding creator not available'}), 500
+    
+    job = embedding_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'data': job.to_dict()
+    })
+
+@app.route('/api/embeddings/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_embedding_job(job_id):
+    """İşi iptal et (batch arasında durur, checkpoint korunur)"""
+    if not embedding_jobs:
+        return jsonify({'error': 'Embedding creator not available'}), 500
+    
+    job = embedding_jobs.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'data': job.to_dict()
+    })
+
 @app.route('/api/test', methods=['GET'])
 def test_services():
     """Servisleri test et"""
@@ -396,4 +634,5 @@ def test_services():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Geliştirme sunucusu; production için: gunicorn -c gunicorn.conf.py
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,218 @@
+# backend/asgi_app.py
+"""
+ASGI sunum modu
+
+Yavaş endpoint'ler (arama, ürün detayı, AI analiz/sohbet) burada async olarak
+tanımlanır: Gemini çağrıları await edilir, veritabanı/embedding işi ise bağlantı
+havuzu boyutunda sınırlı bir thread havuzunda çalışır. Böylece bir worker aynı anda
+yüzlerce isteği bekletebilir. Diğer tüm route'lar aynı Flask uygulamasından sunulur,
+yani API yüzeyi app.py ile birebir aynıdır.
+
+Çalıştırma:
+    uvicorn backend.asgi_app:app --host 0.0.0.0 --port 8000 --workers 2
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+# app.py ile aynı import yolları (ana dizin + backend)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import (app as flask_app, rag_service, gemini_service, json_serializer,
+                 format_search_results, build_analysis_context, build_chat_prompt)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Senkron RAG/DB işleri için thread sayısı; havuzdan fazlası bağlantı beklemekten öteye geçmez
+BLOCKING_THREADS = int(os.getenv('ASGI_BLOCKING_THREADS', os.getenv('DB_POOL_MAX', '10')))
+# Aynı anda uçuşta olabilecek Gemini isteği (kota koruması)
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '64'))
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_THREADS, thread_name_prefix='asgi-blocking')
+_gemini_semaphore = None
+
+
+class AppJSONResponse(JSONResponse):
+    """Flask tarafındaki json_serializer ile aynı tipleri (Decimal, numpy, tarih) destekler"""
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, default=json_serializer).encode('utf-8')
+
+
+def error(message: str, status_code: int) -> AppJSONResponse:
+    return AppJSONResponse({'error': message}, status_code=status_code)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Senkron fonksiyonu event loop'u bloklamadan sınırlı thread havuzunda çalıştır"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+
+def gemini_slot() -> asyncio.Semaphore:
+    global _gemini_semaphore
+    if _gemini_semaphore is None:
+        _gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _gemini_semaphore
+
+
+async def search_products(request: Request):
+    """Ürün arama ve risk analizi"""
+    try:
+        if not rag_service:
+            return error('RAG service not available', 500)
+
+        data = await request.json()
+        query = data.get('query', '')
+        filters = data.get('filters', {})
+        limit = data.get('limit', 10)
+
+        if not query:
+            return error('Query is required', 400)
+
+        results = await run_blocking(rag_service.search_with_filters, query, filters, limit)
+        formatted_results = format_search_results(results)
+
+        return AppJSONResponse({
+            'success': True,
+            'data': formatted_results,
+            'total': len(formatted_results),
+            'query': query,
+            'filters': filters
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Arama hatası: {e}")
+        return error(str(e), 500)
+
+
+async def get_product_details(request: Request):
+    """Ürün detaylarını getir"""
+    try:
+        if not rag_service:
+            return error('RAG service not available', 500)
+
+        product_id = request.path_params['product_id']
+        source_table = request.query_params.get('source_table')
+        if not source_table:
+            return error('source_table is required', 400)
+
+        details = await run_blocking(rag_service.get_product_details, product_id, source_table)
+
+        if not details:
+            return error('Product not found', 404)
+
+        return AppJSONResponse({
+            'success': True,
+            'data': details
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Ürün detay hatası: {e}")
+        return error(str(e), 500)
+
+
+async def ai_analyze_product(request: Request):
+    """AI ile ürün risk analizi"""
+    try:
+        if not gemini_service or not rag_service:
+            return error('AI services not available', 500)
+
+        data = await request.json()
+        product_id = data.get('product_id')
+        source_table = data.get('source_table')
+        query = data.get('query', 'Bu ürün için risk analizi yap')
+
+        if not product_id or not source_table:
+            return error('product_id and source_table are required', 400)
+
+        product_details = await run_blocking(rag_service.get_product_details, product_id, source_table)
+
+        if not product_details:
+            return error('Product not found', 404)
+
+        risk_data = product_details.get('risk_analysis', {})
+        context = build_analysis_context(product_details)
+
+        async with gemini_slot():
+            analysis = await gemini_service.analyze_product_with_context_async(query, context, "")
+
+        return AppJSONResponse({
+            'success': True,
+            'data': {
+                'analysis': analysis,
+                'product_details': product_details,
+                'risk_analysis': risk_data
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"❌ AI analiz hatası: {e}")
+        return error(str(e), 500)
+
+
+async def ai_chat(request: Request):
+    """AI ile sohbet"""
+    try:
+        if not gemini_service or not rag_service:
+            return error('AI services not available', 500)
+
+        data = await request.json()
+        message = data.get('message', '')
+
+        if not message:
+            return error('Message is required', 400)
+
+        search_results = await run_blocking(rag_service.search_products, message, limit=5)
+        prompt = build_chat_prompt(message, search_results)
+
+        async with gemini_slot():
+            response = await gemini_service.generate_response_async(prompt)
+
+        return AppJSONResponse({
+            'success': True,
+            'data': {
+                'response': response,
+                'context_products': len(search_results) if search_results else 0
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"❌ AI sohbet hatası: {e}")
+        return error(str(e), 500)
+
+
+async def on_shutdown():
+    blocking_executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/search', search_products, methods=['POST']),
+        Route('/api/product/{product_id}/details', get_product_details, methods=['GET']),
+        Route('/api/ai/analyze', ai_analyze_product, methods=['POST']),
+        Route('/api/ai/chat', ai_chat, methods=['POST']),
+        # Geri kalan route'lar (health, istatistikler, risk, embedding işleri...) Flask'tan
+        Mount('/', app=WSGIMiddleware(flask_app, workers=BLOCKING_THREADS))
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    on_shutdown=[on_shutdown]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('ASGI_PORT', '8000')))
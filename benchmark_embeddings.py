@@ -0,0 +1,77 @@
+# benchmark_embeddings.py
+import argparse
+import time
+import logging
+from typing import List, Dict, Any
+
+import numpy as np
+
+from inference_backends import BACKENDS, BACKEND_TORCH, SAMPLE_TEXTS, PARITY_THRESHOLD, load_model, parity_check
+from model_registry import QUERY_MODEL_NAME
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def benchmark_backend(model, texts: List[str], repeats: int, batch_size: int) -> Dict[str, Any]:
+    """Tek sorgu gecikmesi (p50/p95) ve batch throughput ölç"""
+    # Isınma
+    model.encode(texts[:2])
+
+    latencies = []
+    for _ in range(repeats):
+        for text in texts:
+            started = time.perf_counter()
+            model.encode(text)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    batch_texts = texts * max(1, (batch_size * 4) // len(texts))
+    started = time.perf_counter()
+    model.encode(batch_texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'batch_texts_per_second': round(len(batch_texts) / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend'leri için parity kontrolü ve benchmark")
+    parser.add_argument('--model', default=QUERY_MODEL_NAME)
+    parser.add_argument('--backends', default=','.join(BACKENDS), help=f"Virgülle ayrılmış: {', '.join(BACKENDS)}")
+    parser.add_argument('--repeats', type=int, default=5, help='Tek sorgu ölçümü tekrar sayısı')
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    reference = load_model(args.model, BACKEND_TORCH)
+
+    results = []
+    for backend in backends:
+        try:
+            model = reference if backend == BACKEND_TORCH else load_model(args.model, backend)
+        except Exception as e:
+            logger.error(f"❌ {backend} yüklenemedi: {e}")
+            continue
+
+        result = {'backend': backend}
+        result.update(parity_check(reference, model))
+        result.update(benchmark_backend(model, SAMPLE_TEXTS, args.repeats, args.batch_size))
+        results.append(result)
+        logger.info(f"📊 {result}")
+
+    print(f"\nModel: {args.model} (parity eşiği: cosine >= {PARITY_THRESHOLD})")
+    print(f"{'backend':<12} {'min cos':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch/sn':>10} {'parity':>7}")
+    for result in results:
+        print(f"{result['backend']:<12} {result['min_cosine']:>8.4f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['batch_texts_per_second']:>10.1f} "
+              f"{'OK' if result['passed'] else 'FAIL':>7}")
+
+    failed = [result['backend'] for result in results if not result['passed']]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,50 +1,105 @@
-import psycopg2
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import json
 import time
-from typing import List, Dict, Any
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from typing import List, Dict, Any, Optional, Callable, Tuple
 import logging
+import psycopg2
+from psycopg2.extras import execute_values
+from db_pool import get_pool, PoolTimeoutError
+from model_registry import get_model, BACKFILL_MODEL_NAME
+from embedding_store import (EMBEDDING_MODEL_VERSION, embedding_table_name, ensure_model_columns,
+                             registered_table_model, register_if_consistent)
 
 # Logging ayarları
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Embedding'i backfill edilen kaynak tablolar
+EMBEDDING_TABLES = ['telephone_products', 'computer_products', 'klima_products', 'kulaklık_products']
+
+# Bağlantı/zaman aşımı hataları ürüne özgü değildir: ürün karantinaya alınmaz, hata yükseltilir ve
+# checkpoint yerinde kalır (çalıştırma tekrar denenebilir)
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeoutError)
+
+# Backfill ilerlemesi ve karantinaya alınan ürünler (yeniden başlatmada kaldığı yerden devam için)
+CREATE_BACKFILL_STATE_SQL = """
+    CREATE TABLE IF NOT EXISTS embedding_backfill_checkpoints (
+        table_name VARCHAR(255) PRIMARY KEY,
+        last_id BIGINT NOT NULL,
+        processed INTEGER DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS embedding_backfill_failures (
+        table_name VARCHAR(255) NOT NULL,
+        product_id BIGINT NOT NULL,
+        error TEXT,
+        failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (table_name, product_id)
+    );
+
+    -- Paralel backfill'in id aralığı planı; devam ederken aynı aralıklar (ve checkpoint adları) kullanılır
+    CREATE TABLE IF NOT EXISTS embedding_backfill_plans (
+        table_name VARCHAR(255) PRIMARY KEY,
+        ranges JSONB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
 class EmbeddingCreator:
-    def __init__(self, db_config: Dict[str, str], model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, db_config: Dict[str, str], model_name: str = BACKFILL_MODEL_NAME):
         """
         Embedding oluşturucu sınıfı
         
+        Model ilk embedding üretiminde model_registry üzerinden yüklenir ve süreçteki
+        diğer oluşturucularla paylaşılır.
+        
         Args:
             db_config: Veritabanı bağlantı bilgileri
             model_name: Kullanılacak embedding modeli
         """
         self.db_config = db_config
-        self.model = SentenceTransformer(model_name)
+        self.db_pool = get_pool(db_config)
+        self.model_name = model_name
         self.connection = None
+    
+    @property
+    def model(self):
+        return get_model(self.model_name)
         
     def connect_db(self):
-        """Veritabanına bağlan"""
+        """Havuzdan bir bağlantı al (close_db ile iade edilir)"""
         try:
-            self.connection = psycopg2.connect(**self.db_config)
+            self.connection = self.db_pool.acquire()
             logger.info("Veritabanına başarıyla bağlandı")
         except Exception as e:
             logger.error(f"Veritabanı bağlantı hatası: {e}")
             raise
     
     def close_db(self):
-        """Veritabanı bağlantısını kapat"""
+        """Bağlantıyı havuza iade et"""
         if self.connection:
-            self.connection.close()
-            logger.info("Veritabanı bağlantısı kapatıldı")
+            self.db_pool.release(self.connection)
+            self.connection = None
+            logger.info("Veritabanı bağlantısı havuza iade edildi")
     
-    def get_products_without_embeddings(self, table_name: str, limit: int = 100) -> List[Dict[str, Any]]:
+    def get_products_without_embeddings(self, table_name: str, limit: int = 100,
+                                        after_id: Optional[int] = None,
+                                        include_failed: bool = False,
+                                        max_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Embedding'i olmayan ürünleri getir
+        Embedding'i olmayan ürünleri id sırasıyla getir
         
         Args:
             table_name: Tablo adı
             limit: Maksimum ürün sayısı
+            after_id: Sadece bu id'den büyük ürünler (keyset sayfalama)
+            include_failed: Karantinadaki ürünleri de getir
+            max_id: Sadece bu id'ye kadar (dahil) olan ürünler (id aralığı parçası)
             
         Returns:
             Embedding'i olmayan ürünler listesi
@@ -52,15 +107,32 @@ class EmbeddingCreator:
         try:
             cursor = self.connection.cursor()
             
+            conditions = ["embedding IS NULL"]
+            params: List[Any] = []
+            if after_id is not None:
+                conditions.append("id > %s")
+                params.append(after_id)
+            if max_id is not None:
+                conditions.append("id <= %s")
+                params.append(max_id)
+            if not include_failed:
+                conditions.append("""
+                    id NOT IN (
+                        SELECT product_id FROM embedding_backfill_failures WHERE table_name = %s
+                    )
+                """)
+                params.append(table_name)
+            
             # Embedding'i olmayan ürünleri getir
             query = f"""
                 SELECT id, title, description, brand, category, price, rating
                 FROM {table_name}
-                WHERE embedding IS NULL
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id
                 LIMIT %s
             """
             
-            cursor.execute(query, (limit,))
+            cursor.execute(query, params + [limit])
             products = cursor.fetchall()
             
             # Sonuçları dictionary formatına çevir
@@ -77,8 +149,129 @@ class EmbeddingCreator:
             
         except Exception as e:
             logger.error(f"Ürün getirme hatası: {e}")
+            self.connection.rollback()
             raise
     
+    def count_products_without_embeddings(self, table_name: str, after_id: Optional[int] = None,
+                                          max_id: Optional[int] = None) -> int:
+        """ETA için kalan (karantinada olmayan) ürün sayısı"""
+        cursor = self.connection.cursor()
+        upper = "AND id <= %s" if max_id is not None else ""
+        cursor.execute(f"""
+            SELECT COUNT(*)
+            FROM {table_name}
+            WHERE embedding IS NULL
+            AND id > %s
+            {upper}
+            AND id NOT IN (
+                SELECT product_id FROM embedding_backfill_failures WHERE table_name = %s
+            )
+        """, [after_id if after_id is not None else -1] + ([max_id] if max_id is not None else []) + [table_name])
+        remaining = cursor.fetchone()[0]
+        cursor.close()
+        return remaining
+    
+    def ensure_backfill_tables(self):
+        """Checkpoint ve karantina tablolarını (yoksa) oluştur"""
+        cursor = self.connection.cursor()
+        cursor.execute(CREATE_BACKFILL_STATE_SQL)
+        self.connection.commit()
+        cursor.close()
+    
+    def ensure_table_model(self, table_name: str, add_columns: bool = True):
+        """
+        Tablonun embedding modeliyle bu oluşturucunun modelinin aynı olduğunu doğrula
+        
+        Kayıt, aramanın okuduğu embedding tablosu adıyla tutulur (telephone_products ->
+        telephone_embeddings). Farklı model/sürümle kaydedilmiş tabloya yazılmaz (vektörler
+        karşılaştırılamaz olur). Kaydı olmayan tablo, içinde başka modelden etiketsiz vektör
+        yoksa bu modelle kaydedilir.
+        
+        Args:
+            add_columns: Etiket sütunlarını ekle (ALTER TABLE); paralel backfill'de sütunlar
+                prepare_backfill'de bir kez eklendiği için worker'lar False verir
+        """
+        cursor = self.connection.cursor()
+        if add_columns:
+            ensure_model_columns(cursor, table_name)
+        registered = registered_table_model(cursor, table_name)
+        
+        if registered is not None and registered != (self.model_name, EMBEDDING_MODEL_VERSION):
+            self.connection.rollback()
+            cursor.close()
+            raise ValueError(f"{embedding_table_name(table_name)} {registered[0]} v{registered[1]} ile kayıtlı, "
+                             f"{self.model_name} v{EMBEDDING_MODEL_VERSION} ile yazılamaz")
+        
+        if registered is None:
+            register_if_consistent(cursor, table_name, self.model_name, EMBEDDING_MODEL_VERSION,
+                                   int(np.asarray(self.model.encode('boyut')).shape[-1]))
+        
+        self.connection.commit()
+        cursor.close()
+    
+    def load_checkpoint(self, table_name: str) -> Optional[int]:
+        """Tablonun en son işlenen id'si (checkpoint yoksa None)"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT last_id FROM embedding_backfill_checkpoints WHERE table_name = %s", (table_name,))
+        row = cursor.fetchone()
+        cursor.close()
+        return row[0] if row else None
+    
+    def save_checkpoint(self, table_name: str, last_id: int, processed: int):
+        """İşlenen son id'yi kaydet"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            INSERT INTO embedding_backfill_checkpoints (table_name, last_id, processed)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (table_name) DO UPDATE SET
+                last_id = EXCLUDED.last_id,
+                processed = embedding_backfill_checkpoints.processed + EXCLUDED.processed,
+                updated_at = CURRENT_TIMESTAMP
+        """, (table_name, last_id, processed))
+        self.connection.commit()
+        cursor.close()
+    
+    def clear_checkpoint(self, table_name: str):
+        """Tablo tamamlandı; sonraki çalıştırma baştan (yeni NULL'lar için) başlar"""
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM embedding_backfill_checkpoints WHERE table_name = %s", (table_name,))
+        self.connection.commit()
+        cursor.close()
+    
+    def quarantine_product(self, table_name: str, product_id: int, error: str):
+        """Tekrar tekrar başarısız olan ürünü karantinaya al"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            INSERT INTO embedding_backfill_failures (table_name, product_id, error)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (table_name, product_id) DO UPDATE SET
+                error = EXCLUDED.error,
+                failed_at = CURRENT_TIMESTAMP
+        """, (table_name, product_id, error[:1000]))
+        self.connection.commit()
+        cursor.close()
+        logger.warning(f"⚠️ Ürün {product_id} karantinaya alındı: {error}")
+    
+    def get_failed_products(self, table_name: str) -> List[Dict[str, Any]]:
+        """Karantinadaki ürünler"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT product_id, error, failed_at
+            FROM embedding_backfill_failures
+            WHERE table_name = %s
+            ORDER BY product_id
+        """, (table_name,))
+        result = [{'product_id': row[0], 'error': row[1], 'failed_at': row[2]} for row in cursor.fetchall()]
+        cursor.close()
+        return result
+    
+    def clear_failed_products(self, table_name: str):
+        """Karantinayı boşalt (ürünler bir sonraki çalıştırmada tekrar denenir)"""
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM embedding_backfill_failures WHERE table_name = %s", (table_name,))
+        self.connection.commit()
+        cursor.close()
+    
     def create_text_for_embedding(self, product: Dict[str, Any]) -> str:
         """
         Ürün bilgilerinden embedding için metin oluştur
@@ -134,6 +327,54 @@ class EmbeddingCreator:
             logger.error(f"Embedding oluşturma hatası: {e}")
             raise
     
+    def create_embeddings(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Metin listesi için embedding'leri tek model çağrısında oluştur
+        
+        Args:
+            texts: Embedding oluşturulacak metinler
+            batch_size: Model içi batch boyutu (EMBEDDING_ENCODE_BATCH_SIZE)
+            
+        Returns:
+            (len(texts), boyut) float32 matris
+        """
+        if batch_size is None:
+            batch_size = int(os.getenv('EMBEDDING_ENCODE_BATCH_SIZE', '64'))
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                 show_progress_bar=False).astype(np.float32)
+    
+    def update_product_embeddings(self, table_name: str, product_ids: List[int], embeddings: np.ndarray):
+        """
+        Bir batch'in embedding'lerini tek UPDATE ve tek transaction ile yaz
+        
+        Args:
+            table_name: Tablo adı
+            product_ids: Ürün ID'leri
+            embeddings: product_ids ile aynı sırada embedding matrisi
+        """
+        # Her satır hangi model/sürümle üretildiğiyle etiketlenir
+        rows = [
+            (product_id, '[' + ','.join(str(float(x)) for x in embedding) + ']', self.model_name, EMBEDDING_MODEL_VERSION)
+            for product_id, embedding in zip(product_ids, embeddings)
+        ]
+        try:
+            cursor = self.connection.cursor()
+            execute_values(cursor, f"""
+                UPDATE {table_name} AS t
+                SET embedding = v.embedding::vector,
+                    embedding_model = v.model_name,
+                    embedding_model_version = v.model_version
+                FROM (VALUES %s) AS v(id, embedding, model_name, model_version)
+                WHERE t.id = v.id
+            """, rows, page_size=len(rows) or 1)
+            self.connection.commit()
+            cursor.close()
+            
+        except Exception as e:
+            logger.error(f"Toplu embedding güncelleme hatası: {e}")
+            self.connection.rollback()
+            raise
+    
     def update_product_embedding(self, table_name: str, product_id: int, embedding: List[float]):
         """
         Ürünün embedding'ini güncelle
@@ -163,54 +404,153 @@ class EmbeddingCreator:
             self.connection.rollback()
             raise
     
-    def process_table(self, table_name: str, batch_size: int = 50):
+    def process_table(self, table_name: str, batch_size: int = 500, resume: bool = True,
+                      retry_failed: bool = False,
+                      id_range: Optional[Tuple[int, int]] = None,
+                      progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      should_stop: Optional[Callable[[], bool]] = None,
+                      prepare_tables: bool = True) -> Dict[str, Any]:
         """
         Tablodaki eksik embedding'leri oluştur
         
+        Ürünler `id > last_id` ile sayfalanır; her batch tek model çağrısıyla encode
+        edilip tek transaction'da yazılır ve ardından checkpoint kaydedilir. Batch
+        hata verirse ürünler tek tek denenir, yine başarısız olanlar karantinaya alınır
+        ve tekrar getirilmez.
+        
         Args:
             table_name: İşlenecek tablo adı
             batch_size: Toplu işlem boyutu
+            resume: Varsa checkpoint'ten devam et
+            retry_failed: Karantinadaki ürünleri tekrar dene
+            id_range: Sadece bu (başlangıç, bitiş) id aralığını işle; checkpoint aralık başına tutulur
+            progress_callback: Her batch sonrası ilerleme özetiyle çağrılır
+            should_stop: True dönerse batch aralarında durulur (checkpoint korunur)
+            prepare_tables: Durum tablolarını ve etiket sütunlarını oluştur; paralel worker'larda
+                False (prepare_backfill yapar, kardeş parçalar ALTER TABLE kilidinde beklemez)
+            
+        Returns:
+            Özet (işlenen, karantinaya alınan, süre, hız, durduruldu mu)
         """
         try:
             logger.info(f"{table_name} tablosu için embedding oluşturma başlatılıyor...")
             
+            if prepare_tables:
+                self.ensure_backfill_tables()
+            self.ensure_table_model(table_name, add_columns=prepare_tables)
+            if retry_failed:
+                self.clear_failed_products(table_name)
+            
+            checkpoint_name = table_name if id_range is None else f"{table_name}:{id_range[0]}-{id_range[1]}"
+            max_id = id_range[1] if id_range else None
+            
+            last_id = self.load_checkpoint(checkpoint_name) if resume else None
+            if last_id is not None:
+                logger.info(f"↩️ {checkpoint_name} checkpoint'ten devam ediliyor (id > {last_id})")
+            elif id_range is not None:
+                last_id = id_range[0] - 1
+            
+            remaining = self.count_products_without_embeddings(table_name, last_id, max_id)
             total_processed = 0
+            total_failed = 0
+            started = time.time()
+            stopped = False
             
             while True:
+                if should_stop and should_stop():
+                    stopped = True
+                    logger.info(f"⏹️ {table_name} backfill durduruldu (id > {last_id} kaldı)")
+                    break
+                
                 # Embedding'i olmayan ürünleri getir
-                products = self.get_products_without_embeddings(table_name, batch_size)
+                products = self.get_products_without_embeddings(table_name, batch_size, after_id=last_id,
+                                                                max_id=max_id)
                 
                 if not products:
-                    logger.info(f"Tüm embedding'ler tamamlandı. Toplam {total_processed} ürün işlendi.")
+                    if id_range is None:
+                        self.clear_checkpoint(checkpoint_name)
+                    else:
+                        # Biten aralık devam eden çalıştırmada tekrar taranmasın; tablo tamamlanınca
+                        # plan ile birlikte silinir (finish_backfill_plan)
+                        self.save_checkpoint(checkpoint_name, id_range[1], 0)
+                    logger.info(f"Tüm embedding'ler tamamlandı. Toplam {total_processed} ürün işlendi, "
+                                f"{total_failed} ürün karantinada.")
                     break
                 
                 logger.info(f"{len(products)} ürün işleniyor...")
                 
-                for product in products:
-                    try:
-                        # Embedding için metin oluştur
-                        text = self.create_text_for_embedding(product)
-                        
-                        # Embedding oluştur
-                        embedding = self.create_embedding(text)
-                        
-                        # Veritabanını güncelle
-                        self.update_product_embedding(table_name, product['id'], embedding)
-                        
-                        total_processed += 1
-                        
-                        # Kısa bekleme (rate limiting için)
-                        time.sleep(0.1)
-                        
-                    except Exception as e:
-                        logger.error(f"Ürün {product.get('id')} işlenirken hata: {e}")
-                        continue
+                processed, failed = self._process_batch(table_name, products)
+                total_processed += processed
+                total_failed += failed
+                
+                last_id = products[-1]['id']
+                self.save_checkpoint(checkpoint_name, last_id, processed)
                 
-                logger.info(f"Batch tamamlandı. Toplam {total_processed} ürün işlendi.")
+                elapsed = max(time.time() - started, 1e-6)
+                rate = (total_processed + total_failed) / elapsed
+                left = max(remaining - total_processed - total_failed, 0)
+                eta = left / rate if rate > 0 else float('inf')
+                logger.info(f"Batch tamamlandı. Toplam {total_processed} ürün işlendi "
+                            f"({rate:.1f} ürün/sn, kalan {left}, tahmini {eta:.0f} sn).")
+                
+                if progress_callback:
+                    progress_callback({
+                        'processed': total_processed,
+                        'failed': total_failed,
+                        'remaining': left,
+                        'last_id': last_id,
+                        'rows_per_second': round(rate, 2),
+                        'eta_seconds': round(eta, 1) if rate > 0 else None
+                    })
+            
+            elapsed = time.time() - started
+            return {
+                'table_name': table_name,
+                'id_range': id_range,
+                'processed': total_processed,
+                'failed': total_failed,
+                'duration_seconds': round(elapsed, 2),
+                'rows_per_second': round(total_processed / elapsed, 2) if elapsed > 0 else None,
+                'stopped': stopped
+            }
                 
         except Exception as e:
             logger.error(f"Tablo işleme hatası: {e}")
             raise
+    
+    def _process_batch(self, table_name: str, products: List[Dict[str, Any]]):
+        """
+        Batch'i tek seferde işle; hata olursa ürün ürün dene
+        
+        Sadece ürüne özgü hatalar (encode hatası, bozuk metin, boyut uyuşmazlığı gibi veri
+        hataları) karantinaya alınır. Bağlantı ve zaman aşımı hataları (TRANSIENT_ERRORS)
+        yükseltilir; checkpoint ilerlemez ve batch sonraki çalıştırmada tekrar denenir.
+        
+        Returns:
+            (başarılı, karantinaya alınan) sayıları
+        """
+        texts = [self.create_text_for_embedding(product) for product in products]
+        try:
+            embeddings = self.create_embeddings(texts)
+            self.update_product_embeddings(table_name, [product['id'] for product in products], embeddings)
+            return len(products), 0
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Batch başarısız, ürünler tek tek deneniyor: {e}")
+        
+        processed = failed = 0
+        for product, text in zip(products, texts):
+            try:
+                embeddings = self.create_embeddings([text])
+                self.update_product_embeddings(table_name, [product['id']], embeddings)
+                processed += 1
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                self.quarantine_product(table_name, product['id'], str(e))
+                failed += 1
+        return processed, failed
 
 def load_db_config(config_file: str = 'db_config.txt') -> Dict[str, str]:
     """
@@ -251,24 +591,214 @@ def load_db_config(config_file: str = 'db_config.txt') -> Dict[str, str]:
         logger.error(f"Konfigürasyon yükleme hatası: {e}")
         raise
 
+def _init_backfill_worker(torch_threads: int):
+    """Süreç başına torch thread sayısını sınırla (çekirdekler arası aşırı abonelik olmasın)"""
+    import torch
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+
+
+def _backfill_shard(db_config: Dict[str, str], table_name: str, id_range: Optional[Tuple[int, int]],
+                    batch_size: int, resume: bool) -> Dict[str, Any]:
+    """Worker süreci: kendi modeli (süreç başına registry) ve bağlantısıyla bir tabloyu ya da id aralığını işle"""
+    creator = EmbeddingCreator(db_config)
+    creator.connect_db()
+    try:
+        return creator.process_table(table_name, batch_size=batch_size, resume=resume, id_range=id_range,
+                                     prepare_tables=False)
+    finally:
+        creator.close_db()
+
+
+def plan_backfill_shards(db_config: Dict[str, str], tables: List[str], shards_per_table: int = 1,
+                         resume: bool = True) -> List[Tuple[str, Optional[Tuple[int, int]]]]:
+    """
+    Tabloları (ve istenirse tablo içindeki id aralıklarını) işlere böl
+    
+    Aralık planı embedding_backfill_plans tablosuna kaydedilir. Devam ederken kayıtlı plan
+    kullanılır; böylece `tablo:başlangıç-bitiş` checkpoint'leri id aralığı değişse de eşleşir.
+    resume=False ise eski plan ve aralık checkpoint'leri silinip yeni plan oluşturulur.
+    
+    Returns:
+        (tablo, id aralığı ya da None) listesi
+    """
+    if shards_per_table <= 1:
+        return [(table, None) for table in tables]
+    
+    shards = []
+    with get_pool(db_config).connection() as conn:
+        cursor = conn.cursor()
+        for table in tables:
+            if resume:
+                cursor.execute("SELECT ranges FROM embedding_backfill_plans WHERE table_name = %s", (table,))
+                row = cursor.fetchone()
+                if row:
+                    logger.info(f"↩️ {table} kayıtlı aralık planıyla devam ediliyor ({len(row[0])} aralık)")
+                    shards.extend((table, (start, end)) for start, end in row[0])
+                    continue
+            else:
+                _delete_backfill_plan(cursor, table)
+            
+            cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table} WHERE embedding IS NULL")
+            min_id, max_id = cursor.fetchone()
+            if min_id is None:
+                continue
+            step = max((max_id - min_id + 1) // shards_per_table, 1)
+            ranges = []
+            start = min_id
+            while start <= max_id:
+                end = max_id if start + 2 * step > max_id + 1 else start + step - 1
+                ranges.append((start, end))
+                start = end + 1
+            
+            cursor.execute("""
+                INSERT INTO embedding_backfill_plans (table_name, ranges)
+                VALUES (%s, %s)
+                ON CONFLICT (table_name) DO UPDATE SET ranges = EXCLUDED.ranges, created_at = CURRENT_TIMESTAMP
+            """, (table, json.dumps(ranges)))
+            shards.extend((table, id_range) for id_range in ranges)
+        conn.commit()
+        cursor.close()
+    return shards
+
+
+def _delete_backfill_plan(cursor, table: str):
+    """Tablonun aralık planını ve `tablo:başlangıç-bitiş` checkpoint'lerini sil"""
+    cursor.execute("DELETE FROM embedding_backfill_plans WHERE table_name = %s", (table,))
+    cursor.execute("""
+        DELETE FROM embedding_backfill_checkpoints
+        WHERE split_part(table_name, ':', 1) = %s
+        AND strpos(table_name, ':') > 0
+    """, (table,))
+
+
+def finish_backfill_plan(db_config: Dict[str, str], table: str):
+    """Tablonun tüm aralıkları bitti; plan ve aralık checkpoint'leri silinir"""
+    with get_pool(db_config).connection() as conn:
+        cursor = conn.cursor()
+        _delete_backfill_plan(cursor, table)
+        conn.commit()
+        cursor.close()
+
+
+def prepare_backfill(db_config: Dict[str, str], tables: List[str], retry_failed: bool = False):
+    """Worker'lar başlamadan checkpoint/karantina tablolarını hazırla (tek süreçte)"""
+    with get_pool(db_config).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_BACKFILL_STATE_SQL)
+        # Paralel worker'lar aynı anda ALTER TABLE çalıştırmasın
+        for table in tables:
+            ensure_model_columns(cursor, table)
+        if retry_failed:
+            cursor.execute("DELETE FROM embedding_backfill_failures WHERE table_name = ANY(%s)", (tables,))
+        conn.commit()
+        cursor.close()
+
+
+def run_parallel_backfill(db_config: Dict[str, str], tables: List[str], workers: int,
+                          torch_threads: Optional[int] = None, shards_per_table: int = 1,
+                          batch_size: int = 500, resume: bool = True,
+                          retry_failed: bool = False) -> List[Dict[str, Any]]:
+    """
+    Tabloları / id aralıklarını süreç havuzunda paralel işle
+    
+    Her worker kendi model kopyasını yükler; torch_threads verilmezse çekirdekler
+    worker'lar arasında eşit paylaştırılır.
+    
+    Args:
+        db_config: Veritabanı bağlantı bilgileri
+        tables: İşlenecek tablolar
+        workers: Süreç sayısı
+        torch_threads: Worker başına torch thread sayısı
+        shards_per_table: Her tablonun bölüneceği id aralığı sayısı
+        batch_size: Toplu işlem boyutu
+        resume: Checkpoint'lerden devam et
+        retry_failed: Karantinadaki ürünleri tekrar dene
+    """
+    if torch_threads is None:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    
+    prepare_backfill(db_config, tables, retry_failed)
+    shards = plan_backfill_shards(db_config, tables, shards_per_table, resume)
+    logger.info(f"🚀 Paralel backfill: {len(shards)} iş, {workers} süreç, süreç başına {torch_threads} thread")
+    
+    started = time.time()
+    summaries = []
+    # fork edilmiş süreçte torch/bağlantı durumu paylaşılmasın diye spawn kullanılır
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_backfill_worker, initargs=(torch_threads,)) as executor:
+        futures = {
+            executor.submit(_backfill_shard, db_config, table, id_range, batch_size, resume): (table, id_range)
+            for table, id_range in shards
+        }
+        # Tablo başına bitmemiş aralık sayısı; hepsi tamamlanan tablonun planı silinir
+        pending = {}
+        for table, id_range in shards:
+            if id_range is not None:
+                pending[table] = pending.get(table, 0) + 1
+        
+        for future in as_completed(futures):
+            table, id_range = futures[future]
+            try:
+                summary = future.result()
+                summaries.append(summary)
+            except Exception as e:
+                logger.error(f"{table} {id_range or ''} işlenirken hata: {e}")
+                # Hata alan aralık checkpoint'inden devam etsin; plan korunur
+                pending.pop(table, None)
+                continue
+            
+            if table in pending and not summary['stopped']:
+                pending[table] -= 1
+                if pending[table] == 0:
+                    finish_backfill_plan(db_config, table)
+                    logger.info(f"✅ {table} tüm aralıkları tamamlandı, plan silindi")
+    
+    elapsed = time.time() - started
+    total = sum(summary['processed'] for summary in summaries)
+    logger.info(f"✅ Paralel backfill bitti: {total} ürün, {elapsed:.1f} sn ({total / max(elapsed, 1e-6):.1f} ürün/sn)")
+    return summaries
+
+
 def main():
     """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="Eksik embedding'leri oluştur")
+    parser.add_argument('--restart', action='store_true', help="Checkpoint'leri yok say, baştan başla")
+    parser.add_argument('--retry-failed', action='store_true', help='Karantinadaki ürünleri tekrar dene')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('EMBEDDING_BACKFILL_WORKERS', '1')),
+                        help='Paralel süreç sayısı (1: tek süreç)')
+    parser.add_argument('--torch-threads', type=int,
+                        default=int(os.getenv('EMBEDDING_TORCH_THREADS', '0')) or None,
+                        help='Worker başına torch thread sayısı (varsayılan: çekirdek / worker)')
+    parser.add_argument('--shards-per-table', type=int, default=1,
+                        help='Her tabloyu bu kadar id aralığına böl')
+    args = parser.parse_args()
+    
+    # --restart: checkpoint'leri yok say, --retry-failed: karantinadakileri tekrar dene
+    resume = not args.restart
+    retry_failed = args.retry_failed
+    
     try:
         # Veritabanı konfigürasyonunu yükle
         db_config = load_db_config()
         
+        # Tabloları işle
+        tables = EMBEDDING_TABLES
+        
+        if args.workers > 1:
+            run_parallel_backfill(db_config, tables, args.workers, args.torch_threads,
+                                  args.shards_per_table, resume=resume, retry_failed=retry_failed)
+            return
+        
         # Embedding oluşturucuyu başlat
         creator = EmbeddingCreator(db_config)
         
         # Veritabanına bağlan
         creator.connect_db()
         
-        # Tabloları işle
-        tables = ['telephone_products', 'computer_products', 'klima_products', 'kulaklık_products']
-        
         for table in tables:
             try:
-                creator.process_table(table)
+                creator.process_table(table, resume=resume, retry_failed=retry_failed)
             except Exception as e:
                 logger.error(f"{table} tablosu işlenirken hata: {e}")
                 continue
@@ -282,4 +812,4 @@ def main():
             creator.close_db()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
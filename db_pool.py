@@ -0,0 +1,393 @@
+# db_pool.py
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
+import numpy as np
+import threading
+import time
+import os
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+try:
+    from pgvector.psycopg2 import register_vector
+except ImportError:
+    register_vector = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# vector tipi süreç genelinde bir kez kaydedilir; extension yoksa bu aralıkla tekrar denenir
+VECTOR_REGISTER_RETRY_SECONDS = 60
+_vector_lock = threading.Lock()
+_vector_registered = False
+_vector_last_attempt = 0.0
+
+
+def _cast_vector(value, cur):
+    """pgvector metnini ara Python listesi/float'ları olmadan doğrudan float32 diziye çevir"""
+    if value is None:
+        return None
+    return np.fromstring(value[1:-1], dtype=np.float32, sep=',')
+
+
+def register_vector_types(conn) -> bool:
+    """
+    vector sütunlarının NumPy float32 dizisi olarak okunmasını sağla
+
+    pgvector'ün psycopg2 adaptörü kaydedilir (np.ndarray parametreleri vector olarak
+    gönderilir); okuma tarafında pgvector'ün split tabanlı çeviricisi yerine
+    np.fromstring kullanılır. psycopg2 sonuçları metin protokolüyle aldığından
+    dönüşüm tek C çağrısıdır. Kayıt süreç geneli olduğu için bir kez yapılır.
+    """
+    global _vector_registered, _vector_last_attempt
+    if _vector_registered:
+        return True
+    with _vector_lock:
+        if _vector_registered or time.monotonic() - _vector_last_attempt < VECTOR_REGISTER_RETRY_SECONDS:
+            return _vector_registered
+        _vector_last_attempt = time.monotonic()
+        try:
+            cur = conn.cursor()
+            if register_vector is not None:
+                register_vector(cur)
+            cur.execute("SELECT NULL::vector")
+            oid = cur.description[0][1]
+            cur.close()
+            conn.rollback()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            logger.warning(f"⚠️ vector tipi kaydedilemedi (pgvector extension kurulu mu?): {e}")
+            return False
+        extensions.register_type(extensions.new_type((oid,), 'VECTOR', _cast_vector))
+        _vector_registered = True
+        logger.info("✅ pgvector tipi kaydedildi (vector -> float32 ndarray)")
+        return True
+
+
+class PoolTimeoutError(Exception):
+    """Havuzdan süre sınırı içinde bağlantı alınamadı"""
+
+
+class AdvisoryLock:
+    """
+    Süreçler arası isimli kilit (PostgreSQL oturum seviyesi advisory lock)
+
+    Kilit havuz dışı, kendine ait bir bağlantıda tutulur: havuza dönen bağlantı kilidi
+    başka bir isteğe taşımaz, kilidi tutan süreç ölürse bağlantıyla birlikte kilit de
+    bırakılır. gunicorn worker'ları arasında tek sahip seçmek için kullanılır.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], name: str):
+        self.db_config = db_config
+        self.name = name
+        self._conn = None
+
+    @property
+    def held(self) -> bool:
+        return self._conn is not None and not self._conn.closed
+
+    def try_acquire(self) -> bool:
+        """Kilidi beklemeden almayı dene; zaten tutuluyorsa bağlantının canlı olduğunu doğrula"""
+        if self.held:
+            try:
+                cur = self._conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                return True
+            except psycopg2.Error:
+                # Bağlantı koptuysa kilit sunucuda bırakılmıştır
+                self._close()
+
+        conn = None
+        try:
+            conn = psycopg2.connect(**self.db_config)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (self.name,))
+            acquired = cur.fetchone()[0]
+            cur.close()
+        except psycopg2.Error as e:
+            logger.warning(f"⚠️ Advisory lock alınamadı ({self.name}): {e}")
+            acquired = False
+
+        if acquired:
+            self._conn = conn
+        elif conn is not None:
+            conn.close()
+        return acquired
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            if not self._conn.closed:
+                cur = self._conn.cursor()
+                cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (self.name,))
+                cur.close()
+        except psycopg2.Error:
+            pass
+        finally:
+            self._close()
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class DatabasePool:
+    """
+    Paylaşılan psycopg2 bağlantı havuzu
+
+    ThreadedConnectionPool üzerine bekleme (dolu havuzda hata yerine sıra), sağlık
+    kontrolü ve bağlam yöneticisi ile checkout ekler. Bekleme süresi ve doluluk
+    metrikleri stats() ile okunur.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], minconn: Optional[int] = None, maxconn: Optional[int] = None,
+                 timeout: Optional[float] = None, health_check_interval: Optional[float] = None):
+        """
+        Args:
+            db_config: Veritabanı bağlantı bilgileri
+            minconn: Açık tutulacak minimum bağlantı (DB_POOL_MIN)
+            maxconn: Maksimum bağlantı (DB_POOL_MAX)
+            timeout: Boş bağlantı için maksimum bekleme süresi, saniye (DB_POOL_TIMEOUT)
+            health_check_interval: Bu kadar saniye boşta kalan bağlantı checkout'ta
+                SELECT 1 ile kontrol edilir (DB_POOL_HEALTH_CHECK_SECONDS)
+        """
+        self.db_config = db_config
+        self.minconn = minconn if minconn is not None else int(os.getenv('DB_POOL_MIN', '1'))
+        self.maxconn = maxconn if maxconn is not None else int(os.getenv('DB_POOL_MAX', '10'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else float(os.getenv('DB_POOL_HEALTH_CHECK_SECONDS', '30')))
+        # vector sütunları float32 ndarray olarak gelsin (DB_REGISTER_VECTOR)
+        self.register_vector = os.getenv('DB_REGISTER_VECTOR', 'true').lower() == 'true'
+
+        # Bağlantılar ilk checkout'ta açılır; servisler veritabanı yokken de başlatılabilir
+        self._pool = None
+        # ThreadedConnectionPool dolunca PoolError fırlatır; semafor ile sıraya sokuyoruz
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._last_used: Dict[int, float] = {}
+
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._health_check_failures = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _get_pool(self) -> pg_pool.ThreadedConnectionPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.db_config)
+                logger.info(f"✅ Veritabanı havuzu oluşturuldu (min={self.minconn}, max={self.maxconn})")
+            return self._pool
+
+    def acquire(self):
+        """Havuzdan sağlıklı bir bağlantı al (release ile geri verilmeli)"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"Havuzdan {self.timeout} sn içinde bağlantı alınamadı")
+
+        try:
+            conn = self._get_healthy_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+        if self.register_vector:
+            register_vector_types(conn)
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn, close: bool = False):
+        """Bağlantıyı havuza geri ver; açık transaction geri alınır"""
+        try:
+            if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"⚠️ Bağlantı sıfırlanamadı, kapatılıyor: {e}")
+            close = True
+
+        try:
+            close = close or bool(conn.closed)
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _get_healthy_connection(self):
+        """Kapanmış ya da uzun süre boşta kalmış bağlantıları kontrol ederek ver"""
+        connection_pool = self._get_pool()
+        for _ in range(self.maxconn + 1):
+            conn = connection_pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._lock:
+                self._health_check_failures += 1
+            self._last_used.pop(id(conn), None)
+            connection_pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("Havuzda sağlıklı bağlantı bulunamadı")
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Sağlıksız bağlantı atıldı: {e}")
+            return False
+
+    @contextmanager
+    def connection(self):
+        """
+        Bağlam yöneticisi ile checkout
+
+        Örnek:
+            with pool.connection() as conn:
+                cur = conn.cursor()
+                ...
+                conn.commit()  # yazma işlemleri açıkça commit edilmeli
+        """
+        conn = self.acquire()
+        close = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            close = True
+            raise
+        finally:
+            self.release(conn, close=close)
+
+    @contextmanager
+    def cursor(self):
+        """Tek cursor'lık kısa işler için checkout"""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Havuz doluluk ve bekleme metrikleri"""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'in_use': self._in_use,
+                'utilization': round(self._in_use / self.maxconn, 3) if self.maxconn else 0.0,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'health_check_failures': self._health_check_failures,
+                'avg_wait_ms': round(self._total_wait / checkouts * 1000, 3) if checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+                'total_wait_seconds': round(self._total_wait, 3)
+            }
+
+    def reset_after_fork(self):
+        """
+        Fork edilen çocuk süreçte havuzu sıfırla
+
+        Ebeveynden kalan bağlantılar kapatılmaz (soket ebeveyn/kardeş süreçlerle ortak;
+        kapatmak onların oturumunu da sonlandırır), sadece bırakılır. Kilitler ve sayaçlar
+        yeniden oluşturulur; yeni bağlantılar ilk checkout'ta açılır.
+        """
+        if self._pool is not None:
+            _inherited_pools.append(self._pool)
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._in_use = 0
+
+    def close(self):
+        """Havuzdaki tüm bağlantıları kapat"""
+        with self._lock:
+            connection_pool, self._pool = self._pool, None
+        if connection_pool is not None:
+            connection_pool.closeall()
+        self._last_used.clear()
+        logger.info("Veritabanı havuzu kapatıldı")
+
+
+_pools: Dict[tuple, DatabasePool] = {}
+_pools_lock = threading.Lock()
+# Fork sonrası bırakılan ebeveyn havuzları; çöp toplanıp bağlantıları kapatılmasın diye tutulur
+_inherited_pools: List[pg_pool.ThreadedConnectionPool] = []
+
+
+def get_pool(db_config: Dict[str, Any]) -> DatabasePool:
+    """Aynı konfigürasyon için süreç başına tek havuz döndür"""
+    key = tuple(sorted((k, str(v)) for k, v in db_config.items()))
+    with _pools_lock:
+        db_pool = _pools.get(key)
+        if db_pool is None:
+            db_pool = DatabasePool(db_config)
+            _pools[key] = db_pool
+        return db_pool
+
+
+def all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Süreçteki tüm havuzların metrikleri (host:port/database anahtarıyla)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        f"{p.db_config.get('host')}:{p.db_config.get('port')}/{p.db_config.get('database')}": p.stats()
+        for p in pools
+    }
+
+
+def close_all_pools(forget: bool = True):
+    """
+    Tüm havuzları kapat
+
+    Args:
+        forget: False ise havuz nesneleri kayıtlı kalır (servisler referanslarını tutmaya
+            devam eder, sonraki checkout yeni bağlantı açar)
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        if forget:
+            _pools.clear()
+    for db_pool in pools:
+        db_pool.close()
+
+
+def reset_pools_after_fork():
+    """Fork edilen worker'da tüm havuzları ebeveynin bağlantılarına dokunmadan sıfırla"""
+    global _pools_lock, _vector_lock
+    _pools_lock = threading.Lock()
+    _vector_lock = threading.Lock()
+    for db_pool in list(_pools.values()):
+        db_pool.reset_after_fork()
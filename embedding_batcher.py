@@ -0,0 +1,137 @@
+# embedding_batcher.py
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batch boyutu dağılımı için kova üst sınırları
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class EmbeddingBatcher:
+    """
+    Eşzamanlı tek sorgu encode isteklerini mikro batch'lerde birleştirir
+
+    Kuyrukta bekleyen istekler beklemeden alınır. Eşzamanlı yük görülüyorsa (kuyrukta
+    başka istek vardı ya da önceki batch birden fazla istek içeriyordu) ilk istekten
+    sonra en fazla max_wait_ms boyunca ya da max_batch_size isteğe ulaşana kadar gelen
+    metinler de toplanır; tek başına gelen istek pencereyi beklemez. Tek encode çağrısı
+    yapılır, her çağıran kendi vektörünü alır. Aynı batch'teki aynı metinler bir kez
+    encode edilir.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray], max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None):
+        """
+        Args:
+            encode_batch: Metin listesi -> (n, boyut) matris
+            max_batch_size: Bir batch'teki maksimum metin (EMBEDDING_BATCH_MAX_SIZE)
+            max_wait_ms: Eşzamanlı yükte ilk istekten sonra bekleme üst sınırı (EMBEDDING_BATCH_WAIT_MS)
+        """
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size or int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32'))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '5'))
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self._last_batch_size = 0
+
+        self.batches = 0
+        self.immediate_batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+        self.total_wait_ms = 0.0
+        self.batch_size_histogram = {f"<={bucket}": 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = 0
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Metni sıradaki batch'e ekle ve vektörü bekle"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result(timeout=timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Zaten kuyrukta olanlar beklemeden alınır
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Eşzamanlılık yoksa pencere beklenmez (tek istek gecikmesi artmasın)
+            if self.max_wait_ms > 0 and (len(batch) > 1 or self._last_batch_size > 1):
+                deadline = time.perf_counter() + self.max_wait_ms / 1000
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            else:
+                with self._lock:
+                    self.immediate_batches += 1
+
+            self._last_batch_size = len(batch)
+            self._process(batch)
+
+    def _process(self, batch: List[tuple]):
+        started = time.perf_counter()
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = np.asarray(self.encode_batch(texts), dtype=np.float32)
+            by_text = dict(zip(texts, vectors))
+            for text, future, _ in batch:
+                future.set_result(by_text[text])
+        except Exception as e:
+            logger.error(f"❌ Batch embedding hatası ({len(batch)} istek): {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+        with self._lock:
+            size = len(batch)
+            self.batches += 1
+            self.items += size
+            self.max_seen_batch = max(self.max_seen_batch, size)
+            self.total_wait_ms += sum((started - queued_at) * 1000 for _, _, queued_at in batch)
+            bucket = next((f"<={b}" for b in BATCH_SIZE_BUCKETS if size <= b), f">{BATCH_SIZE_BUCKETS[-1]}")
+            self.batch_size_histogram[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch boyutu dağılımı ve kuyrukta bekleme süresi"""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self.batches,
+                'immediate_batches': self.immediate_batches,
+                'requests': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+                'max_seen_batch_size': self.max_seen_batch,
+                'avg_queue_wait_ms': round(self.total_wait_ms / self.items, 3) if self.items else None,
+                'batch_size_histogram': dict(self.batch_size_histogram),
+                'queued': self._queue.qsize()
+            }
@@ -0,0 +1,208 @@
+# embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from embedding_store import EMBEDDING_MODEL_VERSION
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(text: str) -> str:
+    """
+    Önbellek anahtarı için metni normalize et
+
+    Sadece Unicode (NFC) ve boşluk normalize edilir; büyük/küçük harf korunur çünkü
+    model büyük/küçük harfe duyarlıdır ve encode edilen metin de bu normal formdur.
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Sorgu embedding'leri için LRU + TTL önbellek
+
+    Anahtar (model adı, model sürümü, normalize metin), değer float32 vektördür; sürüm
+    (EMBEDDING_MODEL_VERSION) değişince eski modelin vektörleri kullanılmaz. disk_path
+    verilirse bellekte bulunmayan vektörler SQLite dosyasından okunur; yeniden başlatmadan
+    sonra da geçerlidir (aynı TTL ile). Disk katmanı süresi dolan satırlardan ve
+    disk_max_rows üzerindeki en eski satırlardan periyodik olarak temizlenir.
+    """
+
+    # Disk katmanı bu kadar yazmada bir temizlenir
+    DISK_PRUNE_EVERY = 100
+
+    def __init__(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 disk_path: Optional[str] = None, disk_max_rows: Optional[int] = None,
+                 model_version: Optional[str] = None):
+        """
+        Args:
+            max_size: Bellekteki maksimum vektör sayısı (EMBEDDING_CACHE_SIZE, 0: kapalı)
+            ttl_seconds: Vektör geçerlilik süresi (EMBEDDING_CACHE_TTL_SECONDS)
+            disk_path: SQLite disk katmanı dosyası (EMBEDDING_CACHE_PATH, boş: kapalı)
+            disk_max_rows: Disk katmanındaki maksimum vektör sayısı (EMBEDDING_CACHE_DISK_MAX_ROWS)
+            model_version: Anahtara eklenen model sürümü (varsayılan EMBEDDING_MODEL_VERSION)
+        """
+        self.max_size = max_size if max_size is not None else int(os.getenv('EMBEDDING_CACHE_SIZE', '1024'))
+        self.ttl_seconds = (ttl_seconds if ttl_seconds is not None
+                            else float(os.getenv('EMBEDDING_CACHE_TTL_SECONDS', '86400')))
+        self.disk_path = disk_path if disk_path is not None else os.getenv('EMBEDDING_CACHE_PATH', '')
+        self.disk_max_rows = (disk_max_rows if disk_max_rows is not None
+                              else int(os.getenv('EMBEDDING_CACHE_DISK_MAX_ROWS', '100000')))
+        self.model_version = model_version if model_version is not None else EMBEDDING_MODEL_VERSION
+        self._disk_writes = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_path:
+            self._init_disk()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """Önbellekteki vektörü döndür (yoksa ya da süresi dolduysa None)"""
+        if not self.enabled:
+            return None
+
+        key = (model_name, self.model_version, text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if now - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+        vector = self._disk_get(model_name, text, now) if self.disk_path else None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, vector, now)
+        return vector
+
+    def put(self, model_name: str, text: str, vector: np.ndarray):
+        """Vektörü önbelleğe yaz"""
+        if not self.enabled:
+            return
+
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        now = time.time()
+        with self._lock:
+            self._store((model_name, self.model_version, text), vector, now)
+        if self.disk_path:
+            self._disk_put(model_name, text, vector, now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """İsabet / ıska metrikleri"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+                'disk_path': self.disk_path or None
+            }
+
+    def _store(self, key: tuple, vector: np.ndarray, stored_at: float):
+        self._entries[key] = (vector, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    # Disk katmanı (SQLite; her çağrı kendi bağlantısını açıp kapatır, thread güvenli)
+
+    def _disk_key(self, model_name: str, text: str) -> str:
+        return hashlib.sha1(f"{model_name}\0{self.model_version}\0{text}".encode('utf-8')).hexdigest()
+
+    @contextmanager
+    def _disk(self):
+        """Bağlantı: başarıda commit, her durumda kapatılır (sqlite3 bağlam yöneticisi kapatmaz)"""
+        with closing(sqlite3.connect(self.disk_path)) as db:
+            with db:
+                yield db
+
+    def _init_disk(self):
+        try:
+            with self._disk() as db:
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        key TEXT PRIMARY KEY,
+                        vector BLOB NOT NULL,
+                        stored_at REAL NOT NULL
+                    )
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_stored_at ON query_embeddings (stored_at)")
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding disk önbelleği açılamadı ({self.disk_path}): {e}")
+            self.disk_path = ''
+
+    def _disk_get(self, model_name: str, text: str, now: float) -> Optional[np.ndarray]:
+        try:
+            with self._disk() as db:
+                row = db.execute("SELECT vector, stored_at FROM query_embeddings WHERE key = ?",
+                                 (self._disk_key(model_name, text),)).fetchone()
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding disk önbelleği okunamadı: {e}")
+            return None
+        if row is None or now - row[1] >= self.ttl_seconds:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _disk_put(self, model_name: str, text: str, vector: np.ndarray, now: float):
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % self.DISK_PRUNE_EVERY == 0
+        try:
+            with self._disk() as db:
+                db.execute("INSERT OR REPLACE INTO query_embeddings (key, vector, stored_at) VALUES (?, ?, ?)",
+                           (self._disk_key(model_name, text), vector.tobytes(), now))
+                if prune:
+                    self._disk_prune(db, now)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding disk önbelleğine yazılamadı: {e}")
+
+    def _disk_prune(self, db, now: float):
+        """Süresi dolan satırları ve disk_max_rows üzerindeki en eski satırları sil"""
+        db.execute("DELETE FROM query_embeddings WHERE stored_at < ?", (now - self.ttl_seconds,))
+        if self.disk_max_rows > 0:
+            db.execute("""
+                DELETE FROM query_embeddings
+                WHERE key IN (
+                    SELECT key FROM query_embeddings
+                    ORDER BY stored_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.disk_max_rows,))
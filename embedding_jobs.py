@@ -0,0 +1,367 @@
+# embedding_jobs.py
+import threading
+import time
+import uuid
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional
+
+from create_missing_embeddings import EmbeddingCreator
+from db_pool import AdvisoryLock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+ACTIVE_JOB_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+# İş durumu worker'lar arasında paylaşılır; GET/iptal isteği hangi worker'a düşerse düşsün çalışır
+CREATE_EMBEDDING_JOBS_SQL = """
+    CREATE TABLE IF NOT EXISTS embedding_jobs (
+        job_id VARCHAR(32) PRIMARY KEY,
+        table_name VARCHAR(255) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        batch_size INTEGER,
+        retry_failed BOOLEAN DEFAULT FALSE,
+        progress JSONB DEFAULT '{}'::jsonb,
+        result JSONB,
+        error TEXT,
+        cancel_requested BOOLEAN DEFAULT FALSE,
+        owner_pid INTEGER,
+        submitted_at DOUBLE PRECISION,
+        started_at DOUBLE PRECISION,
+        finished_at DOUBLE PRECISION
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_embedding_jobs_table_status
+        ON embedding_jobs (table_name, status);
+"""
+
+JOB_COLUMNS = ('job_id', 'table_name', 'status', 'batch_size', 'retry_failed', 'progress', 'result',
+               'error', 'cancel_requested', 'submitted_at', 'started_at', 'finished_at')
+
+
+class EmbeddingJob:
+    """Tek tablonun embedding backfill işi"""
+
+    def __init__(self, table_name: str, batch_size: int, retry_failed: bool):
+        self.job_id = uuid.uuid4().hex
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.retry_failed = retry_failed
+        self.status = JOB_QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'EmbeddingJob':
+        """embedding_jobs satırından (JOB_COLUMNS sırasıyla) başka süreçteki işin görüntüsü"""
+        values = dict(zip(JOB_COLUMNS, row))
+        job = cls(values['table_name'], values['batch_size'], values['retry_failed'])
+        job.job_id = values['job_id']
+        job.status = values['status']
+        job.progress = values['progress'] or {}
+        job.result = values['result']
+        job.error = values['error']
+        job.submitted_at = values['submitted_at']
+        job.started_at = values['started_at']
+        job.finished_at = values['finished_at']
+        if values['cancel_requested']:
+            job.cancel_event.set()
+        return job
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_JOB_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'table_name': self.table_name,
+            'status': self.status,
+            'batch_size': self.batch_size,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'cancel_requested': self.cancel_event.is_set(),
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class EmbeddingJobManager:
+    """
+    Embedding backfill işlerini arka plandaki iş havuzunda çalıştırır
+
+    Her iş kendi EmbeddingCreator'ını (ve havuzdan kendi bağlantısını) kullanır; model
+    model_registry üzerinden tüm işler arasında paylaşılır. İptal batch aralarında uygulanır;
+    checkpoint korunduğu için iptal edilen tablo sonraki işte kaldığı yerden devam eder.
+
+    gunicorn worker'ları arasında:
+    - Tablo başına tek iş 'embedding_job:<tablo>' advisory lock'uyla sağlanır; kilit iş
+      bitene kadar tutulur, kilit alınamazsa diğer süreçteki aktif iş döndürülür
+    - İş durumu ve ilerleme embedding_jobs tablosuna yazılır; get/list_jobs başka
+      worker'ın işlerini de görür
+    - İptal, iş başka worker'daysa cancel_requested ile istenir ve sahibi sonraki
+      batch'ten önce durur
+    """
+
+    def __init__(self, embedding_creator: EmbeddingCreator, max_workers: Optional[int] = None,
+                 max_finished_jobs: int = 100, on_write: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            embedding_creator: Model adı ve veritabanı ayarları paylaşılacak oluşturucu
+            max_workers: Aynı anda çalışan iş sayısı (EMBEDDING_JOB_WORKERS)
+            max_finished_jobs: Bellekte tutulan ve listelenen bitmiş iş sayısı
+            on_write: Embedding yazan iş bittiğinde tablo adıyla çağrılır (önbellek geçersiz kılma)
+        """
+        self.embedding_creator = embedding_creator
+        self.db_pool = embedding_creator.db_pool
+        self.on_write = on_write
+        self.max_workers = max_workers or int(os.getenv('EMBEDDING_JOB_WORKERS', '1'))
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='embedding-job')
+        self._lock = threading.Lock()
+        # Aynı worker'daki eşzamanlı submit'ler kilit/satır yarışına girmesin
+        self._submit_lock = threading.Lock()
+        self._jobs: Dict[str, EmbeddingJob] = {}
+        self._job_locks: Dict[str, AdvisoryLock] = {}
+        self._table_ready = False
+
+    def submit(self, table_name: str, batch_size: int = 500, retry_failed: bool = False) -> EmbeddingJob:
+        """Tablo için iş başlat (bu ya da başka bir süreçte aktif iş varsa onu döndür)"""
+        with self._submit_lock:
+            with self._lock:
+                for job in self._jobs.values():
+                    if job.table_name == table_name and job.is_active:
+                        logger.info(f"ℹ️ {table_name} için zaten aktif iş var: {job.job_id}")
+                        return job
+
+            table_lock = AdvisoryLock(self.embedding_creator.db_config, f"embedding_job:{table_name}")
+            if not table_lock.try_acquire():
+                existing = self._find_active(table_name)
+                if existing is None:
+                    raise RuntimeError(f"{table_name} için başka bir süreçte iş sürüyor")
+                logger.info(f"ℹ️ {table_name} için başka bir süreçte aktif iş var: {existing.job_id}")
+                return existing
+
+            job = EmbeddingJob(table_name, batch_size, retry_failed)
+            try:
+                self._insert(job)
+            except Exception:
+                table_lock.release()
+                raise
+
+            with self._lock:
+                self._jobs[job.job_id] = job
+                self._job_locks[job.job_id] = table_lock
+                self._prune()
+
+        self._executor.submit(self._run, job)
+        logger.info(f"📥 Embedding işi kuyruğa alındı: {job.job_id} ({table_name})")
+        return job
+
+    def get(self, job_id: str) -> Optional[EmbeddingJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        rows = self._query(f"SELECT {', '.join(JOB_COLUMNS)} FROM embedding_jobs WHERE job_id = %s", (job_id,))
+        return EmbeddingJob.from_row(rows[0]) if rows else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Tüm süreçlerin işleri; bu süreçte çalışanlar bellekteki güncel halleriyle"""
+        jobs = {}
+        try:
+            rows = self._query(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM embedding_jobs
+                ORDER BY submitted_at DESC
+                LIMIT %s
+            """, (self.max_finished_jobs,))
+            jobs = {row[0]: EmbeddingJob.from_row(row) for row in rows}
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding işleri okunamadı, sadece bu süreçtekiler listeleniyor: {e}")
+        with self._lock:
+            jobs.update(self._jobs)
+        ordered = sorted(jobs.values(), key=lambda job: job.submitted_at or 0, reverse=True)
+        return [job.to_dict() for job in ordered]
+
+    def cancel(self, job_id: str) -> Optional[EmbeddingJob]:
+        """İşi iptal et (kuyruktaysa hiç başlamaz, çalışıyorsa sonraki batch'ten önce durur)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.is_active:
+            job.cancel_event.set()
+
+        # Sahibi başka bir worker ise isteği tablodan görür
+        rows = self._query(f"""
+            UPDATE embedding_jobs SET cancel_requested = TRUE
+            WHERE job_id = %s AND status IN %s
+            RETURNING {', '.join(JOB_COLUMNS)}
+        """, (job_id, ACTIVE_JOB_STATES), commit=True)
+        if rows:
+            logger.info(f"🛑 Embedding işi iptal istendi: {job_id}")
+            return job or EmbeddingJob.from_row(rows[0])
+        return job or self.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        """Tüm aktif işleri iptal et ve havuzu kapat"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.is_active:
+                    job.cancel_event.set()
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: EmbeddingJob):
+        try:
+            if job.cancel_event.is_set() or self._mark_running(job):
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                self._save(job)
+                return
+            self._execute(job)
+        finally:
+            with self._lock:
+                table_lock = self._job_locks.pop(job.job_id, None)
+            if table_lock is not None:
+                table_lock.release()
+
+    def _execute(self, job: EmbeddingJob):
+        creator = EmbeddingCreator(self.embedding_creator.db_config, self.embedding_creator.model_name)
+
+        try:
+            creator.connect_db()
+
+            def update_progress(progress: Dict[str, Any]):
+                job.progress = progress
+                # Başka worker'dan gelen iptal isteği ilerleme yazılırken okunur
+                if self._save_progress(job):
+                    job.cancel_event.set()
+
+            job.result = creator.process_table(
+                job.table_name,
+                batch_size=job.batch_size,
+                retry_failed=job.retry_failed,
+                progress_callback=update_progress,
+                should_stop=job.cancel_event.is_set
+            )
+            job.status = JOB_CANCELLED if job.result.get('stopped') else JOB_COMPLETED
+            logger.info(f"✅ Embedding işi bitti: {job.job_id} ({job.status})")
+
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error(f"❌ Embedding işi başarısız: {job.job_id}: {e}")
+        finally:
+            creator.close_db()
+            job.finished_at = time.time()
+            self._save(job)
+            if self.on_write and (job.result or job.progress).get('processed'):
+                try:
+                    self.on_write(job.table_name)
+                except Exception as e:
+                    logger.warning(f"⚠️ Yazma bildirimi başarısız ({job.table_name}): {e}")
+
+    def _ensure_table(self):
+        if self._table_ready:
+            return
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(CREATE_EMBEDDING_JOBS_SQL)
+            cursor.connection.commit()
+        self._table_ready = True
+
+    def _query(self, sql: str, params: tuple = (), fetch: bool = True, commit: bool = False) -> list:
+        self._ensure_table()
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if fetch else []
+            if commit:
+                cursor.connection.commit()
+            return rows
+
+    def _find_active(self, table_name: str) -> Optional[EmbeddingJob]:
+        rows = self._query(f"""
+            SELECT {', '.join(JOB_COLUMNS)} FROM embedding_jobs
+            WHERE table_name = %s AND status IN %s
+            ORDER BY submitted_at DESC
+            LIMIT 1
+        """, (table_name, ACTIVE_JOB_STATES))
+        return EmbeddingJob.from_row(rows[0]) if rows else None
+
+    def _insert(self, job: EmbeddingJob):
+        """Yeni iş satırını yaz; tablo kilidi bizde olduğuna göre tablodaki aktif satırların sahibi ölmüştür"""
+        self._ensure_table()
+        with self.db_pool.cursor() as cursor:
+            cursor.execute("""
+                UPDATE embedding_jobs
+                SET status = %s, error = %s, finished_at = %s
+                WHERE table_name = %s AND status IN %s
+            """, (JOB_FAILED, 'İşi çalıştıran süreç sonlandı', time.time(), job.table_name, ACTIVE_JOB_STATES))
+            cursor.execute("""
+                INSERT INTO embedding_jobs (job_id, table_name, status, batch_size, retry_failed,
+                                            owner_pid, submitted_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (job.job_id, job.table_name, job.status, job.batch_size, job.retry_failed,
+                  os.getpid(), job.submitted_at))
+            cursor.connection.commit()
+
+    def _mark_running(self, job: EmbeddingJob) -> bool:
+        """İşi çalışıyor olarak işaretle; kuyruktayken iptal istendiyse True"""
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            rows = self._query("""
+                UPDATE embedding_jobs SET status = %s, started_at = %s
+                WHERE job_id = %s
+                RETURNING cancel_requested
+            """, (job.status, job.started_at, job.job_id), commit=True)
+            return bool(rows and rows[0][0])
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding işi durumu yazılamadı ({job.job_id}): {e}")
+            return False
+
+    def _save_progress(self, job: EmbeddingJob) -> bool:
+        """İlerlemeyi yaz; iptal istendiyse True"""
+        try:
+            rows = self._query("""
+                UPDATE embedding_jobs SET progress = %s
+                WHERE job_id = %s
+                RETURNING cancel_requested
+            """, (json.dumps(job.progress, default=str), job.job_id), commit=True)
+            return bool(rows and rows[0][0])
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding işi ilerlemesi yazılamadı ({job.job_id}): {e}")
+            return False
+
+    def _save(self, job: EmbeddingJob):
+        """Bitmiş işin son durumunu yaz (hata işi düşürmez, sadece loglanır)"""
+        try:
+            self._query("""
+                UPDATE embedding_jobs
+                SET status = %s, progress = %s, result = %s, error = %s,
+                    started_at = %s, finished_at = %s
+                WHERE job_id = %s
+            """, (job.status, json.dumps(job.progress, default=str),
+                  json.dumps(job.result, default=str) if job.result is not None else None,
+                  job.error, job.started_at, job.finished_at, job.job_id), fetch=False, commit=True)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding işi durumu yazılamadı ({job.job_id}): {e}")
+
+    def _prune(self):
+        """En eski bitmiş işleri bellekten unut (satırları tabloda kalır)"""
+        finished = sorted((job for job in self._jobs.values() if not job.is_active),
+                          key=lambda job: job.submitted_at)
+        for job in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job.job_id]
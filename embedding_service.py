@@ -1,25 +1,38 @@
 # embedding_service.py
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
+from model_registry import get_model, QUERY_MODEL_NAME
+from inference_backends import default_backend
+from embedding_cache import EmbeddingCache, normalize_query
+from embedding_batcher import EmbeddingBatcher
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
-    def __init__(self):
-        """Embedding servisi başlat"""
-        logger.info("🔄 Embedding model yükleniyor...")
-
+    def __init__(self, model_name: Optional[str] = None, cache: Optional[EmbeddingCache] = None,
+                 backend: Optional[str] = None):
+        """
+        Embedding servisi başlat
+
+        Model burada yüklenmez; ilk kullanımda (ya da model_registry.warm_up ile)
+        süreç başına bir kez yüklenip paylaşılır. Tekrarlanan sorgular önbellekten döner.
+        backend: torch | torch-int8 | onnx (EMBEDDING_BACKEND)
+        """
         # Türkçe destekli model
-        try:
-            self.model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-            logger.info("✅ Embedding model yüklendi")
-        except Exception as e:
-            logger.error(f"❌ Model yükleme hatası: {e}")
-            raise
+        self.model_name = model_name or QUERY_MODEL_NAME
+        self.backend = backend or default_backend()
+        # Backend'ler arasında vektörler birebir aynı olmadığından önbellek anahtarında backend de var
+        self.cache_key = f"{self.model_name}@{self.backend}"
+        # Eşzamanlı sorguları tek encode çağrısında birleştir (EMBEDDING_BATCH_WAIT_MS=0: kapalı)
+        self.batcher = EmbeddingBatcher(self._encode_batch)
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    @property
+    def model(self):
+        return get_model(self.model_name, self.backend)
 
     def create_embedding(self, text: str) -> List[float]:
         """Tek text için embedding oluştur"""
@@ -27,12 +40,27 @@ class EmbeddingService:
             if not text or text.strip() == "":
                 return [0.0] * 384  # Boş text için sıfır embedding
 
-            embedding = self.model.encode(text)
-            return embedding.tolist()
+            return self.create_embedding_array(text).tolist()
         except Exception as e:
             logger.error(f"❌ Embedding oluşturma hatası: {e}")
             return [0.0] * 384
 
+    def create_embedding_array(self, text: str) -> np.ndarray:
+        """Tek text için float32 embedding (önbellekli; hata durumunda exception fırlatır)"""
+        text = normalize_query(text)
+        embedding = self.cache.get(self.cache_key, text)
+        if embedding is None:
+            if self.batcher.max_wait_ms > 0:
+                embedding = self.batcher.encode(text)
+            else:
+                embedding = np.asarray(self.model.encode(text), dtype=np.float32)
+            self.cache.put(self.cache_key, text, embedding)
+        return embedding
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Batcher'ın tek model çağrısı"""
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+
     def create_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Çoklu text için batch embedding"""
         try:
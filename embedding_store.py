@@ -0,0 +1,445 @@
+# embedding_store.py
+import argparse
+import threading
+import time
+import os
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from partitioned_storage import PRODUCT_EMBEDDINGS_TABLE, PARTITION_KEY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Modelin çıktısını değiştiren her değişiklikte (model revizyonu, ön işleme) artırılmalı
+EMBEDDING_MODEL_VERSION = os.getenv('EMBEDDING_MODEL_VERSION', '1')
+
+# Her embedding tablosunun hangi model/sürümle doldurulduğu
+CREATE_EMBEDDING_MODELS_SQL = """
+    CREATE TABLE IF NOT EXISTS embedding_table_models (
+        table_name VARCHAR(255) PRIMARY KEY,
+        model_name VARCHAR(255) NOT NULL,
+        model_version VARCHAR(50) NOT NULL,
+        dimension INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
+def ensure_model_columns(cur, table_name: str):
+    """Satır bazında model etiketi sütunlarını ekle (yoksa)"""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table_name,))
+    row = cur.fetchone()
+    if row and row[0] == 'v':
+        # Bölümlenmiş tablo üzerindeki kategori view'ı: sütunlar üst tabloda (partitioned_storage)
+        return
+    cur.execute(f"""
+        ALTER TABLE {table_name}
+        ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS embedding_model_version VARCHAR(50)
+    """)
+
+
+def embedding_table_name(table_name: str) -> str:
+    """Kaydın anahtarı: aramanın okuduğu embedding tablosu (telephone_products -> telephone_embeddings)"""
+    if table_name.endswith('_embeddings'):
+        return table_name
+    if table_name.endswith('_products'):
+        table_name = table_name[:-len('_products')]
+    return f"{table_name}_embeddings"
+
+
+def registered_table_model(cur, table_name: str) -> Optional[Tuple[str, str]]:
+    """Tablonun kayıtlı (model, sürüm) değeri; kayıt yoksa None"""
+    cur.execute("SELECT to_regclass('embedding_table_models')")
+    if cur.fetchone()[0] is None:
+        return None
+    cur.execute("SELECT model_name, model_version FROM embedding_table_models WHERE table_name = %s",
+                (embedding_table_name(table_name),))
+    row = cur.fetchone()
+    return tuple(row) if row else None
+
+
+def record_table_model(cur, table_name: str, model_name: str, model_version: str, dimension: int):
+    """Tablonun aktif modelini kaydet (çağıranın transaction'ında; kaynak tablo adı embedding tablosuna çevrilir)"""
+    cur.execute(CREATE_EMBEDDING_MODELS_SQL)
+    cur.execute("""
+        INSERT INTO embedding_table_models (table_name, model_name, model_version, dimension)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            model_name = EXCLUDED.model_name,
+            model_version = EXCLUDED.model_version,
+            dimension = EXCLUDED.dimension,
+            updated_at = CURRENT_TIMESTAMP
+    """, (embedding_table_name(table_name), model_name, model_version, dimension))
+
+
+def register_if_consistent(cur, table_name: str, model_name: str, model_version: str, dimension: int,
+                           data_table: Optional[str] = None) -> bool:
+    """
+    Kaydı olmayan tabloyu, içinde başka/etiketsiz modelden vektör yoksa bu modelle kaydet
+
+    Args:
+        table_name: Kaydedilecek tablo (kaynak tablo adı embedding tablosuna çevrilir)
+        data_table: Vektörlerin okunduğu tablo (varsayılan: table_name)
+
+    Returns:
+        Kayıt yapıldıysa True
+    """
+    data_table = data_table or table_name
+    cur.execute(f"""
+        SELECT 1 FROM {data_table}
+        WHERE embedding IS NOT NULL
+        AND (embedding_model IS DISTINCT FROM %s OR embedding_model_version IS DISTINCT FROM %s)
+        LIMIT 1
+    """, (model_name, model_version))
+    if cur.fetchone():
+        logger.warning(f"⚠️ {data_table} başka/bilinmeyen modelden vektörler içeriyor, model kaydı yapılmadı "
+                       f"(embedding_store.py register/reembed)")
+        return False
+    record_table_model(cur, table_name, model_name, model_version, dimension)
+    return True
+
+
+class EmbeddingStore:
+    """
+    Embedding tablolarının model/sürüm kaydı
+
+    Arama, sorgu vektörünü üreten modelle aynı model/sürümle doldurulmamış tabloları
+    dışarıda bırakır. Kaydı olmayan tablolar da modeli doğrulanamadığı için aranmaz;
+    EMBEDDING_STRICT_MODEL_CHECK=false ile uyarıyla aranır.
+    """
+
+    def __init__(self, db_pool, cache_seconds: Optional[float] = None, strict: Optional[bool] = None):
+        self.db_pool = db_pool
+        self.cache_seconds = (cache_seconds if cache_seconds is not None
+                              else float(os.getenv('EMBEDDING_MODELS_CACHE_SECONDS', '30')))
+        self.strict = (strict if strict is not None
+                       else os.getenv('EMBEDDING_STRICT_MODEL_CHECK', 'true').lower() == 'true')
+        self._lock = threading.Lock()
+        self._models: Dict[str, Tuple[str, str, int]] = {}
+        self._loaded_at = 0.0
+        self._warned: set = set()
+
+    def table_models(self) -> Dict[str, Tuple[str, str, int]]:
+        """tablo -> (model, sürüm, boyut); kısa süre önbelleklenir"""
+        with self._lock:
+            if time.time() - self._loaded_at < self.cache_seconds:
+                return self._models
+            try:
+                with self.db_pool.cursor() as cur:
+                    cur.execute("SELECT to_regclass('embedding_table_models')")
+                    if cur.fetchone()[0] is None:
+                        models = {}
+                    else:
+                        cur.execute("SELECT table_name, model_name, model_version, dimension FROM embedding_table_models")
+                        models = {row[0]: (row[1], row[2], row[3]) for row in cur.fetchall()}
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding model kaydı okunamadı: {e}")
+                return self._models
+            self._models = models
+            self._loaded_at = time.time()
+            return models
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def compatible_tables(self, table_names: List[str], model_name: str,
+                          model_version: str = EMBEDDING_MODEL_VERSION) -> List[str]:
+        """Sadece sorgu modeliyle aynı model/sürümle doldurulmuş tabloları döndür"""
+        models = self.table_models()
+        compatible = []
+        for table_name in table_names:
+            registered = models.get(table_name)
+            if registered is None:
+                if self.strict:
+                    self._warn_once(table_name, f"⚠️ {table_name} model kaydı yok, aramaya dahil edilmedi "
+                                                f"(embedding_store.py register ile etiketleyin)")
+                    continue
+                self._warn_once(table_name, f"⚠️ {table_name} model kaydı yok, embedding modeli doğrulanamadı")
+                compatible.append(table_name)
+            elif registered[:2] == (model_name, model_version):
+                compatible.append(table_name)
+            else:
+                self._warn_once(
+                    (table_name, registered),
+                    f"❌ {table_name} {registered[0]} v{registered[1]} ile oluşturulmuş, sorgu modeli "
+                    f"{model_name} v{model_version}; tablo aramaya dahil edilmedi"
+                )
+        return compatible
+
+    def _warn_once(self, key, message: str):
+        if key not in self._warned:
+            self._warned.add(key)
+            logger.warning(message)
+
+
+class ReembedPipeline:
+    """
+    Bir embedding tablosunu yeni modelle yeniden oluştur ve atomik olarak değiştir
+
+    1. {tablo}__shadow_<zaman> tablosu oluşturulur, eski tablo id sırasıyla okunup yeni modelle
+       encode edilerek doldurulur (eski tablo aramaya açık kalır)
+    2. Bu sırada eklenen/değişen satırlar için yakalama turu yapılır
+    3. Tek transaction'da kısa bir kilitle son yakalama yapılır, silinen satırlar
+       atılır, tablolar yeniden adlandırılır ve model kaydı güncellenir
+    Eski tablo {tablo}__old_<zaman> adıyla geri dönüş için saklanır (drop_old ile silinir).
+
+    Tablo birleşik product_embeddings üzerindeki bir kategori view'ıysa (partitioned_storage)
+    gölge tablo kategorinin bölümü olarak hazırlanır ve değişim DETACH/ATTACH PARTITION ile
+    yapılır; view'lar değişmez. Bu durumda vektör boyutu üst tabloyla aynı olmalıdır.
+    """
+
+    def __init__(self, db_pool, model_name: str, model_version: str = EMBEDDING_MODEL_VERSION,
+                 batch_size: int = 256):
+        self.db_pool = db_pool
+        self.model_name = model_name
+        self.model_version = model_version
+        self.batch_size = batch_size
+
+    @property
+    def model(self):
+        from model_registry import get_model
+        return get_model(self.model_name)
+
+    def reembed_table(self, table_name: str, drop_old: bool = False) -> Dict[str, Any]:
+        """Tabloyu yeni modelle yeniden oluştur ve değiştir"""
+        started = time.time()
+        # Zaman damgalı ad: sekans/kısıt adları önceki geçişlerle çakışmaz
+        stamp = int(started)
+        shadow = f"{table_name}__shadow_{stamp}"
+        dimension = int(np.asarray(self.model.encode('boyut')).shape[-1])
+
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            partition = self._partition_of(cur, table_name)
+            if partition:
+                self._create_partition_shadow(cur, table_name, shadow, dimension)
+            else:
+                cur.execute(f"""
+                    CREATE TABLE {shadow} (
+                        id SERIAL PRIMARY KEY,
+                        product_id VARCHAR(255) UNIQUE NOT NULL,
+                        product_name TEXT,
+                        combined_text TEXT,
+                        embedding vector({dimension}),
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        embedding_model VARCHAR(255),
+                        embedding_model_version VARCHAR(50)
+                    )
+                """)
+            conn.commit()
+
+            logger.info(f"🔄 {table_name} -> {shadow}: {self.model_name} v{self.model_version} ile dolduruluyor")
+            copied, watermark = self._copy(cur, conn, table_name, shadow)
+
+            # Doldurma sırasında eklenen/güncellenenler
+            caught_up, watermark = self._catch_up(cur, conn, table_name, shadow, watermark)
+
+            cur.execute(f"""
+                CREATE INDEX ON {shadow} USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)
+            """)
+            conn.commit()
+
+            # Atomik değişim: yazmaları kısa süre durdur, son farkı al, adları değiştir
+            old_name = f"{table_name}__old_{stamp}"
+            # Bölümlü yapıda sadece kategorinin bölümü kilitlenir (diğer kategoriler yazılabilir kalır)
+            cur.execute(f"LOCK TABLE {partition or table_name} IN EXCLUSIVE MODE")
+            final, _ = self._catch_up(cur, conn, table_name, shadow, watermark, commit=False)
+            cur.execute(f"""
+                DELETE FROM {shadow} s
+                WHERE NOT EXISTS (SELECT 1 FROM {table_name} o WHERE o.product_id = s.product_id)
+            """)
+            if partition:
+                category = cur.mogrify('%s', (table_name[:-len('_embeddings')],)).decode()
+                cur.execute(f"ALTER TABLE {PRODUCT_EMBEDDINGS_TABLE} DETACH PARTITION {partition}")
+                cur.execute(f"ALTER TABLE {partition} RENAME TO {old_name}")
+                cur.execute(f"ALTER TABLE {shadow} RENAME TO {partition}")
+                cur.execute(f"ALTER TABLE {PRODUCT_EMBEDDINGS_TABLE} ATTACH PARTITION {partition} "
+                            f"FOR VALUES IN ({category})")
+            else:
+                cur.execute(f"ALTER TABLE {table_name} RENAME TO {old_name}")
+                cur.execute(f"ALTER TABLE {shadow} RENAME TO {table_name}")
+            record_table_model(cur, table_name, self.model_name, self.model_version, dimension)
+            conn.commit()
+            logger.info(f"✅ {table_name} yeni modele geçirildi (eski tablo: {old_name})")
+
+            if drop_old:
+                cur.execute(f"DROP TABLE {old_name}")
+                conn.commit()
+                logger.info(f"🗑️ {old_name} silindi")
+            cur.close()
+
+        return {
+            'table_name': table_name,
+            'model_name': self.model_name,
+            'model_version': self.model_version,
+            'rows': copied + caught_up + final,
+            'old_table': None if drop_old else old_name,
+            'duration_seconds': round(time.time() - started, 2)
+        }
+
+    @staticmethod
+    def _partition_of(cur, table_name: str) -> Optional[str]:
+        """Tablo product_embeddings üzerindeki bir kategori view'ıysa kategorinin bölümü"""
+        if not table_name.endswith('_embeddings'):
+            return None
+        partition = f"{PRODUCT_EMBEDDINGS_TABLE}_{table_name[:-len('_embeddings')]}"
+        cur.execute("""
+            SELECT
+                (SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)),
+                (SELECT relispartition FROM pg_class WHERE oid = to_regclass(%s))
+        """, (table_name, partition))
+        kind, is_partition = cur.fetchone()
+        return partition if kind == 'v' and is_partition else None
+
+    @staticmethod
+    def _create_partition_shadow(cur, table_name: str, shadow: str, dimension: int):
+        """Üst tabloyla aynı yapıda, kategoriye kısıtlı ve bölüm olarak eklenebilir gölge tablo"""
+        cur.execute("""
+            SELECT format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attname = 'embedding'
+        """, (PRODUCT_EMBEDDINGS_TABLE,))
+        parent_type = cur.fetchone()[0]
+        if parent_type != f"vector({dimension})":
+            raise ValueError(f"❌ {PRODUCT_EMBEDDINGS_TABLE} {parent_type} tipinde; {dimension} boyutlu model "
+                             f"bölümlenmiş tabloda kategori bazında değiştirilemez")
+
+        category = cur.mogrify('%s', (table_name[:-len('_embeddings')],)).decode()
+        cur.execute(f"CREATE TABLE {shadow} (LIKE {PRODUCT_EMBEDDINGS_TABLE} INCLUDING DEFAULTS)")
+        cur.execute(f"""
+            ALTER TABLE {shadow}
+            ALTER COLUMN {PARTITION_KEY} SET DEFAULT {category},
+            ADD CHECK ({PARTITION_KEY} = {category}),
+            ADD UNIQUE (product_id)
+        """)
+
+    def _copy(self, cur, conn, table_name: str, shadow: str):
+        """Eski tabloyu id sırasıyla oku, encode et, gölge tabloya yaz"""
+        copied = 0
+        last_id = 0
+        watermark = None
+        while True:
+            cur.execute(f"""
+                SELECT id, product_id, product_name, combined_text, created_at
+                FROM {table_name}
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, self.batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            self._write(cur, shadow, [row[1:] for row in rows])
+            conn.commit()
+
+            last_id = rows[-1][0]
+            copied += len(rows)
+            batch_watermark = max((row[4] for row in rows if row[4] is not None), default=None)
+            if batch_watermark is not None and (watermark is None or batch_watermark > watermark):
+                watermark = batch_watermark
+            logger.info(f"📦 {shadow}: {copied} satır")
+        return copied, watermark
+
+    def _catch_up(self, cur, conn, table_name: str, shadow: str, watermark, commit: bool = True):
+        """Gölge tabloda olmayan ya da watermark'tan sonra eklenen satırları işle"""
+        cur.execute(f"""
+            SELECT o.product_id, o.product_name, o.combined_text, o.created_at
+            FROM {table_name} o
+            LEFT JOIN {shadow} s ON s.product_id = o.product_id
+            WHERE s.product_id IS NULL
+            OR (%s::timestamp IS NOT NULL AND o.created_at >= %s::timestamp)
+            OR s.combined_text IS DISTINCT FROM o.combined_text
+        """, (watermark, watermark))
+        rows = cur.fetchall()
+        for start in range(0, len(rows), self.batch_size):
+            self._write(cur, shadow, rows[start:start + self.batch_size])
+        if commit:
+            conn.commit()
+
+        new_watermark = max((row[3] for row in rows if row[3] is not None), default=watermark)
+        if watermark is not None and new_watermark is not None:
+            new_watermark = max(watermark, new_watermark)
+        return len(rows), new_watermark
+
+    def _write(self, cur, shadow: str, rows: List[tuple]):
+        """(product_id, product_name, combined_text, created_at) satırlarını encode edip upsert et"""
+        if not rows:
+            return
+        texts = [row[2] or row[1] or '' for row in rows]
+        vectors = np.asarray(self.model.encode(texts, batch_size=min(len(texts), 64), convert_to_numpy=True,
+                                               show_progress_bar=False), dtype=np.float32)
+        values = [
+            (product_id, product_name, combined_text, '[' + ','.join(str(float(x)) for x in vector) + ']',
+             created_at, self.model_name, self.model_version)
+            for (product_id, product_name, combined_text, created_at), vector in zip(rows, vectors)
+        ]
+        execute_values(cur, f"""
+            INSERT INTO {shadow} (product_id, product_name, combined_text, embedding, created_at,
+                                  embedding_model, embedding_model_version)
+            VALUES %s
+            ON CONFLICT (product_id) DO UPDATE SET
+                product_name = EXCLUDED.product_name,
+                combined_text = EXCLUDED.combined_text,
+                embedding = EXCLUDED.embedding,
+                created_at = EXCLUDED.created_at
+        """, values, template="(%s, %s, %s, %s::vector, %s, %s, %s)", page_size=len(values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model sürümlü embedding tabloları')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='Tabloların kayıtlı modelleri')
+
+    reembed = subparsers.add_parser('reembed', help='Tabloyu yeni modelle yeniden oluştur ve değiştir')
+    reembed.add_argument('tables', nargs='+', help='Embedding tabloları (örn. telephone_embeddings)')
+    reembed.add_argument('--model', default=None, help='Varsayılan: EMBEDDING_MODEL')
+    reembed.add_argument('--version', default=EMBEDDING_MODEL_VERSION)
+    reembed.add_argument('--batch-size', type=int, default=256)
+    reembed.add_argument('--drop-old', action='store_true', help='Değişimden sonra eski tabloyu sil')
+
+    register = subparsers.add_parser('register', help='Mevcut tabloyu belirtilen modelle etiketle')
+    register.add_argument('tables', nargs='+')
+    register.add_argument('--model', required=True)
+    register.add_argument('--version', default=EMBEDDING_MODEL_VERSION)
+    register.add_argument('--dimension', type=int, default=384)
+
+    args = parser.parse_args()
+
+    from create_missing_embeddings import load_db_config
+    from db_pool import get_pool
+    from model_registry import QUERY_MODEL_NAME
+
+    db_pool = get_pool(load_db_config())
+
+    if args.command == 'status':
+        for table_name, (model_name, model_version, dimension) in sorted(EmbeddingStore(db_pool).table_models().items()):
+            print(f"{table_name:<40} {model_name} v{model_version} ({dimension})")
+    elif args.command == 'register':
+        with db_pool.connection() as conn:
+            cur = conn.cursor()
+            for table_name in args.tables:
+                ensure_model_columns(cur, table_name)
+                cur.execute(f"""
+                    UPDATE {table_name}
+                    SET embedding_model = %s, embedding_model_version = %s
+                    WHERE embedding IS NOT NULL
+                """, (args.model, args.version))
+                record_table_model(cur, table_name, args.model, args.version, args.dimension)
+            conn.commit()
+            cur.close()
+        logger.info(f"✅ {args.tables} {args.model} v{args.version} olarak etiketlendi")
+    else:
+        pipeline = ReembedPipeline(db_pool, args.model or QUERY_MODEL_NAME, args.version, args.batch_size)
+        for table_name in args.tables:
+            logger.info(f"📊 {pipeline.reembed_table(table_name, drop_old=args.drop_old)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,16 @@ export const apiService = {
   createEmbeddings: () => 
     apiClient.post('/embeddings/create'),
   
+  // Embedding jobs
+  getEmbeddingJobs: () => 
+    apiClient.get('/embeddings/jobs'),
+  
+  getEmbeddingJob: (jobId) => 
+    apiClient.get(`/embeddings/jobs/${jobId}`),
+  
+  cancelEmbeddingJob: (jobId) => 
+    apiClient.post(`/embeddings/jobs/${jobId}/cancel`),
+  
   // Test services
   testServices: () => 
     apiClient.get('/test'),
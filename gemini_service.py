@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 from typing import List, Dict, Any
 import logging
 import time
+import asyncio
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -25,13 +26,18 @@ class GeminiService:
 
         logger.info("✅ Gemini API başlatıldı")
 
-    def analyze_product_with_context(
-            self,
-            user_query: str,
-            context: str,
-            user_product_info: str = ""
-    ) -> str:
-        """Satıcı için ürün risk analizi yap"""
+    @staticmethod
+    def _generation_config():
+        return genai.types.GenerationConfig(
+            temperature=0.7,
+            max_output_tokens=8192,
+            top_p=0.9,
+            top_k=40
+        )
+
+    @staticmethod
+    def _build_analysis_prompt(user_query: str, context: str, user_product_info: str = "") -> str:
+        """Ürün analizi isteğinin prompt'u"""
 
         system_prompt = """
 Sen uzman bir SATICI KOÇU ve e-ticaret strateji danışmanısın. 
@@ -92,6 +98,24 @@ Veritabanındaki tüm veriler ve risk skorları kullanılarak satıcıya özel t
 
 Lütfen yukarıdaki format ile kapsamlı analiz yap ve kullanıcıya en iyi stratejik önerileri sun.
 """
+        return user_prompt
+
+    @staticmethod
+    def _analysis_text(response) -> str:
+        if response and response.text:
+            logger.info("✅ Gemini API analizi tamamlandı")
+            return response.text
+        logger.error("❌ Gemini API boş yanıt döndü")
+        return "❌ Analiz sırasında bir sorun oluştu. Lütfen tekrar deneyin."
+
+    def analyze_product_with_context(
+            self,
+            user_query: str,
+            context: str,
+            user_product_info: str = ""
+    ) -> str:
+        """Satıcı için ürün risk analizi yap"""
+        user_prompt = self._build_analysis_prompt(user_query, context, user_product_info)
 
         try:
             logger.info("🔄 Gemini API'ye analiz isteği gönderiliyor...")
@@ -99,22 +123,31 @@ Lütfen yukarıdaki format ile kapsamlı analiz yap ve kullanıcıya en iyi stra
             # Rate limiting için kısa bekleme
             time.sleep(0.5)
 
-            response = self.model.generate_content(
-                user_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=8192,
-                    top_p=0.9,
-                    top_k=40
-                )
-            )
+            response = self.model.generate_content(user_prompt, generation_config=self._generation_config())
+            return self._analysis_text(response)
 
-            if response and response.text:
-                logger.info("✅ Gemini API analizi tamamlandı")
-                return response.text
-            else:
-                logger.error("❌ Gemini API boş yanıt döndü")
-                return "❌ Analiz sırasında bir sorun oluştu. Lütfen tekrar deneyin."
+        except Exception as e:
+            logger.error(f"❌ Gemini API hatası: {e}")
+            return f"❌ Analiz sırasında hata oluştu: {str(e)}"
+
+    async def analyze_product_with_context_async(
+            self,
+            user_query: str,
+            context: str,
+            user_product_info: str = ""
+    ) -> str:
+        """analyze_product_with_context'in event loop'u bloklamayan sürümü (ASGI)"""
+        user_prompt = self._build_analysis_prompt(user_query, context, user_product_info)
+
+        try:
+            logger.info("🔄 Gemini API'ye analiz isteği gönderiliyor (async)...")
+
+            # Rate limiting için kısa bekleme
+            await asyncio.sleep(0.5)
+
+            response = await self.model.generate_content_async(user_prompt,
+                                                               generation_config=self._generation_config())
+            return self._analysis_text(response)
 
         except Exception as e:
             logger.error(f"❌ Gemini API hatası: {e}")
@@ -155,13 +188,10 @@ Maksimum 300 kelime.
             logger.error(f"❌ Özet oluşturma hatası: {e}")
             return "Özet oluşturma sırasında hata oluştu."
 
-    def generate_response(self, prompt: str) -> str:
-        """Satıcı odaklı yanıt oluştur"""
-        try:
-            logger.info("🔄 Gemini API'ye satıcı koçluk isteği gönderiliyor...")
-            
-            # Satıcı odaklı sistem prompt'u ekle
-            system_prompt = """
+    @staticmethod
+    def _build_response_prompt(prompt: str) -> str:
+        """Satıcı odaklı sistem prompt'u ekle"""
+        system_prompt = """
 Sen uzman bir SATICI KOÇU'sun. Kullanıcılar satıcı ve sen onların satışlarını artırmalarına, 
 karlılıklarını maksimize etmelerine ve rekabet avantajı elde etmelerine yardımcı oluyorsun.
 
@@ -173,26 +203,36 @@ Yanıtlarında:
 - Türkçe kullan
 - Satış stratejileri, fiyatlandırma, stok yönetimi, müşteri hizmetleri konularında tavsiye ver
 """
-            
-            full_prompt = f"{system_prompt}\n\nKULLANICI SORUSU: {prompt}\n\nSATICI KOÇU YANITI:"
-            
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=8192,
-                    top_p=0.9,
-                    top_k=40
-                )
-            )
-            
-            if response and response.text:
-                logger.info("✅ Satıcı koçluk yanıtı alındı")
-                return response.text
-            else:
-                logger.error("❌ Gemini API boş yanıt döndü")
-                return "❌ Yanıt oluşturulamadı. Lütfen tekrar deneyin."
-                
+        return f"{system_prompt}\n\nKULLANICI SORUSU: {prompt}\n\nSATICI KOÇU YANITI:"
+
+    @staticmethod
+    def _response_text(response) -> str:
+        if response and response.text:
+            logger.info("✅ Satıcı koçluk yanıtı alındı")
+            return response.text
+        logger.error("❌ Gemini API boş yanıt döndü")
+        return "❌ Yanıt oluşturulamadı. Lütfen tekrar deneyin."
+
+    def generate_response(self, prompt: str) -> str:
+        """Satıcı odaklı yanıt oluştur"""
+        try:
+            logger.info("🔄 Gemini API'ye satıcı koçluk isteği gönderiliyor...")
+            response = self.model.generate_content(self._build_response_prompt(prompt),
+                                                   generation_config=self._generation_config())
+            return self._response_text(response)
+
+        except Exception as e:
+            logger.error(f"❌ Gemini API hatası: {e}")
+            return f"❌ Yanıt oluşturma hatası: {str(e)}"
+
+    async def generate_response_async(self, prompt: str) -> str:
+        """generate_response'un event loop'u bloklamayan sürümü (ASGI)"""
+        try:
+            logger.info("🔄 Gemini API'ye satıcı koçluk isteği gönderiliyor (async)...")
+            response = await self.model.generate_content_async(self._build_response_prompt(prompt),
+                                                               generation_config=self._generation_config())
+            return self._response_text(response)
+
         except Exception as e:
             logger.error(f"❌ Gemini API hatası: {e}")
             return f"❌ Yanıt oluşturma hatası: {str(e)}"
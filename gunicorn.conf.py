@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+"""
+Production sunucu ayarları
+
+    gunicorn -c gunicorn.conf.py
+
+Uygulama master süreçte bir kez yüklenir (preload); embedding modeli fork öncesi
+belleğe alındığı için ağırlıklar worker'lar arasında copy-on-write paylaşılır. Her
+worker fork sonrası kendi veritabanı bağlantılarını açar ve arka plan thread'lerini
+başlatır.
+"""
+import importlib
+import multiprocessing
+import os
+
+# app.py preload modunu buradan öğrenir (modeli senkron yükle, thread'leri başlatma)
+os.environ.setdefault('APP_PRELOAD', 'true')
+
+APP_MODULE = 'backend.app'
+
+wsgi_app = f'{APP_MODULE}:app'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+preload_app = True
+
+# I/O ağırlıklı istekler (Gemini, veritabanı) için worker başına thread
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Gemini analizleri uzun sürebilir; kapanışta süren istekler graceful_timeout kadar beklenir
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Bellek sızıntısına karşı worker'ları belirli istek sayısından sonra yenile (0: kapalı)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Master: preload sırasında açılmış bağlantıları fork'tan önce kapat"""
+    from db_pool import close_all_pools
+    close_all_pools(forget=False)
+
+
+def post_fork(server, worker):
+    """Worker: bağlantı havuzlarını sıfırla, torch thread'lerini sınırla, arka plan işlerini başlat"""
+    from db_pool import reset_pools_after_fork
+    reset_pools_after_fork()
+
+    # Worker başına torch thread'i: varsayılan çekirdek / worker (aşırı abonelik olmasın)
+    torch_threads = int(os.getenv('GUNICORN_TORCH_THREADS', '0')) or max(1, multiprocessing.cpu_count() // workers)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    importlib.import_module(APP_MODULE).start_background_services()
+    server.log.info(f"✅ Worker {worker.pid} hazır (torch thread: {torch_threads})")
+
+
+def worker_exit(server, worker):
+    """Worker kapanırken arka plan işlerini durdur ve bağlantıları kapat"""
+    from db_pool import close_all_pools
+    importlib.import_module(APP_MODULE).stop_background_services()
+    close_all_pools()
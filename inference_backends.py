@@ -0,0 +1,178 @@
+# inference_backends.py
+import os
+import logging
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = 'torch'
+BACKEND_TORCH_INT8 = 'torch-int8'
+BACKEND_ONNX = 'onnx'
+BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX)
+
+# Alternatif backend'in referans (fp32 torch) modele göre minimum cosine benzerliği
+PARITY_THRESHOLD = 0.99
+
+# Parity kontrolü ve benchmark için örnek sorgular
+SAMPLE_TEXTS = [
+    "Samsung klima",
+    "iPhone",
+    "Apple iPhone kulaklık",
+    "uygun fiyatlı bluetooth kulaklık",
+    "oyuncu bilgisayarı RTX ekran kartı",
+    "Xiaomi telefon 128 GB",
+    "sessiz çalışan inverter klima 12000 BTU",
+    "Ürün: Lenovo IdeaPad | Marka: Lenovo | Kategori: Bilgisayar | Fiyat: 18999 TL",
+    "gürültü önleyici kablosuz kulaklık",
+    "en çok satan akıllı telefonlar",
+]
+
+
+def default_backend() -> str:
+    backend = os.getenv('EMBEDDING_BACKEND', BACKEND_TORCH)
+    if backend not in BACKENDS:
+        raise ValueError(f"❌ Geçersiz embedding backend'i: {backend} (seçenekler: {BACKENDS})")
+    return backend
+
+
+def load_torch_model(model_name: str):
+    """Referans fp32 SentenceTransformer"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device='cpu')
+
+
+def load_torch_int8_model(model_name: str):
+    """Linear katmanları dinamik int8 quantize edilmiş SentenceTransformer"""
+    import torch
+    model = load_torch_model(model_name)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxSentenceEncoder:
+    """
+    Transformer gövdesi ONNX Runtime ile çalışan SentenceTransformer muadili
+
+    Gövde ilk kullanımda ONNX'e export edilir (EMBEDDING_ONNX_DIR altında saklanır);
+    pooling ve normalize adımları orijinal modelin ayarlarıyla NumPy'da yapılır.
+    encode() imzası SentenceTransformer.encode ile uyumludur.
+    """
+
+    def __init__(self, model_name: str, cache_dir: Optional[str] = None):
+        import onnxruntime
+
+        reference = load_torch_model(model_name)
+        transformer = reference[0]
+        self.tokenizer = transformer.tokenizer
+        self.max_seq_length = transformer.max_seq_length
+        self.pooling_mode = self._pooling_mode(reference)
+        self.normalize = any(type(module).__name__ == 'Normalize' for module in reference)
+
+        cache_dir = cache_dir or os.getenv('EMBEDDING_ONNX_DIR', 'onnx_models')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.onnx_path = os.path.join(cache_dir, model_name.replace('/', '__') + '.onnx')
+        if not os.path.exists(self.onnx_path):
+            self._export(transformer.auto_model, self.onnx_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.getenv('EMBEDDING_ONNX_THREADS', '0'))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(self.onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    @staticmethod
+    def _pooling_mode(reference) -> str:
+        pooling = reference[1]
+        if getattr(pooling, 'pooling_mode_mean_tokens', False):
+            return 'mean'
+        if getattr(pooling, 'pooling_mode_cls_token', False):
+            return 'cls'
+        raise ValueError("❌ ONNX backend sadece mean/cls pooling destekler")
+
+    def _export(self, auto_model, path: str):
+        """Transformer gövdesini dinamik batch/sekans boyutlu ONNX'e çevir"""
+        import torch
+
+        logger.info(f"🔄 ONNX export: {path}")
+        sample = self.tokenizer(["örnek metin"], return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+        auto_model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model,
+                tuple(sample[name] for name in input_names),
+                path,
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            tokens = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_seq_length,
+                                    return_tensors='np')
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.pooling_mode == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = tokens['attention_mask'][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def load_model(model_name: str, backend: str = BACKEND_TORCH):
+    """Modeli verilen backend ile yükle"""
+    if backend == BACKEND_TORCH:
+        return load_torch_model(model_name)
+    if backend == BACKEND_TORCH_INT8:
+        return load_torch_int8_model(model_name)
+    if backend == BACKEND_ONNX:
+        return OnnxSentenceEncoder(model_name)
+    raise ValueError(f"❌ Geçersiz embedding backend'i: {backend} (seçenekler: {BACKENDS})")
+
+
+def parity_check(reference, candidate, texts: Optional[List[str]] = None,
+                 threshold: float = PARITY_THRESHOLD) -> Dict[str, Any]:
+    """
+    Aday backend'in embedding'lerini referansla karşılaştır
+
+    Returns:
+        min/ortalama cosine benzerliği ve eşiği geçip geçmediği
+    """
+    texts = texts or SAMPLE_TEXTS
+    expected = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+    expected = expected / np.clip(np.linalg.norm(expected, axis=1, keepdims=True), 1e-12, None)
+    actual = actual / np.clip(np.linalg.norm(actual, axis=1, keepdims=True), 1e-12, None)
+    cosines = (expected * actual).sum(axis=1)
+
+    return {
+        'min_cosine': round(float(cosines.min()), 5),
+        'mean_cosine': round(float(cosines.mean()), 5),
+        'threshold': threshold,
+        'passed': bool(cosines.min() >= threshold)
+    }
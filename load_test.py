@@ -0,0 +1,98 @@
+# load_test.py
+"""
+Flask ve ASGI sunum yollarını aynı yük altında karşılaştır
+
+Her hedefe verilen eşzamanlılıkla süre boyunca istek gönderilir; req/s, p50/p95/p99
+gecikme ve hata oranı raporlanır.
+
+    python load_test.py --target flask=http://localhost:5000 --target asgi=http://localhost:8000 \\
+        --endpoint chat --concurrency 200 --duration 30
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, Any, List, Tuple
+
+import httpx
+import numpy as np
+
+# Endpoint adı -> (method, path, JSON gövdesi)
+ENDPOINTS: Dict[str, Tuple[str, str, Any]] = {
+    'health': ('GET', '/api/health', None),
+    'search': ('POST', '/api/search', {'query': 'Samsung klima', 'limit': 10}),
+    'chat': ('POST', '/api/ai/chat', {'message': 'Bluetooth kulaklık satmak mantıklı mı?'}),
+    'stats': ('GET', '/api/tables/stats', None),
+}
+
+
+async def _worker(client: httpx.AsyncClient, method: str, url: str, body: Any, deadline: float,
+                  latencies: List[float], errors: List[str]):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body)
+            if response.status_code >= 400:
+                errors.append(str(response.status_code))
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+async def run_load(base_url: str, endpoint: str, concurrency: int, duration: float,
+                   timeout: float) -> Dict[str, Any]:
+    """Tek hedefe yük uygula ve özet metrikleri döndür"""
+    method, path, body = ENDPOINTS[endpoint]
+    url = base_url.rstrip('/') + path
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(_worker(client, method, url, body, deadline, latencies, errors)
+                               for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = len(latencies) + len(errors)
+    return {
+        'requests': total,
+        'ok': len(latencies),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / total, 4) if total else None,
+        'req_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        'p95_ms': round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask / ASGI yük testi (req/s ve p99 karşılaştırması)')
+    parser.add_argument('--target', action='append', required=True,
+                        help='ad=url, örn. flask=http://localhost:5000 (birden fazla verilebilir)')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='chat')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30, help='Hedef başına süre (sn)')
+    parser.add_argument('--timeout', type=float, default=120, help='İstek zaman aşımı (sn)')
+    args = parser.parse_args()
+
+    results = []
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if not url:
+            name, url = target, target
+        print(f"🔄 {name}: {args.endpoint} x {args.concurrency} eşzamanlı, {args.duration:.0f} sn")
+        result = asyncio.run(run_load(url, args.endpoint, args.concurrency, args.duration, args.timeout))
+        results.append((name, result))
+
+    print(f"\n{'hedef':<10} {'istek':>7} {'hata':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results:
+        row = [result[key] if result[key] is not None else float('nan') for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{name:<10} {result['requests']:>7} {result['errors']:>6} {result['req_per_second']:>8.1f} "
+              f"{row[0]:>9.1f} {row[1]:>9.1f} {row[2]:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# model_registry.py
+import threading
+import time
+import os
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from inference_backends import BACKEND_TORCH, default_backend, load_model, parity_check
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Arama sorguları ve *_embeddings tabloları için (Türkçe destekli)
+QUERY_MODEL_NAME = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+# create_missing_embeddings backfill modeli; sorgu vektörleriyle karşılaştırılabilmesi için
+# varsayılan olarak sorgu modeliyle aynıdır
+BACKFILL_MODEL_NAME = os.getenv('BACKFILL_EMBEDDING_MODEL', QUERY_MODEL_NAME)
+
+# (model adı, backend) -> model
+_models: Dict[Tuple[str, str], Any] = {}
+_load_info: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_registry_lock = threading.Lock()
+_model_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def get_model(model_name: str, backend: Optional[str] = None):
+    """
+    Modeli süreç başına bir kez yükle ve paylaş
+
+    İlk çağrıda yüklenir; aynı anda gelen çağrılar yüklemenin bitmesini bekler.
+    backend verilmezse EMBEDDING_BACKEND kullanılır. torch dışındaki backend'ler
+    EMBEDDING_BACKEND_PARITY_CHECK açıkken referans modelle karşılaştırılır; eşiği
+    geçemezlerse torch modeline dönülür.
+    """
+    backend = backend or default_backend()
+    key = (model_name, backend)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        lock = _model_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        model = _models.get(key)
+        if model is None:
+            logger.info(f"🔄 Embedding model yükleniyor: {model_name} ({backend})")
+            started = time.time()
+            model = load_model(model_name, backend)
+            info: Dict[str, Any] = {'load_seconds': round(time.time() - started, 2)}
+
+            if backend != BACKEND_TORCH and os.getenv('EMBEDDING_BACKEND_PARITY_CHECK', 'true').lower() == 'true':
+                # Referans model kayıtlı değilse sadece kontrol için yüklenir, saklanmaz
+                reference = _models.get((model_name, BACKEND_TORCH)) or load_model(model_name, BACKEND_TORCH)
+                info['parity'] = parity_check(reference, model)
+                if not info['parity']['passed']:
+                    logger.error(f"❌ {backend} backend'i parity kontrolünü geçemedi ({info['parity']}), "
+                                 f"torch kullanılacak")
+                    model = reference
+
+            _load_info[key] = info
+            _models[key] = model
+            logger.info(f"✅ Embedding model yüklendi: {model_name} ({backend}, {info['load_seconds']} sn)")
+        return model
+
+
+def warm_up(model_names: List[str]):
+    """Modelleri önceden yükle"""
+    for model_name in model_names:
+        get_model(model_name)
+
+
+def warm_up_in_background(model_names: List[str]) -> threading.Thread:
+    """Modelleri arka planda yükle (sunucu açılışını bekletmez)"""
+    def run():
+        try:
+            warm_up(model_names)
+        except Exception as e:
+            logger.error(f"❌ Model ön yükleme hatası: {e}")
+
+    thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_loaded(model_name: str, backend: Optional[str] = None) -> bool:
+    return (model_name, backend or default_backend()) in _models
+
+
+def loaded_models() -> Dict[str, Any]:
+    """Yüklü modeller, yükleme süreleri ve parity sonuçları"""
+    return {f"{name} ({backend})": dict(_load_info.get((name, backend), {})) for name, backend in _models}
+
+
+def unload(model_name: Optional[str] = None):
+    """Modeli (tüm backend'leriyle ya da hepsini) registry'den çıkar"""
+    with _registry_lock:
+        for key in list(_models):
+            if model_name is None or key[0] == model_name:
+                _models.pop(key, None)
+                _load_info.pop(key, None)
@@ -0,0 +1,244 @@
+# partitioned_storage.py
+"""
+Birleşik, kategoriye göre bölümlenmiş ürün ve embedding tabloları
+
+    products            PARTITION BY LIST (source_table)  -> products_<kategori>
+    product_embeddings  PARTITION BY LIST (source_table)  -> product_embeddings_<kategori>
+
+Eski kategori adları (telephone, telephone_embeddings, ...) aynı sütunlarla view olarak
+korunur; okuma, UPDATE ve DELETE view'lar üzerinden çalışmaya devam eder. Yeni satırlar
+source_table değeriyle doğrudan üst tablolara eklenmelidir. Kategoriler arası işlemler
+(arama, istatistik, marka, satış verisi) üst tablolarda tek sorgu olarak çalışır.
+
+    python partitioned_storage.py status
+    python partitioned_storage.py migrate [kategori ...] [--drop-legacy]
+"""
+import argparse
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PRODUCTS_TABLE = 'products'
+PRODUCT_EMBEDDINGS_TABLE = 'product_embeddings'
+PARTITION_KEY = 'source_table'
+
+
+def is_unified(schema_catalog) -> bool:
+    """Bölümlenmiş üst tablolar mevcut mu?"""
+    return (schema_catalog.relation_kind(PRODUCTS_TABLE) == 'p'
+            and schema_catalog.relation_kind(PRODUCT_EMBEDDINGS_TABLE) == 'p')
+
+
+def split_unified_categories(schema_catalog, categories: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Kategorileri ayır: (birleşik tablolara taşınmış olanlar, hâlâ ayrı tablolu olanlar)
+
+    Taşınmış kategoride hem kaynak hem embedding adı üst tablolar üzerindeki view'dır.
+    """
+    if not is_unified(schema_catalog):
+        return [], list(categories)
+    unified, legacy = [], []
+    for category in categories:
+        migrated = (schema_catalog.relation_kind(category) == 'v'
+                    and schema_catalog.relation_kind(f"{category}_embeddings") == 'v')
+        (unified if migrated else legacy).append(category)
+    return unified, legacy
+
+
+class PartitionMigrator:
+    """
+    Kategori tablolarını bölümlenmiş üst tablolara taşır
+
+    Kategori başına tek transaction: bölüm oluşturulur, veriler kopyalanır, eski tablo
+    {ad}__legacy_<zaman> olarak saklanır ve aynı adla view oluşturulur. Üst tablo
+    sütunları taşınan tabloların sütunlarının birleşimidir.
+    """
+
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+
+    def status(self) -> Dict[str, Any]:
+        """Üst tablolar ve bölüm başına satır sayısı"""
+        with self.db_pool.cursor() as cur:
+            result = {}
+            for parent in (PRODUCTS_TABLE, PRODUCT_EMBEDDINGS_TABLE):
+                if self._relation_kind(cur, parent) != 'p':
+                    result[parent] = None
+                    continue
+                cur.execute(f"SELECT {PARTITION_KEY}, COUNT(*) FROM {parent} GROUP BY {PARTITION_KEY}")
+                result[parent] = dict(cur.fetchall())
+            return result
+
+    def legacy_categories(self) -> List[str]:
+        """Henüz taşınmamış (kaynak ve embedding tablosu normal tablo olan) kategoriler"""
+        with self.db_pool.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public'
+                AND c.relkind = 'r'
+                AND NOT c.relispartition
+                AND c.relname LIKE '%\\_embeddings'
+                ORDER BY c.relname
+            """)
+            candidates = [row[0][:-len('_embeddings')] for row in cur.fetchall()]
+            return [category for category in candidates if self._relation_kind(cur, category) == 'r']
+
+    def migrate_category(self, category: str, drop_legacy: bool = False) -> Dict[str, Any]:
+        """Kategorinin kaynak ve embedding tablolarını bölümlere taşı"""
+        started = time.time()
+        stamp = int(started)
+        summary: Dict[str, Any] = {'category': category}
+
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            for legacy_table, parent in ((category, PRODUCTS_TABLE),
+                                         (f"{category}_embeddings", PRODUCT_EMBEDDINGS_TABLE)):
+                kind = self._relation_kind(cur, legacy_table)
+                if kind == 'v':
+                    logger.info(f"ℹ️ {legacy_table} zaten taşınmış")
+                    continue
+                if kind != 'r':
+                    raise ValueError(f"❌ {legacy_table} tablosu bulunamadı")
+
+                columns = self._column_types(cur, legacy_table)
+                self._ensure_parent(cur, parent, columns)
+                summary[legacy_table] = self._move(cur, category, legacy_table, parent, columns, stamp, drop_legacy)
+
+            # Kaynak tabloya bağlı istatistik görünümleri eski tabloyu gösterir; view üzerinden yeniden oluşur
+            cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {category}_price_stats_mv, {category}_brand_stats_mv")
+            conn.commit()
+            cur.close()
+
+        summary['duration_seconds'] = round(time.time() - started, 2)
+        logger.info(f"✅ {category} birleşik tablolara taşındı: {summary}")
+        return summary
+
+    def _move(self, cur, category: str, legacy_table: str, parent: str, columns: List[Tuple[str, str]],
+              stamp: int, drop_legacy: bool) -> Dict[str, Any]:
+        partition = f"{parent}_{category}"
+        category_literal = cur.mogrify('%s', (category,)).decode()
+        column_sql = ', '.join(name for name, _ in columns)
+
+        cur.execute(f"CREATE TABLE {partition} PARTITION OF {parent} FOR VALUES IN ({category_literal})")
+        cur.execute(f"""
+            INSERT INTO {parent} ({PARTITION_KEY}, {column_sql})
+            SELECT %s, {column_sql} FROM {legacy_table}
+        """, (category,))
+        rows = cur.rowcount
+
+        if 'embedding' in dict(columns):
+            # ivfflat listeleri bölüm boşken oluşturuldu; veriyle yeniden eğit
+            cur.execute(f"REINDEX TABLE {partition}")
+
+        if 'id' in dict(columns):
+            # Üst tablonun id sekansı taşınan en büyük id'den devam etsin
+            cur.execute(f"""
+                SELECT setval('{parent}_id_seq', GREATEST(
+                    (SELECT COALESCE(MAX(id), 0) FROM {parent}),
+                    (SELECT last_value FROM {parent}_id_seq)
+                ))
+            """)
+
+        legacy_name = f"{legacy_table}__legacy_{stamp}"
+        cur.execute(f"ALTER TABLE {legacy_table} RENAME TO {legacy_name}")
+        # Aynı sütunlar, aynı sıra; basit tek tablolu view olduğu için UPDATE/DELETE desteklenir
+        cur.execute(f"""
+            CREATE VIEW {legacy_table} AS
+            SELECT {column_sql} FROM {parent} WHERE {PARTITION_KEY} = {category_literal}
+        """)
+        if drop_legacy:
+            cur.execute(f"DROP TABLE {legacy_name}")
+
+        logger.info(f"📦 {legacy_table} -> {partition}: {rows} satır")
+        return {'partition': partition, 'rows': rows, 'legacy_table': None if drop_legacy else legacy_name}
+
+    def _ensure_parent(self, cur, parent: str, columns: List[Tuple[str, str]]):
+        """Üst tabloyu oluştur ya da eksik sütunlarını ekle"""
+        if self._relation_kind(cur, parent) is None:
+            definitions = [f"{PARTITION_KEY} VARCHAR(255) NOT NULL"]
+            definitions += [f"{name} {data_type}" for name, data_type in columns]
+            names = dict(columns)
+            if 'id' in names:
+                definitions.append(f"PRIMARY KEY ({PARTITION_KEY}, id)")
+            if 'product_id' in names:
+                definitions.append(f"UNIQUE ({PARTITION_KEY}, product_id)")
+
+            cur.execute(f"CREATE TABLE {parent} ({', '.join(definitions)}) PARTITION BY LIST ({PARTITION_KEY})")
+            if 'id' in names:
+                cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {parent}_id_seq")
+                cur.execute(f"ALTER TABLE {parent} ALTER COLUMN id SET DEFAULT nextval('{parent}_id_seq')")
+            if 'created_at' in names:
+                cur.execute(f"ALTER TABLE {parent} ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP")
+            if 'embedding' in names:
+                # Bölüm başına ivfflat indeksi oluşturulur; sorgular bölümler üzerinde birleştirilir
+                cur.execute(f"""
+                    CREATE INDEX ON {parent} USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)
+                """)
+            logger.info(f"✅ {parent} bölümlenmiş tablosu oluşturuldu")
+            return
+
+        existing = dict(self._column_types(cur, parent))
+        for name, data_type in columns:
+            if name not in existing:
+                cur.execute(f"ALTER TABLE {parent} ADD COLUMN {name} {data_type}")
+            elif existing[name] != data_type:
+                raise ValueError(f"❌ {parent}.{name} tipi uyuşmuyor: {existing[name]} / {data_type}")
+
+    @staticmethod
+    def _relation_kind(cur, table_name: str) -> Optional[str]:
+        cur.execute("""
+            SELECT c.relkind
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s
+        """, (table_name,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _column_types(cur, table_name: str) -> List[Tuple[str, str]]:
+        """(sütun, tip) listesi; tanım sırasıyla"""
+        cur.execute("""
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            WHERE a.attrelid = %s::regclass
+            AND a.attnum > 0
+            AND NOT a.attisdropped
+            ORDER BY a.attnum
+        """, (table_name,))
+        return [(name, data_type) for name, data_type in cur.fetchall() if name != PARTITION_KEY]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kategori tablolarını bölümlenmiş products/product_embeddings tablolarına taşı')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='Üst tablolar ve bölüm satır sayıları')
+
+    migrate = subparsers.add_parser('migrate', help='Kategorileri taşı (varsayılan: taşınmamış hepsi)')
+    migrate.add_argument('categories', nargs='*')
+    migrate.add_argument('--drop-legacy', action='store_true', help='Taşımadan sonra eski tabloları sil')
+
+    args = parser.parse_args()
+
+    from create_missing_embeddings import load_db_config
+    from db_pool import get_pool
+
+    migrator = PartitionMigrator(get_pool(load_db_config()))
+
+    if args.command == 'status':
+        for parent, partitions in migrator.status().items():
+            print(f"{parent}: {'yok' if partitions is None else partitions}")
+        return
+
+    for category in args.categories or migrator.legacy_categories():
+        migrator.migrate_category(category, drop_legacy=args.drop_legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,33 @@
 # rag_service.py
-import psycopg2
 import logging
-from typing import List, Dict, Any, Optional
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
 from embedding_service import EmbeddingService
+from vector_index import VectorIndex, to_float32_vector
+from db_pool import get_pool
+from schema_catalog import SchemaCatalog
+from table_stats_cache import TableStatsCache
+from risk_engine import load_table_frame, score_frame
+from risk_store import RiskStore
+from embedding_store import EmbeddingStore, EMBEDDING_MODEL_VERSION
+from partitioned_storage import split_unified_categories, PRODUCTS_TABLE, PRODUCT_EMBEDDINGS_TABLE
+from table_fanout import TableFanout
+from topk import TopK, merge_top_k
 import numpy as np
-import json
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Arama modları: sıralamayı veritabanına (pgvector) ya da Python'a bırak
+SEARCH_MODE_PGVECTOR = 'pgvector'
+SEARCH_MODE_PYTHON = 'python'
+SEARCH_MODE_MEMORY = 'memory'
+SEARCH_MODES = (SEARCH_MODE_PGVECTOR, SEARCH_MODE_PYTHON, SEARCH_MODE_MEMORY)
+
+# Bu değerin altındaki benzerlikler sonuçlara alınmaz
+MIN_SIMILARITY = 0.05
+
 def cosine_similarity_np(a, b):
     """NumPy ile cosine similarity hesapla"""
     try:
@@ -24,9 +43,64 @@ def cosine_similarity_np(a, b):
         logger.warning(f"Similarity hesaplama hatası: {e}")
         return 0.0
 
+def to_pgvector_literal(embedding) -> str:
+    """Embedding'i pgvector metin formatına çevir: '[0.1,0.2,...]'"""
+    return '[' + ','.join(str(float(x)) for x in embedding) + ']'
+
+def build_filter_sql(filters: Optional[Dict[str, Any]], columns: List[str], alias: str = 'p') -> Tuple[List[str], List[Any]]:
+    """
+    /api/search filtrelerini SQL WHERE koşullarına çevir
+    
+    Python tarafındaki filtreyle aynı anlam: boş fiyat/rating 0 kabul edilir, marka
+    karşılaştırması büyük/küçük harf duyarsızdır. Tabloda olmayan sütunların filtresi atlanır.
+    
+    Returns:
+        (koşullar, parametreler)
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    
+    for filter_key, filter_value in (filters or {}).items():
+        if filter_key == 'price_min' and 'price' in columns:
+            clauses.append(f"COALESCE({alias}.price, 0) >= %s")
+            params.append(filter_value)
+        elif filter_key == 'price_max' and 'price' in columns:
+            clauses.append(f"COALESCE({alias}.price, 0) <= %s")
+            params.append(filter_value)
+        elif filter_key == 'brands' and 'brand' in columns:
+            # Çoklu ya da tek marka filtresi
+            brands = filter_value if isinstance(filter_value, list) else [filter_value]
+            clauses.append(f"LOWER({alias}.brand) = ANY(%s)")
+            params.append([str(brand).lower() for brand in brands])
+        elif filter_key == 'rating_min' and 'rating' in columns:
+            clauses.append(f"COALESCE({alias}.rating, 0) >= %s")
+            params.append(filter_value)
+    
+    return clauses, params
+
 class RAGService:
-    def __init__(self):
+    def __init__(self, search_mode: Optional[str] = None):
         self.embedding_service = EmbeddingService()
+        
+        # Arama modu: parametre > RAG_SEARCH_MODE çevre değişkeni > pgvector
+        self.search_mode = search_mode or os.getenv('RAG_SEARCH_MODE', SEARCH_MODE_PGVECTOR)
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"❌ Geçersiz arama modu: {self.search_mode} (seçenekler: {SEARCH_MODES})")
+        
+        # ivfflat indeksinde sorgu başına taranacak liste sayısı
+        self.ivfflat_probes = int(os.getenv('PGVECTOR_PROBES', '10'))
+        # Filtreli aramada indeks sonrası filtre top-k'yı eksik bırakmasın diye tüm listeler
+        # taranır (setup_pgvector.py'deki lists = 100 ile aynı -> tam sonuç)
+        self.filtered_ivfflat_probes = int(os.getenv('PGVECTOR_FILTERED_PROBES', '100'))
+        
+        # python modu: tablo başına taranacak en fazla satır (0: sınırsız) ve sunucu tarafı cursor parça boyu
+        self.python_search_max_rows = int(os.getenv('PYTHON_SEARCH_MAX_ROWS', '200'))
+        self.python_search_batch_size = int(os.getenv('PYTHON_SEARCH_BATCH_SIZE', '2000'))
+        
+        # memory modu: bellekteki vektör indeksi ve artımlı yenileme aralığı
+        self.vector_index = None
+        self.vector_index_refresh_seconds = float(os.getenv('VECTOR_INDEX_REFRESH_SECONDS', '30'))
+        
         # Veritabanı konfigürasyonunu yükle
         try:
             from create_missing_embeddings import load_db_config
@@ -42,59 +116,62 @@ class RAGService:
                 "user": "postgres", 
                 "password": "your_password"
             }
+        
+        # Tüm servislerle paylaşılan bağlantı havuzu
+        self.db_pool = get_pool(self.connection_params)
+        
+        # Tablo/sütun kataloğu; istek başına information_schema sorgusu yapılmaz
+        self.schema_catalog = SchemaCatalog(self.db_pool)
+        # Tablo başına sorguları ayrı bağlantılarda eşzamanlı çalıştırır (zaman aşımı + kısmi sonuç)
+        self.table_fanout = TableFanout(self.db_pool)
+        # Risk skorlaması için tablo başına fiyat/marka istatistikleri
+        self.stats_cache = TableStatsCache(self.db_pool)
+        # product_risk tablosundaki kalıcı skorlar
+        self.risk_store = RiskStore(self.db_pool, self.stats_cache, schema_catalog=self.schema_catalog)
+        
+        # Embedding tablolarının model/sürüm kaydı; sorgu modeliyle uyuşmayan tablolar aranmaz
+        self.embedding_store = EmbeddingStore(self.db_pool)
+        
+        if self.search_mode == SEARCH_MODE_MEMORY:
+            self.vector_index = VectorIndex(self.db_pool)
+    
+    def warm_up_vector_index(self) -> int:
+        """Bellek içi vektör indeksini tüm embedding tablolarıyla doldur"""
+        if self.vector_index is None:
+            self.vector_index = VectorIndex(self.db_pool)
+        return self.vector_index.warm_up(self.get_searchable_tables())
+    
+    def get_searchable_tables(self, table_names: Optional[List[str]] = None) -> List[str]:
+        """Sorgu modeliyle aynı model/sürümle doldurulmuş embedding tabloları"""
+        if table_names is None:
+            table_names = self.get_available_tables()
+        return self.embedding_store.compatible_tables(
+            table_names, self.embedding_service.model_name, EMBEDDING_MODEL_VERSION
+        )
     
     def get_available_tables(self) -> List[str]:
-        """Mevcut embedding tablolarını listele"""
+        """Mevcut embedding tablolarını listele (şema kataloğundan)"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
-            cur.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name LIKE '%_embeddings'
-                ORDER BY table_name
-            """)
-            
-            tables = [row[0] for row in cur.fetchall()]
-            cur.close()
-            conn.close()
-            
-            logger.info(f"📋 Bulunan embedding tabloları: {tables}")
-            return tables
-            
+            return self.schema_catalog.embedding_tables()
         except Exception as e:
             logger.error(f"❌ Tablo listesi alınamadı: {e}")
             return []
     
-    def parse_embedding(self, embedding_data) -> Optional[List[float]]:
-        """Embedding verisini parse et"""
+    def parse_embedding(self, embedding_data) -> Optional[np.ndarray]:
+        """Embedding verisini float32 NumPy vektörüne çevir"""
         try:
             if embedding_data is None:
                 return None
-                
-            # String ise JSON parse et
-            if isinstance(embedding_data, str):
-                try:
-                    parsed = json.loads(embedding_data)
-                    if isinstance(parsed, list):
-                        return [float(x) for x in parsed]
-                    else:
-                        logger.warning(f"JSON string list değil: {type(parsed)}")
-                        return None
-                except json.JSONDecodeError:
-                    logger.warning("JSON parse hatası")
-                    return None
-            
-            # List/array ise direkt kullan
-            elif hasattr(embedding_data, '__iter__') and not isinstance(embedding_data, str):
-                return [float(x) for x in embedding_data]
-            
-            # Diğer durumlar
-            else:
-                logger.warning(f"Bilinmeyen embedding formatı: {type(embedding_data)}")
-                return None
+            
+            # Kayıtlı pgvector tipi: zaten float32 ndarray (kopya yok)
+            if isinstance(embedding_data, np.ndarray):
+                return embedding_data if embedding_data.dtype == np.float32 else embedding_data.astype(np.float32)
+            
+            # Metin ('[0.1,0.2,...]') ya da liste: tek seferde diziye çevir
+            vector = to_float32_vector(embedding_data)
+            if vector is None:
+                logger.warning(f"Boş ya da bilinmeyen embedding formatı: {type(embedding_data)}")
+            return vector
                 
         except Exception as e:
             logger.warning(f"Embedding parse hatası: {e}")
@@ -110,7 +187,7 @@ class RAGService:
             limit: Maksimum sonuç sayısı
         """
         try:
-            logger.info(f"🔍 Arama başlatılıyor: '{query}'")
+            logger.info(f"🔍 Arama başlatılıyor: '{query}' (mod: {self.search_mode})")
             
             # Query embedding'ini oluştur
             query_embedding = self.embedding_service.create_embedding(query)
@@ -120,169 +197,402 @@ class RAGService:
             
             logger.info(f"✅ Query embedding oluşturuldu (boyut: {len(query_embedding)})")
             
-            # Eğer tablo belirtilmemişse tüm tabloları kullan
-            if table_names is None:
-                table_names = self.get_available_tables()
+            # Eğer tablo belirtilmemişse tüm tabloları kullan; farklı modelle doldurulmuş tablolar elenir
+            table_names = self.get_searchable_tables(table_names)
             
             if not table_names:
                 logger.error("❌ Hiç embedding tablosu bulunamadı")
                 return []
             
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
-            all_results = []
-            
-            # Her tablo için arama yap
-            for table_name in table_names:
-                try:
-                    logger.info(f"🔍 {table_name} aranıyor...")
-                    
-                    # Embedding'leri al
-                    cur.execute(f"""
-                        SELECT 
-                            product_id,
-                            product_name,
-                            combined_text,
-                            embedding
-                        FROM {table_name}
-                        WHERE embedding IS NOT NULL
-                        LIMIT 200
-                    """)
-                    
-                    results = cur.fetchall()
-                    logger.info(f"📊 {table_name}: {len(results)} kayıt bulundu")
-                    
-                    # Her sonuç için similarity hesapla
-                    for result in results:
-                        try:
-                            product_id, product_name, combined_text, embedding_vector = result
-                            
-                            # Embedding'i parse et
-                            parsed_embedding = self.parse_embedding(embedding_vector)
-                            if not parsed_embedding:
-                                continue
-                            
-                            # Similarity hesapla
-                            similarity = cosine_similarity_np(query_embedding, parsed_embedding)
-                            
-                            if similarity > 0.05:  # Düşük threshold
-                                all_results.append({
-                                    'product_id': product_id,
-                                    'product_name': product_name, 
-                                    'combined_text': combined_text,
-                                    'similarity': float(similarity),
-                                    'source_table': table_name.replace('_embeddings', '')
-                                })
-                                
-                        except Exception as e:
-                            logger.warning(f"⚠️ Similarity hesaplama hatası: {e}")
-                            continue
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ {table_name} arama hatası: {e}")
-                    continue
-            
-            # Sonuçları benzerlik skoruna göre sırala
-            all_results.sort(key=lambda x: x['similarity'], reverse=True)
-            
-            cur.close()
-            conn.close()
-            
-            logger.info(f"✅ {len(all_results)} sonuç bulundu")
+            # Her mod benzerliğe göre sıralı en iyi `limit` sonucu döndürür
+            if self.search_mode == SEARCH_MODE_PYTHON:
+                results = self._search_tables_python(query_embedding, table_names, limit)
+            elif self.search_mode == SEARCH_MODE_MEMORY:
+                results = self._search_tables_memory(query_embedding, table_names, limit)
+            else:
+                results = self._search_tables_pgvector(query_embedding, table_names, limit)
             
-            # Limit uygula
-            return all_results[:limit]
+            logger.info(f"✅ {len(results)} sonuç bulundu")
+            return results
             
         except Exception as e:
             logger.error(f"❌ Arama hatası: {e}")
             return []
     
-    def get_product_details(self, product_id: str, source_table: str) -> Optional[Dict[str, Any]]:
-        """Ürün detaylarını getir - TÜM veriler dahil"""
+    def _search_tables_pgvector(self, query_embedding: List[float], table_names: List[str], limit: int) -> List[Dict[str, Any]]:
+        """
+        Her tabloda sıralamayı pgvector'a bırak (ivfflat vector_cosine_ops indeksi)
+        
+        Her tablodan sadece en yakın `limit` kayıt döner; sıralı tablo sonuçları birleştirilir.
+        Birleşik tablolara taşınmış kategoriler product_embeddings üzerinde tek sorguyla aranır.
+        Tablo sorguları havuzdaki ayrı bağlantılarda eşzamanlı çalışır (table_fanout).
+        """
+        vector_literal = to_pgvector_literal(query_embedding)
+        unified, legacy = split_unified_categories(
+            self.schema_catalog, [table_name.replace('_embeddings', '') for table_name in table_names]
+        )
+        
+        tasks = {f"{category}_embeddings": partial(self._search_table_pgvector, table_name=f"{category}_embeddings",
+                                                   vector_literal=vector_literal, limit=limit)
+                 for category in legacy}
+        if unified:
+            tasks[PRODUCT_EMBEDDINGS_TABLE] = partial(self._search_unified_pgvector, vector_literal=vector_literal,
+                                                      categories=unified, limit=limit)
+        
+        outcome = self.table_fanout.run(tasks, label='pgvector arama')
+        # Tablo sonuçları zaten mesafeye göre sıralı; tembel birleştirme ile ilk `limit`
+        return merge_top_k(outcome.results.values(), limit)
+    
+    def _search_table_pgvector(self, cur, table_name: str, vector_literal: str, limit: int) -> List[Dict[str, Any]]:
+        logger.info(f"🔍 {table_name} aranıyor (pgvector)...")
+        
+        # ivfflat kaç liste tarayacak (recall / hız dengesi)
+        cur.execute("SET LOCAL ivfflat.probes = %s", (self.ivfflat_probes,))
+        
+        # <=> cosine mesafesi; similarity = 1 - mesafe
+        cur.execute(f"""
+            SELECT 
+                product_id,
+                product_name,
+                combined_text,
+                1 - (embedding <=> %s::vector) AS similarity
+            FROM {table_name}
+            WHERE embedding IS NOT NULL
+            ORDER BY embedding <=> %s::vector
+            LIMIT %s
+        """, (vector_literal, vector_literal, limit))
+        
+        rows = cur.fetchall()
+        logger.info(f"📊 {table_name}: {len(rows)} aday bulundu")
+        
+        return [
+            {
+                'product_id': product_id,
+                'product_name': product_name,
+                'combined_text': combined_text,
+                'similarity': float(similarity),
+                'source_table': table_name.replace('_embeddings', '')
+            }
+            for product_id, product_name, combined_text, similarity in rows
+            if similarity is not None and similarity > MIN_SIMILARITY
+        ]
+    
+    def _search_unified_pgvector(self, cur, vector_literal: str, categories: List[str],
+                                 limit: int) -> List[Dict[str, Any]]:
+        """Bölümlenmiş product_embeddings'te kategoriler arası tek sorgu (bölüm budama + ivfflat)"""
+        logger.info(f"🔍 {PRODUCT_EMBEDDINGS_TABLE} aranıyor (pgvector, {len(categories)} kategori)...")
+        cur.execute("SET LOCAL ivfflat.probes = %s", (self.ivfflat_probes,))
+        cur.execute(f"""
+            SELECT 
+                source_table,
+                product_id,
+                product_name,
+                combined_text,
+                1 - (embedding <=> %s::vector) AS similarity
+            FROM {PRODUCT_EMBEDDINGS_TABLE}
+            WHERE source_table = ANY(%s)
+            AND embedding IS NOT NULL
+            ORDER BY embedding <=> %s::vector
+            LIMIT %s
+        """, (vector_literal, categories, vector_literal, limit))
+        rows = cur.fetchall()
+        
+        logger.info(f"📊 {PRODUCT_EMBEDDINGS_TABLE}: {len(rows)} aday bulundu")
+        return [
+            {
+                'product_id': product_id,
+                'product_name': product_name,
+                'combined_text': combined_text,
+                'similarity': float(similarity),
+                'source_table': source_table
+            }
+            for source_table, product_id, product_name, combined_text, similarity in rows
+            if similarity is not None and similarity > MIN_SIMILARITY
+        ]
+    
+    def _search_tables_memory(self, query_embedding: List[float], table_names: List[str], limit: int) -> List[Dict[str, Any]]:
+        """Bellek içi indekste tek matris-vektör çarpımı ile ara"""
+        # İlk aramada tüm tabloları yükle, sonra created_at üzerinden artımlı yenile
+        self.vector_index.refresh_if_stale(self.get_searchable_tables(), self.vector_index_refresh_seconds)
+        return self.vector_index.search(query_embedding, limit, table_names, min_similarity=MIN_SIMILARITY)
+    
+    def _search_tables_python(self, query_embedding: List[float], table_names: List[str],
+                              limit: int) -> List[Dict[str, Any]]:
+        """Eski yol: satırları çekip similarity'yi Python'da hesapla (pgvector olmayan kurulumlar için)"""
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        tasks = {table_name: partial(self._search_table_python, table_name=table_name,
+                                     query_vector=query_vector, limit=limit)
+                 for table_name in table_names}
+        outcome = self.table_fanout.run(tasks, label='arama')
+        return merge_top_k(outcome.results.values(), limit)
+    
+    def _search_table_python(self, cur, table_name: str, query_vector: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        """
+        Tablodaki embedding'leri sunucu tarafı cursor ile parça parça oku, tablonun top-k'sını tut
+        
+        Bellekte en fazla bir parça (PYTHON_SEARCH_BATCH_SIZE) ve k sonuç bulunur.
+        """
+        logger.info(f"🔍 {table_name} aranıyor...")
+        
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm == 0:
+            return []
+        
+        row_limit = f"LIMIT {self.python_search_max_rows}" if self.python_search_max_rows > 0 else ""
+        top = TopK(limit)
+        scanned = 0
+        
+        # İsimli (sunucu tarafı) cursor: satırlar itersize'lık parçalarla gelir
+        stream = cur.connection.cursor(name=f"python_search_{table_name}")
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
-            # Tablo sütunlarını al
-            cur.execute(f"""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = '{source_table}'
-                ORDER BY ordinal_position
+            stream.itersize = self.python_search_batch_size
+            stream.execute(f"""
+                SELECT 
+                    product_id,
+                    product_name,
+                    combined_text,
+                    embedding
+                FROM {table_name}
+                WHERE embedding IS NOT NULL
+                {row_limit}
             """)
             
-            columns = [row[0] for row in cur.fetchall()]
-            
-            # Ürün detaylarını al - TÜM SÜTUNLAR
-            columns_sql = ', '.join(columns)
-            # Tablo yapısına göre doğru ID sütununu kullan
-            id_column = 'product_id' if 'product_id' in columns else 'id'
-            cur.execute(f"SELECT {columns_sql} FROM {source_table} WHERE {id_column} = %s", (product_id,))
-            
-            result = cur.fetchone()
-            
-            if result:
-                product_data = dict(zip(columns, result))
+            while True:
+                results = stream.fetchmany(self.python_search_batch_size)
+                if not results:
+                    break
+                scanned += len(results)
                 
-                # Risk analizi için ek hesaplamalar
-                product_data = self._calculate_risk_metrics(product_data, source_table)
+                # Parçadaki vektörleri tek matriste topla, similarity'yi tek çarpımla hesapla
+                rows = []
+                vectors = []
+                for product_id, product_name, combined_text, embedding_vector in results:
+                    parsed_embedding = self.parse_embedding(embedding_vector)
+                    if parsed_embedding is None or parsed_embedding.shape != query_vector.shape:
+                        continue
+                    rows.append((product_id, product_name, combined_text))
+                    vectors.append(parsed_embedding)
                 
-                cur.close()
-                conn.close()
-                return product_data
-            
-            # Kaynak tabloda bulunamazsa embedding tablosundan al
-            embedding_table = f"{source_table}_embeddings"
-            try:
-                logger.info(f"🔍 Embedding tablosunda aranıyor: {embedding_table}")
+                if not vectors:
+                    continue
                 
-                cur.execute(f"""
-                    SELECT 
-                        product_id,
-                        product_name,
-                        combined_text,
-                        created_at
-                    FROM {embedding_table}
-                    WHERE product_id = %s
-                """, (product_id,))
+                matrix = np.vstack(vectors)
+                norms = np.linalg.norm(matrix, axis=1)
+                norms[norms == 0] = np.inf  # Sıfır vektörün benzerliği 0
+                similarities = (matrix @ query_vector) / (norms * query_norm)
+                
+                # Sadece eşiği (MIN_SIMILARITY ya da dolu heap'in en kötüsü) geçenler için kayıt oluştur
+                threshold = MIN_SIMILARITY if top.threshold is None else max(MIN_SIMILARITY, top.threshold)
+                for index in np.flatnonzero(similarities > threshold):
+                    product_id, product_name, combined_text = rows[index]
+                    top.push({
+                        'product_id': product_id,
+                        'product_name': product_name, 
+                        'combined_text': combined_text,
+                        'similarity': float(similarities[index]),
+                        'source_table': table_name.replace('_embeddings', '')
+                    })
+        finally:
+            stream.close()
+        
+        logger.info(f"📊 {table_name}: {scanned} kayıt tarandı")
+        return top.results()
+    
+    
+    def get_product_details(self, product_id: str, source_table: str) -> Optional[Dict[str, Any]]:
+        """Ürün detaylarını getir - TÜM veriler dahil"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                
+                # Tablo sütunları ve id sütunu katalogdan (bilinmeyen tablo sorgulanmaz)
+                columns = self.schema_catalog.columns(source_table)
+                id_column = self.schema_catalog.id_column(source_table)
                 
-                result = cur.fetchone()
+                result = None
+                if columns:
+                    # Ürün detaylarını al - TÜM SÜTUNLAR
+                    columns_sql = ', '.join(columns)
+                    cur.execute(f"SELECT {columns_sql} FROM {source_table} WHERE {id_column} = %s", (product_id,))
+                    result = cur.fetchone()
                 
+                stored_risk = None
                 if result:
-                    product_data = {
-                        'product_id': result[0],
-                        'name': result[1],
-                        'description': result[2],
-                        'created_at': result[3],
-                        'source': 'embedding_table'
-                    }
-                    
-                    # Basit risk analizi ekle
-                    product_data['risk_analysis'] = {
-                        'overall_risk': 5.0,
-                        'price_risk': 5.0,
-                        'rating_risk': 5.0,
-                        'competition_risk': 5.0,
-                        'risk_level': 'Orta',
-                        'seller_recommendation': 'Embedding tablosundan veri. Daha detaylı analiz için kaynak tabloyla eşleştirin.'
-                    }
-                    
-                    cur.close()
-                    conn.close()
-                    return product_data
-                    
-            except Exception as e:
-                logger.warning(f"⚠️ Embedding tablosunda da bulunamadı: {e}")
+                    product_key = str(dict(zip(columns, result))[id_column])
+                    stored_risk = self.risk_store.fetch_stored(cur, source_table, [product_key]).get(product_key)
+                
+                embedding_row = None
+                embedding_table = f"{source_table}_embeddings"
+                if not result and self.schema_catalog.table_exists(embedding_table):
+                    # Kaynak tabloda bulunamazsa embedding tablosundan al
+                    try:
+                        logger.info(f"🔍 Embedding tablosunda aranıyor: {embedding_table}")
+                        
+                        cur.execute(f"""
+                            SELECT 
+                                product_id,
+                                product_name,
+                                combined_text,
+                                created_at
+                            FROM {embedding_table}
+                            WHERE product_id = %s
+                        """, (product_id,))
+                        
+                        embedding_row = cur.fetchone()
+                        
+                    except Exception as e:
+                        logger.warning(f"⚠️ Embedding tablosunda da bulunamadı: {e}")
+                
+                cur.close()
+            
+            # Risk hesapları kendi bağlantılarını alır; bu yüzden bağlantı iade edildikten sonra yapılır
+            if result:
+                product_data = dict(zip(columns, result))
+                
+                # Risk analizi: güncel saklı skor varsa onu kullan, yoksa hesapla
+                return self._risk_from_store_or_compute(product_data, source_table, stored_risk)
+            
+            if embedding_row:
+                return self._product_from_embedding_row(embedding_row)
             
-            cur.close()
-            conn.close()
             return None
             
         except Exception as e:
             logger.error(f"❌ Ürün detay hatası: {e}")
             return None
     
+    def _product_from_embedding_row(self, embedding_row) -> Dict[str, Any]:
+        """Kaynak tabloda olmayan ürün için embedding tablosu satırından detay oluştur"""
+        product_data = {
+            'product_id': embedding_row[0],
+            'name': embedding_row[1],
+            'description': embedding_row[2],
+            'created_at': embedding_row[3],
+            'source': 'embedding_table'
+        }
+        
+        # Basit risk analizi ekle
+        product_data['risk_analysis'] = {
+            'overall_risk': 5.0,
+            'price_risk': 5.0,
+            'rating_risk': 5.0,
+            'competition_risk': 5.0,
+            'risk_level': 'Orta',
+            'seller_recommendation': 'Embedding tablosundan veri. Daha detaylı analiz için kaynak tabloyla eşleştirin.'
+        }
+        
+        return product_data
+    
+    def get_products_details_batch(self, items: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Birden fazla ürünün detaylarını toplu getir
+        
+        Tablo başına tek `WHERE id = ANY(%s)` sorgusu atılır; risk metrikleri de tablo başına
+        tek fiyat ve tek marka sorgusuyla toplu hesaplanır.
+        
+        Args:
+            items: (product_id, source_table) listesi
+            
+        Returns:
+            (product_id, source_table) -> ürün detayı (bulunamayanlar dahil edilmez)
+        """
+        ids_by_table: Dict[str, List[str]] = {}
+        for product_id, source_table in items:
+            ids_by_table.setdefault(source_table, [])
+            if product_id not in ids_by_table[source_table]:
+                ids_by_table[source_table].append(product_id)
+        
+        if not ids_by_table:
+            return {}
+        
+        details: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # (tablo, ürün satırları, saklı riskler); risk hesabı bağlantı iade edildikten sonra yapılır
+        fetched: List[Tuple[str, Dict[str, Dict[str, Any]], Dict[str, Any]]] = []
+        
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                
+                # Tüm tabloların sütunları katalogdan
+                columns_by_table = self.schema_catalog.columns_by_table(list(ids_by_table.keys()))
+                
+                for source_table, product_ids in ids_by_table.items():
+                    try:
+                        rows_by_id = self._fetch_product_rows(cur, source_table, columns_by_table.get(source_table, []), product_ids)
+                        
+                        stored_risks = self.risk_store.fetch_stored(cur, source_table, list(rows_by_id.keys()))
+                        fetched.append((source_table, rows_by_id, stored_risks))
+                        
+                        # Kaynak tabloda olmayanlar için embedding tablosu
+                        missing = [pid for pid in product_ids if pid not in rows_by_id]
+                        if missing and self.schema_catalog.table_exists(f"{source_table}_embeddings"):
+                            cur.execute(f"""
+                                SELECT 
+                                    product_id,
+                                    product_name,
+                                    combined_text,
+                                    created_at
+                                FROM {source_table}_embeddings
+                                WHERE product_id = ANY(%s)
+                            """, (missing,))
+                            
+                            for embedding_row in cur.fetchall():
+                                details[(str(embedding_row[0]), source_table)] = self._product_from_embedding_row(embedding_row)
+                        
+                        conn.commit()
+                        
+                    except Exception as e:
+                        logger.warning(f"⚠️ {source_table} toplu detay hatası: {e}")
+                        conn.rollback()
+                        continue
+                
+                cur.close()
+            
+            # Risk girdileri saklı skorlardan ya da istatistik önbelleğinden gelir; önbellek kendi
+            # bağlantısını alabileceği için iç içe checkout olmasın diye bağlantı iade edildikten sonra
+            for source_table, rows_by_id, stored_risks in fetched:
+                for product_id, product_data in rows_by_id.items():
+                    details[(product_id, source_table)] = self._risk_from_store_or_compute(
+                        product_data, source_table, stored_risks.get(product_id)
+                    )
+            
+            logger.info(f"📦 Toplu detay: {len(details)}/{len(items)} ürün, {len(ids_by_table)} tablo")
+            return details
+            
+        except Exception as e:
+            logger.error(f"❌ Toplu ürün detay hatası: {e}")
+            return details
+    
+    def _fetch_product_rows(self, cur, source_table: str, columns: List[str], product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Kaynak tablodan verilen ürünleri tek sorguyla getir (product_id -> satır)"""
+        if not columns:
+            return {}
+        
+        columns_sql = ', '.join(columns)
+        # Tablo yapısına göre doğru ID sütununu kullan
+        id_column = self.schema_catalog.id_column(source_table)
+        
+        params = product_ids
+        if id_column == 'id':
+            # SERIAL id sütunu: sayısal olmayan id'ler zaten eşleşemez
+            params = [int(pid) for pid in product_ids if str(pid).isdigit()]
+        
+        cur.execute(f"SELECT {columns_sql} FROM {source_table} WHERE {id_column} = ANY(%s)", (params,))
+        
+        rows_by_id = {}
+        for row in cur.fetchall():
+            product_data = dict(zip(columns, row))
+            rows_by_id[str(product_data[id_column])] = product_data
+        return rows_by_id
+    
+    def _risk_from_store_or_compute(self, product_data: Dict[str, Any], source_table: str,
+                                    stored_risk: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Saklı skor ürünün güncel fiyat/rating/markasıyla hesaplandıysa onu kullan"""
+        if stored_risk and stored_risk['inputs'] == (product_data.get('price'), product_data.get('rating'), product_data.get('brand')):
+            product_data['risk_analysis'] = dict(stored_risk['risk_analysis'])
+            return product_data
+        return self._calculate_risk_metrics(product_data, source_table)
+    
     def _calculate_risk_metrics(self, product_data: Dict[str, Any], source_table: str) -> Dict[str, Any]:
         """Satıcı için risk metriklerini hesapla"""
         try:
@@ -294,63 +604,63 @@ class RAGService:
             
             # Risk skorları hesapla (1-10 arası, 10 en riskli)
             price_risk = self._calculate_price_risk(price, source_table)
-            rating_risk = self._calculate_rating_risk(rating)
             competition_risk = self._calculate_competition_risk(product_data, source_table)
             
-            # Genel risk skoru
-            overall_risk = (price_risk + rating_risk + competition_risk) / 3
-            
-            # Risk analizini ekle
-            product_data['risk_analysis'] = {
-                'price_risk': price_risk,
-                'rating_risk': rating_risk, 
-                'competition_risk': competition_risk,
-                'overall_risk': round(overall_risk, 2),
-                'risk_level': self._get_risk_level(overall_risk),
-                'seller_recommendation': self._get_seller_recommendation(overall_risk, product_data)
-            }
-            
-            return product_data
+            return self._attach_risk_analysis(product_data, rating, price_risk, competition_risk)
             
         except Exception as e:
             logger.warning(f"Risk metrik hesaplama hatası: {e}")
             return product_data
     
+    def _attach_risk_analysis(self, product_data: Dict[str, Any], rating: float,
+                              price_risk: float, competition_risk: float) -> Dict[str, Any]:
+        """Alt skorlardan genel riski hesaplayıp risk_analysis alanını ekle"""
+        rating_risk = self._calculate_rating_risk(rating)
+        
+        # Genel risk skoru
+        overall_risk = (price_risk + rating_risk + competition_risk) / 3
+        
+        # Risk analizini ekle
+        product_data['risk_analysis'] = {
+            'price_risk': price_risk,
+            'rating_risk': rating_risk, 
+            'competition_risk': competition_risk,
+            'overall_risk': round(overall_risk, 2),
+            'risk_level': self._get_risk_level(overall_risk),
+            'seller_recommendation': self._get_seller_recommendation(overall_risk, product_data)
+        }
+        
+        return product_data
+    
     def _calculate_price_risk(self, price: float, source_table: str) -> float:
         """Fiyat risk analizi"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
-            # Aynı kategorideki ortalama fiyat
-            cur.execute(f"""
-                SELECT AVG(price), MIN(price), MAX(price)
-                FROM {source_table} 
-                WHERE price > 0
-            """)
-            
-            result = cur.fetchone()
-            if result and result[0]:
-                avg_price, min_price, max_price = result
-                
-                # Fiyat pozisyonuna göre risk
-                if price > avg_price * 1.5:
-                    return 8.0  # Yüksek fiyat riski
-                elif price > avg_price * 1.2:
-                    return 6.0  # Orta-yüksek risk
-                elif price < avg_price * 0.8:
-                    return 4.0  # Düşük fiyat riski
-                else:
-                    return 3.0  # Optimal fiyat
-            
-            cur.close()
-            conn.close()
-            return 5.0  # Varsayılan
+            # Aynı kategorideki ortalama fiyat (önbellekten)
+            avg_price = self.stats_cache.get_average_price(source_table)
+            return self._price_risk_from_average(price, avg_price)
             
         except Exception as e:
             logger.warning(f"Fiyat risk hesaplama hatası: {e}")
             return 5.0
     
+    def _price_risk_from_average(self, price: float, avg_price) -> float:
+        """Kategori ortalamasına göre fiyat riski"""
+        if not avg_price:
+            return 5.0  # Varsayılan
+        
+        # AVG() Decimal döner; float ile karşılaştırmadan önce çevir
+        avg_price = float(avg_price)
+        
+        # Fiyat pozisyonuna göre risk
+        if price > avg_price * 1.5:
+            return 8.0  # Yüksek fiyat riski
+        elif price > avg_price * 1.2:
+            return 6.0  # Orta-yüksek risk
+        elif price < avg_price * 0.8:
+            return 4.0  # Düşük fiyat riski
+        else:
+            return 3.0  # Optimal fiyat
+    
     def _calculate_rating_risk(self, rating: float) -> float:
         """Rating risk analizi"""
         if rating >= 4.5:
@@ -367,37 +677,29 @@ class RAGService:
     def _calculate_competition_risk(self, product_data: Dict[str, Any], source_table: str) -> float:
         """Rekabet risk analizi"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
             brand = product_data.get('brand', '')
             
-            # Aynı markadan kaç ürün var
-            cur.execute(f"""
-                SELECT COUNT(*) 
-                FROM {source_table} 
-                WHERE brand ILIKE %s
-            """, (f"%{brand}%",))
-            
-            brand_count = cur.fetchone()[0]
-            
-            # Rekabet yoğunluğu
-            if brand_count > 50:
-                return 8.0  # Yüksek rekabet
-            elif brand_count > 20:
-                return 6.0  # Orta rekabet
-            elif brand_count > 10:
-                return 4.0  # Düşük rekabet
-            else:
-                return 2.0  # Çok düşük rekabet
+            # Aynı markadan kaç ürün var (önbellekteki marka sayılarından)
+            brand_count = self.stats_cache.brand_match_count(source_table, brand)
             
-            cur.close()
-            conn.close()
+            return self._competition_risk_from_count(brand_count)
             
         except Exception as e:
             logger.warning(f"Rekabet risk hesaplama hatası: {e}")
             return 5.0
     
+    def _competition_risk_from_count(self, brand_count: int) -> float:
+        """Aynı markadaki ürün sayısına göre rekabet riski"""
+        # Rekabet yoğunluğu
+        if brand_count > 50:
+            return 8.0  # Yüksek rekabet
+        elif brand_count > 20:
+            return 6.0  # Orta rekabet
+        elif brand_count > 10:
+            return 4.0  # Düşük rekabet
+        else:
+            return 2.0  # Çok düşük rekabet
+    
     def _get_risk_level(self, risk_score: float) -> str:
         """Risk seviyesi belirle"""
         if risk_score >= 7:
@@ -430,6 +732,23 @@ class RAGService:
             limit: Maksimum sonuç sayısı
         """
         
+        if filters and self.search_mode != SEARCH_MODE_PYTHON:
+            # Filtreler SQL'de uygulanır, sıralama filtrelenmiş küme üzerinde yapılır
+            search_results = self._search_products_prefiltered(query, filters, limit)
+            
+            details = self.get_products_details_batch(
+                [(str(r['product_id']), r['source_table']) for r in search_results]
+            )
+            filtered_results = []
+            for result in search_results:
+                product_details = details.get((str(result['product_id']), result['source_table']))
+                if product_details:
+                    result['product_details'] = product_details
+                    filtered_results.append(result)
+            
+            logger.info(f"✅ Filtreli arama: {len(filtered_results)} sonuç")
+            return filtered_results
+        
         # Önce basic arama yap
         search_results = self.search_products(query, limit=limit*2)  # Daha fazla sonuç al
         
@@ -438,29 +757,29 @@ class RAGService:
             return []
         
         if not filters:
-            # Filtre yoksa ürün detaylarını ekle
+            # Filtre yoksa sadece döndürülecek sonuçların detaylarını toplu ekle
+            search_results = search_results[:limit]
+            details = self.get_products_details_batch(
+                [(str(r['product_id']), r['source_table']) for r in search_results]
+            )
             for result in search_results:
-                try:
-                    product_details = self.get_product_details(
-                        result['product_id'], 
-                        result['source_table']
-                    )
-                    if product_details:
-                        result['product_details'] = product_details
-                except Exception as e:
-                    logger.warning(f"Ürün detay hatası: {e}")
+                product_details = details.get((str(result['product_id']), result['source_table']))
+                if product_details:
+                    result['product_details'] = product_details
             
-            return search_results[:limit]
+            return search_results
+        
+        # Tüm adayların detayları tek seferde (tablo başına bir sorgu)
+        details = self.get_products_details_batch(
+            [(str(r['product_id']), r['source_table']) for r in search_results]
+        )
         
         filtered_results = []
         
         for result in search_results:
             try:
                 # Ürün detaylarını al
-                product_details = self.get_product_details(
-                    result['product_id'], 
-                    result['source_table']
-                )
+                product_details = details.get((str(result['product_id']), result['source_table']))
                 
                 if not product_details:
                     continue
@@ -526,67 +845,204 @@ class RAGService:
         logger.info(f"✅ Filtreli arama: {len(filtered_results)} sonuç")
         return filtered_results
     
+    def _search_products_prefiltered(self, query: str, filters: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+        """
+        Filtreleri embedding tablosu ile kaynak tablonun join'i üzerinde SQL'de uygula,
+        vektör sıralamasını sadece filtreyi geçen ürünlere yap
+        
+        Tablo sorguları table_fanout ile eşzamanlı çalışır; sıralı tablo sonuçları
+        merge_top_k ile birleştirilir. Birleşik tablolara taşınmış kategoriler
+        product_embeddings/products üzerinde tek sorguyla aranır.
+        """
+        try:
+            logger.info(f"🔍 Filtreli arama: '{query}' {filters} (mod: {self.search_mode})")
+            
+            query_embedding = self.embedding_service.create_embedding(query)
+            if not query_embedding:
+                logger.error("❌ Query embedding oluşturulamadı")
+                return []
+            
+            table_names = self.get_searchable_tables()
+            if not table_names:
+                logger.error("❌ Hiç embedding tablosu bulunamadı")
+                return []
+            
+            if self.search_mode == SEARCH_MODE_MEMORY:
+                # İndeks güncel olsun; aday kümesi SQL'den gelir
+                self.vector_index.refresh_if_stale(table_names, self.vector_index_refresh_seconds)
+            
+            vector_literal = to_pgvector_literal(query_embedding)
+            source_tables = [t.replace('_embeddings', '') for t in table_names]
+            columns_by_table = self.schema_catalog.columns_by_table(source_tables)
+            unified, legacy = split_unified_categories(self.schema_catalog, source_tables)
+            
+            tasks = {}
+            # Taşınmış kategoriler: aynı id sütunu ve filtre sütunlarına sahip olanlar tek sorgu
+            unified_groups: Dict[Tuple[str, Tuple[str, ...]], List[str]] = {}
+            for source_table in unified + legacy:
+                columns = columns_by_table.get(source_table)
+                if not columns:
+                    logger.warning(f"⚠️ Kaynak tablo bulunamadı: {source_table}")
+                    continue
+                if source_table in unified:
+                    filter_columns = tuple(column for column in ('price', 'brand', 'rating') if column in columns)
+                    unified_groups.setdefault((self.schema_catalog.id_column(source_table), filter_columns),
+                                              []).append(source_table)
+                    continue
+                table_name = f"{source_table}_embeddings"
+                tasks[table_name] = partial(self._search_table_prefiltered, table_name=table_name,
+                                            source_table=source_table, columns=columns, filters=filters,
+                                            vector_literal=vector_literal, limit=limit)
+            
+            for group, ((id_column, filter_columns), categories) in enumerate(unified_groups.items()):
+                task_name = PRODUCT_EMBEDDINGS_TABLE if group == 0 else f"{PRODUCT_EMBEDDINGS_TABLE}#{group}"
+                tasks[task_name] = partial(self._search_unified_prefiltered, categories=categories,
+                                           id_column=id_column, columns=list(filter_columns), filters=filters,
+                                           vector_literal=vector_literal, limit=limit)
+            
+            # Tablo sorguları havuzdaki ayrı bağlantılarda eşzamanlı çalışır (table_fanout)
+            outcome = self.table_fanout.run(tasks, label='filtreli arama')
+            
+            if self.search_mode == SEARCH_MODE_MEMORY:
+                candidates = [candidate for table_candidates in outcome.results.values()
+                              for candidate in table_candidates]
+                return self.vector_index.search(query_embedding, limit, candidates=candidates,
+                                                min_similarity=MIN_SIMILARITY)
+            
+            return merge_top_k(outcome.results.values(), limit)
+            
+        except Exception as e:
+            logger.error(f"❌ Filtreli arama hatası: {e}")
+            return []
+    
+    def _search_table_prefiltered(self, cur, table_name: str, source_table: str, columns: List[str],
+                                  filters: Dict[str, Any], vector_literal: str, limit: int) -> List[Any]:
+        """
+        Tek tabloda filtreli arama
+        
+        Returns:
+            memory modunda filtreyi geçen (embedding tablosu, product_id) adayları, pgvector
+            modunda benzerliğe göre sıralı en fazla `limit` sonuç
+        """
+        clauses, params = build_filter_sql(filters, columns)
+        where_sql = ' AND '.join(['e.embedding IS NOT NULL'] + clauses)
+        
+        # Tablo yapısına göre doğru ID sütununu kullan
+        join_on = ('p.product_id = e.product_id'
+                   if self.schema_catalog.id_column(source_table) == 'product_id'
+                   else 'p.id::text = e.product_id')
+        
+        if self.search_mode == SEARCH_MODE_MEMORY:
+            cur.execute(f"""
+                SELECT e.product_id
+                FROM {table_name} e
+                JOIN {source_table} p ON {join_on}
+                WHERE {where_sql}
+            """, params)
+            return [(table_name, row[0]) for row in cur.fetchall()]
+        
+        cur.execute("SET LOCAL ivfflat.probes = %s", (self.filtered_ivfflat_probes,))
+        cur.execute(f"""
+            SELECT 
+                e.product_id,
+                e.product_name,
+                e.combined_text,
+                1 - (e.embedding <=> %s::vector) AS similarity
+            FROM {table_name} e
+            JOIN {source_table} p ON {join_on}
+            WHERE {where_sql}
+            ORDER BY e.embedding <=> %s::vector
+            LIMIT %s
+        """, [vector_literal] + params + [vector_literal, limit])
+        
+        return [
+            {
+                'product_id': product_id,
+                'product_name': product_name, 
+                'combined_text': combined_text,
+                'similarity': float(similarity),
+                'source_table': source_table
+            }
+            for product_id, product_name, combined_text, similarity in cur.fetchall()
+            if similarity is not None and similarity > MIN_SIMILARITY
+        ]
+    
+    def _search_unified_prefiltered(self, cur, categories: List[str], id_column: str, columns: List[str],
+                                    filters: Dict[str, Any], vector_literal: str, limit: int) -> List[Any]:
+        """
+        Taşınmış kategorilerde filtreli arama: product_embeddings ile products tek join
+        
+        Returns:
+            _search_table_prefiltered ile aynı (adaylar ya da sıralı sonuçlar)
+        """
+        clauses, params = build_filter_sql(filters, columns)
+        where_sql = ' AND '.join(['e.source_table = ANY(%s)', 'p.source_table = ANY(%s)',
+                                  'e.embedding IS NOT NULL'] + clauses)
+        params = [categories, categories] + params
+        
+        join_on = ('p.product_id = e.product_id' if id_column == 'product_id'
+                   else 'p.id::text = e.product_id')
+        
+        if self.search_mode == SEARCH_MODE_MEMORY:
+            cur.execute(f"""
+                SELECT e.source_table, e.product_id
+                FROM {PRODUCT_EMBEDDINGS_TABLE} e
+                JOIN {PRODUCTS_TABLE} p ON p.source_table = e.source_table AND {join_on}
+                WHERE {where_sql}
+            """, params)
+            return [(f"{source_table}_embeddings", product_id) for source_table, product_id in cur.fetchall()]
+        
+        cur.execute("SET LOCAL ivfflat.probes = %s", (self.filtered_ivfflat_probes,))
+        cur.execute(f"""
+            SELECT 
+                e.source_table,
+                e.product_id,
+                e.product_name,
+                e.combined_text,
+                1 - (e.embedding <=> %s::vector) AS similarity
+            FROM {PRODUCT_EMBEDDINGS_TABLE} e
+            JOIN {PRODUCTS_TABLE} p ON p.source_table = e.source_table AND {join_on}
+            WHERE {where_sql}
+            ORDER BY e.embedding <=> %s::vector
+            LIMIT %s
+        """, [vector_literal] + params + [vector_literal, limit])
+        
+        return [
+            {
+                'product_id': product_id,
+                'product_name': product_name, 
+                'combined_text': combined_text,
+                'similarity': float(similarity),
+                'source_table': source_table
+            }
+            for source_table, product_id, product_name, combined_text, similarity in cur.fetchall()
+            if similarity is not None and similarity > MIN_SIMILARITY
+        ]
+    
     def get_table_stats(self) -> Dict[str, Dict[str, Any]]:
         """Tablo istatistiklerini getir - SADECE mevcut embedding tabloları için"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
             stats = {}
             embedding_tables = self.get_available_tables()
             
             logger.info(f"📊 İstatistik hesaplanacak embedding tabloları: {embedding_tables}")
             
-            for table_name in embedding_tables:
-                source_table = table_name.replace('_embeddings', '')
-                
-                try:
-                    # Önce kaynak tablonun var olduğunu kontrol et
-                    cur.execute(f"""
-                        SELECT COUNT(*) 
-                        FROM information_schema.tables 
-                        WHERE table_name = '{source_table}' 
-                        AND table_schema = 'public'
-                    """)
-                    
-                    table_exists = cur.fetchone()[0] > 0
-                    
-                    if not table_exists:
-                        logger.warning(f"⚠️ Kaynak tablo bulunamadı: {source_table}")
-                        continue
-                    
-                    # Embedding sayısı
-                    cur.execute(f"SELECT COUNT(*) FROM {table_name}")
-                    embedding_count = cur.fetchone()[0]
-                    
-                    # Orjinal tablo istatistikleri
-                    cur.execute(f"""
-                        SELECT 
-                            COUNT(*) as total_products,
-                            AVG(CASE WHEN price > 0 THEN price END) as avg_price,
-                            AVG(CASE WHEN rating > 0 THEN rating END) as avg_rating
-                        FROM {source_table}
-                    """)
-                    
-                    result = cur.fetchone()
-                    
-                    if result and result[0] > 0:  # Sadece veri olan tabloları dahil et
-                        stats[source_table] = {
-                            'total_products': result[0],
-                            'embeddings_count': embedding_count,
-                            'avg_price': float(result[1] or 0),
-                            'avg_rating': float(result[2] or 0),
-                            'embedding_coverage': round((embedding_count / result[0]) * 100, 2) if result[0] > 0 else 0
-                        }
-                        
-                        logger.info(f"✅ {source_table}: {result[0]} ürün, {embedding_count} embedding")
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️ {table_name} istatistik hatası: {e}")
+            unified, legacy = split_unified_categories(
+                self.schema_catalog, [table_name.replace('_embeddings', '') for table_name in embedding_tables]
+            )
+            
+            tasks = {}
+            for source_table in legacy:
+                # Önce kaynak tablonun var olduğunu kontrol et
+                if not self.schema_catalog.table_exists(source_table):
+                    logger.warning(f"⚠️ Kaynak tablo bulunamadı: {source_table}")
                     continue
+                tasks[source_table] = partial(self._table_stats, source_table=source_table)
+            if unified:
+                tasks[PRODUCTS_TABLE] = partial(self._unified_table_stats, categories=unified)
             
-            cur.close()
-            conn.close()
+            for table_stats in self.table_fanout.run(tasks, label='istatistik').results.values():
+                stats.update(table_stats)
             
             logger.info(f"📊 Toplam aktif tablo sayısı: {len(stats)}")
             return stats
@@ -595,38 +1051,93 @@ class RAGService:
             logger.error(f"❌ İstatistik hatası: {e}")
             return {}
 
+    def _table_stats(self, cur, source_table: str) -> Dict[str, Dict[str, Any]]:
+        # Embedding sayısı
+        cur.execute(f"SELECT COUNT(*) FROM {source_table}_embeddings")
+        embedding_count = cur.fetchone()[0]
+        
+        # Orjinal tablo istatistikleri
+        cur.execute(f"""
+            SELECT 
+                COUNT(*) as total_products,
+                AVG(CASE WHEN price > 0 THEN price END) as avg_price,
+                AVG(CASE WHEN rating > 0 THEN rating END) as avg_rating
+            FROM {source_table}
+        """)
+        
+        result = cur.fetchone()
+        if not result or result[0] == 0:  # Sadece veri olan tabloları dahil et
+            return {}
+        
+        logger.info(f"✅ {source_table}: {result[0]} ürün, {embedding_count} embedding")
+        return {source_table: self._table_stats_entry(result[0], embedding_count, result[1], result[2])}
+
+    def _unified_table_stats(self, cur, categories: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Birleşik tablolarda tüm kategorilerin istatistikleri tek sorguda"""
+        cur.execute(f"""
+            SELECT 
+                p.source_table,
+                COUNT(*) as total_products,
+                AVG(CASE WHEN p.price > 0 THEN p.price END) as avg_price,
+                AVG(CASE WHEN p.rating > 0 THEN p.rating END) as avg_rating,
+                COALESCE(MAX(e.embedding_count), 0) as embedding_count
+            FROM {PRODUCTS_TABLE} p
+            LEFT JOIN (
+                SELECT source_table, COUNT(*) as embedding_count
+                FROM {PRODUCT_EMBEDDINGS_TABLE}
+                WHERE source_table = ANY(%s)
+                GROUP BY source_table
+            ) e ON e.source_table = p.source_table
+            WHERE p.source_table = ANY(%s)
+            GROUP BY p.source_table
+        """, (categories, categories))
+        
+        stats = {}
+        for source_table, total_products, avg_price, avg_rating, embedding_count in cur.fetchall():
+            stats[source_table] = self._table_stats_entry(total_products, embedding_count, avg_price, avg_rating)
+            logger.info(f"✅ {source_table}: {total_products} ürün, {embedding_count} embedding")
+        return stats
+    
+    @staticmethod
+    def _table_stats_entry(total_products: int, embedding_count: int, avg_price, avg_rating) -> Dict[str, Any]:
+        return {
+            'total_products': total_products,
+            'embeddings_count': embedding_count,
+            'avg_price': float(avg_price or 0),
+            'avg_rating': float(avg_rating or 0),
+            'embedding_coverage': round((embedding_count / total_products) * 100, 2) if total_products > 0 else 0
+        }
+
     def get_all_brands(self) -> List[str]:
         """Tüm tablolardan benzersiz markaları getir"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
             all_brands = set()
-            tables = self.get_available_tables()
+            unified, legacy = split_unified_categories(
+                self.schema_catalog, [table_name.replace('_embeddings', '') for table_name in self.get_available_tables()]
+            )
+            brand_filter = "brand IS NOT NULL AND brand != '' AND brand != 'null'"
+            
+            def table_brands(cur, base_table_name: str) -> List[str]:
+                # Her tablodan brand sütununu al
+                cur.execute(f"SELECT DISTINCT brand FROM {base_table_name} WHERE {brand_filter}")
+                return [row[0] for row in cur.fetchall()]
+            
+            def unified_brands(cur) -> List[str]:
+                # Birleşik tabloda tüm kategoriler tek DISTINCT
+                cur.execute(f"""
+                    SELECT DISTINCT brand 
+                    FROM {PRODUCTS_TABLE} 
+                    WHERE source_table = ANY(%s)
+                    AND {brand_filter}
+                """, (unified,))
+                return [row[0] for row in cur.fetchall()]
             
-            for table_name in tables:
-                base_table_name = table_name.replace('_embeddings', '')
-                
-                try:
-                    # Her tablodan brand sütununu al
-                    cur.execute(f"""
-                        SELECT DISTINCT brand 
-                        FROM {base_table_name} 
-                        WHERE brand IS NOT NULL 
-                        AND brand IS NOT DISTINCT FROM '' 
-                        AND brand != 'null'
-                        ORDER BY brand
-                    """)
-                    
-                    brands = [row[0] for row in cur.fetchall()]
-                    all_brands.update(brands)
-                    
-                except Exception as e:
-                    logger.warning(f"❌ {base_table_name} tablosundan markalar alınamadı: {e}")
-                    continue
+            tasks = {base_table_name: partial(table_brands, base_table_name=base_table_name) for base_table_name in legacy}
+            if unified:
+                tasks[PRODUCTS_TABLE] = unified_brands
             
-            cur.close()
-            conn.close()
+            for brands in self.table_fanout.run(tasks, label='marka listesi').results.values():
+                all_brands.update(brands)
             
             # Benzersiz markaları sırala
             sorted_brands = sorted(list(all_brands))
@@ -641,55 +1152,53 @@ class RAGService:
     def get_sales_data_for_dashboard(self) -> List[Dict[str, Any]]:
         """Dashboard için satış verilerini getir"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cur = conn.cursor()
-            
             sales_data = []
-            tables = self.get_available_tables()
+            unified, legacy = split_unified_categories(
+                self.schema_catalog, [table_name.replace('_embeddings', '') for table_name in self.get_available_tables()]
+            )
             
-            for table_name in tables:
-                base_table_name = table_name.replace('_embeddings', '')
-                
-                try:
-                    # Her tablodan satış verilerini al
-                    cur.execute(f"""
+            def table_sales(cur, base_table_name: str) -> List[Dict[str, Any]]:
+                # Her tablodan satış verilerini al
+                cur.execute(f"""
+                    SELECT 
+                        name,
+                        brand,
+                        price,
+                        rating,
+                        seller_name,
+                        stock_status,
+                        availability
+                    FROM {base_table_name} 
+                    WHERE price IS NOT NULL 
+                    AND price > 0
+                    ORDER BY price DESC
+                    LIMIT 10
+                """)
+                return [self._sales_row(product, base_table_name) for product in cur.fetchall()]
+            
+            def unified_sales(cur) -> List[Dict[str, Any]]:
+                # Birleşik tabloda kategori başına en pahalı 10 ürün tek sorguda
+                cur.execute(f"""
+                    SELECT name, brand, price, rating, seller_name, stock_status, availability, source_table
+                    FROM (
                         SELECT 
-                            name,
-                            brand,
-                            price,
-                            rating,
-                            seller_name,
-                            stock_status,
-                            availability
-                        FROM {base_table_name} 
-                        WHERE price IS NOT NULL 
+                            name, brand, price, rating, seller_name, stock_status, availability, source_table,
+                            row_number() OVER (PARTITION BY source_table ORDER BY price DESC) AS rank
+                        FROM {PRODUCTS_TABLE}
+                        WHERE source_table = ANY(%s)
+                        AND price IS NOT NULL 
                         AND price > 0
-                        ORDER BY price DESC
-                        LIMIT 10
-                    """)
-                    
-                    products = cur.fetchall()
-                    
-                    for product in products:
-                        sales_data.append({
-                            'product_name': product[0] or 'Bilinmeyen Ürün',
-                            'brand': product[1] or 'Bilinmeyen Marka',
-                            'price': float(product[2]) if product[2] else 0,
-                            'rating': float(product[3]) if product[3] else 0,
-                            'seller': product[4] or 'Bilinmeyen Satıcı',
-                            'stock_status': product[5] or 'Bilinmeyen',
-                            'availability': product[6] or 'Bilinmeyen',
-                            'source_table': base_table_name,
-                            'progress': min(100, max(0, float(product[3] or 0) * 20)),  # Rating * 20
-                            'risk_score': self._calculate_quick_risk_score(float(product[2] or 0), float(product[3] or 0))
-                        })
-                    
-                except Exception as e:
-                    logger.warning(f"❌ {base_table_name} tablosundan satış verileri alınamadı: {e}")
-                    continue
+                    ) ranked
+                    WHERE rank <= 10
+                """, (unified,))
+                return [self._sales_row(row[:7], row[7]) for row in cur.fetchall()]
             
-            cur.close()
-            conn.close()
+            tasks = {base_table_name: partial(table_sales, base_table_name=base_table_name) for base_table_name in legacy}
+            if unified:
+                tasks[PRODUCTS_TABLE] = unified_sales
+            
+            for rows in self.table_fanout.run(tasks, label='satış verileri').results.values():
+                sales_data.extend(rows)
             
             # Fiyata göre sırala
             sales_data.sort(key=lambda x: x['price'], reverse=True)
@@ -701,6 +1210,37 @@ class RAGService:
             logger.error(f"❌ Satış verileri alınamadı: {e}")
             return []
 
+    def _sales_row(self, product, source_table: str) -> Dict[str, Any]:
+        """(name, brand, price, rating, seller_name, stock_status, availability) satırından dashboard kaydı"""
+        return {
+            'product_name': product[0] or 'Bilinmeyen Ürün',
+            'brand': product[1] or 'Bilinmeyen Marka',
+            'price': float(product[2]) if product[2] else 0,
+            'rating': float(product[3]) if product[3] else 0,
+            'seller': product[4] or 'Bilinmeyen Satıcı',
+            'stock_status': product[5] or 'Bilinmeyen',
+            'availability': product[6] or 'Bilinmeyen',
+            'source_table': source_table,
+            'progress': min(100, max(0, float(product[3] or 0) * 20)),  # Rating * 20
+            'risk_score': self._calculate_quick_risk_score(float(product[2] or 0), float(product[3] or 0))
+        }
+
+    def score_table_risks(self, source_table: str):
+        """
+        Bir kategorinin tüm ürünlerini tek vektörel geçişte risk skorla
+        
+        Sonuçlar get_product_details'teki risk_analysis ile aynıdır; toplu dışa aktarım ve
+        dashboard'lar için pandas DataFrame döner.
+        """
+        frame = load_table_frame(self.db_pool, source_table, self.schema_catalog.id_column(source_table))
+        avg_price = self.stats_cache.get_average_price(source_table)
+        scored = score_frame(
+            frame, avg_price,
+            lambda brand: self.stats_cache.brand_match_count(source_table, brand)
+        )
+        logger.info(f"📊 {source_table}: {len(scored)} ürün toplu skorlandı")
+        return scored
+    
     def _calculate_quick_risk_score(self, price: float, rating: float) -> float:
         """Hızlı risk skoru hesapla"""
         try:
@@ -0,0 +1,210 @@
+# response_cache.py
+import hashlib
+import select
+import threading
+import time
+import os
+import logging
+from typing import Callable, Dict, Any, Optional, Tuple
+
+import psycopg2
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Endpoint anahtarı -> varsayılan TTL (saniye), RESPONSE_CACHE_TTL_<ANAHTAR> ile değiştirilebilir
+DEFAULT_TTLS = {
+    'table_stats': 60,
+    'brands': 300,
+    'sales_data': 60,
+}
+
+# gunicorn worker'ları arasında geçersiz kılma kanalı (payload: anahtar, boş: tümü)
+INVALIDATION_CHANNEL = 'response_cache_invalidate'
+
+
+class ResponseCache:
+    """
+    Ağır dashboard endpoint'lerinin serileştirilmiş yanıt önbelleği
+
+    Yanıt gövdesi (JSON bayt) ve içerikten türetilen ETag saklanır; tekrar eden istekler
+    sorgu ve serileştirme yapmadan döner. Aynı anahtar için eşzamanlı ıskalamalarda
+    hesaplama bir kez yapılır, diğerleri sonucu bekler.
+
+    Geçersiz kılma:
+    - Endpoint başına TTL dolunca (RESPONSE_CACHE_TTL_<ANAHTAR>)
+    - Embedding/ürün yazıldığında invalidate() ile açıkça; önbellek süreç başınadır,
+      diğer worker'lara publish_invalidation + InvalidationListener ile yayılır
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, ttls: Optional[Dict[str, float]] = None):
+        self.enabled = enabled if enabled is not None else os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.ttls = {key: float(os.getenv(f'RESPONSE_CACHE_TTL_{key.upper()}', str(ttl)))
+                     for key, ttl in DEFAULT_TTLS.items()}
+        self.ttls.update(ttls or {})
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return hashlib.sha1(body).hexdigest()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Tuple[bytes, bool]]) -> Tuple[bytes, str]:
+        """
+        Önbellekteki yanıtı döndür; yoksa ya da süresi dolduysa hesapla
+
+        Args:
+            key: Endpoint anahtarı (DEFAULT_TTLS)
+            compute: () -> (gövde, saklanabilir_mi); hatalı/boş sonuçlar saklanmaz
+
+        Returns:
+            (gövde, etag)
+        """
+        if not self.enabled:
+            body, _ = compute()
+            return body, self.make_etag(body)
+
+        entry = self._fresh_entry(key)
+        if entry is not None:
+            return entry['body'], entry['etag']
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Kilidi beklerken başka bir istek hesaplamış olabilir
+            entry = self._fresh_entry(key)
+            if entry is not None:
+                return entry['body'], entry['etag']
+
+            with self._lock:
+                self.misses += 1
+                generation = self._entries.get(key, {}).get('generation', 0)
+
+            body, cacheable = compute()
+            etag = self.make_etag(body)
+            if cacheable:
+                with self._lock:
+                    # Hesaplama sürerken invalidate edildiyse eski sonucu saklama
+                    current = self._entries.get(key, {}).get('generation', 0)
+                    if current == generation:
+                        self._entries[key] = {'body': body, 'etag': etag, 'stored_at': time.time(),
+                                              'generation': generation}
+            return body, etag
+
+    def _fresh_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or 'body' not in entry:
+                return None
+            if time.time() - entry['stored_at'] >= self.ttls.get(key, 60):
+                return None
+            self.hits += 1
+            return entry
+
+    def invalidate(self, key: Optional[str] = None):
+        """Bir endpoint'in (ya da hepsinin) önbelleğini düşür"""
+        with self._lock:
+            keys = set(self._entries) | set(self._key_locks) if key is None else [key]
+            for cache_key in keys:
+                generation = self._entries.get(cache_key, {}).get('generation', 0)
+                # Süren hesaplamalar sonucu saklamasın diye nesil artırılır
+                self._entries[cache_key] = {'generation': generation + 1}
+            self.invalidations += 1
+        logger.info(f"🧹 Yanıt önbelleği temizlendi: {key or 'tümü'}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'ttls': dict(self.ttls),
+                'cached': sorted(key for key, entry in self._entries.items() if 'body' in entry),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+
+def publish_invalidation(db_pool, key: Optional[str] = None):
+    """Geçersiz kılmayı NOTIFY ile tüm süreçlere yayınla (yayınlayan süreç dahil)"""
+    with db_pool.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, key or ''))
+        cursor.connection.commit()
+
+
+class InvalidationListener:
+    """
+    Diğer süreçlerin yayınladığı geçersiz kılmaları LISTEN ile dinleyen iş parçacığı
+
+    Havuz dışı, kendine ait bir bağlantı kullanır; bağlantı koparsa yeniden bağlanır.
+    Kopukluk sırasında kaçan bildirimler için yeniden bağlanınca tüm önbellek düşürülür.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], on_invalidate: Callable[[Optional[str]], None],
+                 poll_seconds: float = 5.0, reconnect_seconds: float = 5.0):
+        """
+        Args:
+            db_config: Veritabanı ayarları
+            on_invalidate: Anahtarla (tümü için None) çağrılır; tekrar yayınlamamalıdır
+            poll_seconds: Durdurma kontrolü aralığı
+            reconnect_seconds: Bağlantı hatasından sonra bekleme
+        """
+        self.db_config = db_config
+        self.on_invalidate = on_invalidate
+        self.poll_seconds = poll_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self.received = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='cache-invalidation', daemon=True)
+        self._thread.start()
+        logger.info(f"📡 Önbellek geçersiz kılma dinleyicisi başlatıldı ({INVALIDATION_CHANNEL})")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        first_connect = True
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+                cur.close()
+                if not first_connect:
+                    self._dispatch(None)
+                first_connect = False
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._dispatch(notify.payload or None)
+            except psycopg2.Error as e:
+                first_connect = False
+                logger.warning(f"⚠️ Önbellek dinleyici bağlantısı koptu: {e}")
+                self._stop.wait(self.reconnect_seconds)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _dispatch(self, key: Optional[str]):
+        self.received += 1
+        try:
+            self.on_invalidate(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Önbellek geçersiz kılma uygulanamadı ({key or 'tümü'}): {e}")
@@ -0,0 +1,181 @@
+# risk_engine.py
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict, Any, Callable, Optional, Sequence
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# RAGService'teki skaler eşiklerle birebir aynı olmalı
+RISK_LEVELS = ("YÜKSEK RİSK", "ORTA RİSK", "DÜŞÜK RİSK", "ÇOK DÜŞÜK RİSK")
+SELLER_RECOMMENDATIONS = (
+    "SATIŞ ÖNERİLMEZ - Yüksek risk faktörleri mevcut",
+    "DİKKATLİ SATIŞ - Risk faktörlerini değerlendirin",
+    "SATIŞ YAPILABİLİR - Makul risk seviyesi",
+    "ÖNERİLEN ÜRÜN - Düşük risk, yüksek potansiyel",
+)
+
+
+def to_float_array(values: Sequence) -> np.ndarray:
+    """Decimal/None içeren sütunu float64 diziye çevir (None -> NaN)"""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Python round() ile birebir aynı yuvarlama
+
+    np.round ölçekleyip yuvarladığı için tam yarım sınırındaki değerlerde Python'dan
+    farklı sonuç verebilir; sadece o belirsiz değerler için Python round kullanılır.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * (10 ** ndigits)
+    ambiguous = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(ambiguous & np.isfinite(values)):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def price_risk(prices: np.ndarray, avg_price) -> np.ndarray:
+    """Kategori ortalamasına göre fiyat riski (RAGService._price_risk_from_average)"""
+    if not avg_price:
+        return np.full(prices.shape, 5.0)
+    avg_price = float(avg_price)
+    return np.select(
+        [prices > avg_price * 1.5, prices > avg_price * 1.2, prices < avg_price * 0.8],
+        [8.0, 6.0, 4.0],
+        default=3.0
+    )
+
+
+def rating_risk(ratings: np.ndarray) -> np.ndarray:
+    """Rating riski (RAGService._calculate_rating_risk)"""
+    return np.select(
+        [ratings >= 4.5, ratings >= 4.0, ratings >= 3.5, ratings >= 3.0],
+        [2.0, 3.0, 5.0, 7.0],
+        default=9.0
+    )
+
+
+def competition_risk_from_counts(brand_counts: np.ndarray) -> np.ndarray:
+    """Marka ürün sayısına göre rekabet riski (RAGService._competition_risk_from_count)"""
+    return np.select(
+        [brand_counts > 50, brand_counts > 20, brand_counts > 10],
+        [8.0, 6.0, 4.0],
+        default=2.0
+    )
+
+
+def competition_risk(brands: Sequence, brand_match_count: Callable[[Any], int]) -> np.ndarray:
+    """Her benzersiz marka için sayım bir kez yapılır, sonuç tüm satırlara yayılır"""
+    brand_keys = np.array([str(brand) for brand in brands], dtype=object)
+    if brand_keys.size == 0:
+        return np.zeros(0)
+    unique_brands, inverse = np.unique(brand_keys, return_inverse=True)
+    counts = np.array([brand_match_count(brand) for brand in unique_brands], dtype=np.int64)
+    return competition_risk_from_counts(counts)[inverse]
+
+
+def risk_levels(overall: np.ndarray) -> np.ndarray:
+    """Risk seviyesi (RAGService._get_risk_level)"""
+    return np.select([overall >= 7, overall >= 5, overall >= 3], list(RISK_LEVELS[:3]),
+                     default=RISK_LEVELS[3]).astype(object)
+
+
+def seller_recommendations(overall: np.ndarray) -> np.ndarray:
+    """Satıcı önerisi (RAGService._get_seller_recommendation)"""
+    return np.select([overall >= 7, overall >= 5, overall >= 3], list(SELLER_RECOMMENDATIONS[:3]),
+                     default=SELLER_RECOMMENDATIONS[3]).astype(object)
+
+
+def score_arrays(prices: Sequence, ratings: Sequence, brands: Sequence, avg_price,
+                 brand_match_count: Callable[[Any], int]) -> Dict[str, np.ndarray]:
+    """
+    Bir tablonun tüm ürünleri için risk analizini tek vektörel geçişte hesapla
+
+    Sonuçlar RAGService._calculate_risk_metrics ile aynıdır. Fiyatı ya da rating'i
+    sayıya çevrilemeyen ürünler skaler yolda risk_analysis almadığı için burada
+    `valid` False olarak işaretlenir.
+
+    Args:
+        prices: Fiyat sütunu
+        ratings: Rating sütunu
+        brands: Marka sütunu
+        avg_price: Kategorinin sıfırdan büyük fiyat ortalaması
+        brand_match_count: marka -> `brand ILIKE '%marka%'` sayısı
+
+    Returns:
+        price_risk, rating_risk, competition_risk, overall_risk, risk_level,
+        seller_recommendation ve valid dizileri
+    """
+    prices = to_float_array(prices)
+    ratings = to_float_array(ratings)
+
+    price_scores = price_risk(prices, avg_price)
+    rating_scores = rating_risk(ratings)
+    competition_scores = competition_risk(brands, brand_match_count)
+
+    # Skaler yoldaki toplama sırası korunur
+    overall = (price_scores + rating_scores + competition_scores) / 3
+
+    return {
+        'price_risk': price_scores,
+        'rating_risk': rating_scores,
+        'competition_risk': competition_scores,
+        'overall_risk': round_like_python(overall, 2),
+        'risk_level': risk_levels(overall),
+        'seller_recommendation': seller_recommendations(overall),
+        'valid': ~(np.isnan(prices) | np.isnan(ratings))
+    }
+
+
+def quick_risk_scores(prices: Sequence, ratings: Sequence) -> np.ndarray:
+    """Dashboard hızlı risk skoru (RAGService._calculate_quick_risk_score)"""
+    prices = np.nan_to_num(to_float_array(prices), nan=0.0)
+    ratings = np.nan_to_num(to_float_array(ratings), nan=0.0)
+
+    price_scores = np.where(prices > 0, np.minimum(10, prices / 1000), 5)
+    rating_scores = np.where(ratings > 0, np.maximum(0, 10 - (ratings * 2)), 10)
+
+    return round_like_python((price_scores + rating_scores) / 2, 1)
+
+
+def score_frame(frame: pd.DataFrame, avg_price, brand_match_count: Callable[[Any], int]) -> pd.DataFrame:
+    """
+    price/rating/brand sütunları olan DataFrame'e risk sütunlarını ekle
+
+    Skaler yolda risk alamayacak satırların risk sütunları boş (NaN/None) kalır.
+    """
+    scores = score_arrays(frame['price'].to_numpy(), frame['rating'].to_numpy(),
+                          frame['brand'].to_numpy(), avg_price, brand_match_count)
+    valid = scores.pop('valid')
+
+    result = frame.copy()
+    for column, values in scores.items():
+        if values.dtype == object:
+            result[column] = np.where(valid, values, None)
+        else:
+            result[column] = np.where(valid, values, np.nan)
+    result['quick_risk_score'] = quick_risk_scores(frame['price'].to_numpy(), frame['rating'].to_numpy())
+    return result
+
+
+def load_table_frame(db_pool, source_table: str, id_column: Optional[str] = None) -> pd.DataFrame:
+    """Risk girdilerini (id, price, rating, brand) tek sorguda DataFrame olarak oku"""
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        if id_column is None:
+            cur.execute("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name = %s
+            """, (source_table,))
+            columns = {row[0] for row in cur.fetchall()}
+            id_column = 'product_id' if 'product_id' in columns else 'id'
+
+        cur.execute(f"SELECT {id_column}, price, rating, brand FROM {source_table}")
+        rows = cur.fetchall()
+        cur.close()
+
+    return pd.DataFrame(rows, columns=['product_id', 'price', 'rating', 'brand'])
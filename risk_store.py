@@ -0,0 +1,340 @@
+# risk_store.py
+import sys
+import threading
+import time
+import os
+import logging
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from typing import List, Dict, Any, Optional
+
+from db_pool import AdvisoryLock
+from risk_engine import load_table_frame, score_frame
+from schema_catalog import SchemaCatalog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RISK_COLUMNS = ['price_risk', 'rating_risk', 'competition_risk', 'overall_risk', 'risk_level', 'seller_recommendation']
+
+CREATE_PRODUCT_RISK_SQL = """
+    CREATE TABLE IF NOT EXISTS product_risk (
+        source_table VARCHAR(255) NOT NULL,
+        product_id VARCHAR(255) NOT NULL,
+        price NUMERIC,
+        rating NUMERIC,
+        brand TEXT,
+        stats_avg_price NUMERIC,
+        stats_brand_count INTEGER,
+        price_risk DOUBLE PRECISION,
+        rating_risk DOUBLE PRECISION,
+        competition_risk DOUBLE PRECISION,
+        overall_risk DOUBLE PRECISION,
+        risk_level VARCHAR(50),
+        seller_recommendation TEXT,
+        quick_risk_score DOUBLE PRECISION,
+        computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (source_table, product_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_product_risk_overall
+    ON product_risk (source_table, overall_risk DESC);
+"""
+
+
+def _relative_change(old, new) -> float:
+    """İki değer arasındaki göreli değişim (None/0 durumlarında değişim varsa 1.0)"""
+    if old is None or new is None:
+        return 0.0 if old == new else 1.0
+    old, new = float(old), float(new)
+    if old == 0:
+        return 0.0 if new == 0 else 1.0
+    return abs(new - old) / abs(old)
+
+
+class RiskStore:
+    """
+    Kalıcı risk skorları (product_risk tablosu)
+
+    Skorlar risk_engine ile toplu hesaplanır ve skorlandıkları girdilerle (fiyat, rating,
+    marka, kategori ortalaması, marka sayısı) birlikte saklanır. refresh_table sadece
+    girdisi değişen ya da tablo istatistiği eşikten fazla kayan satırları yeniden hesaplar.
+    """
+
+    def __init__(self, db_pool, stats_cache, drift_threshold: Optional[float] = None, schema_catalog=None):
+        """
+        Args:
+            db_pool: Paylaşılan bağlantı havuzu
+            stats_cache: TableStatsCache
+            drift_threshold: Kategori ortalaması / marka sayısındaki göreli değişim bu
+                değeri aşarsa skor yeniden hesaplanır (RISK_STATS_DRIFT_THRESHOLD)
+            schema_catalog: SchemaCatalog (id sütunu seçimi için; yoksa oluşturulur)
+        """
+        self.db_pool = db_pool
+        self.stats_cache = stats_cache
+        self.schema_catalog = schema_catalog or SchemaCatalog(db_pool)
+        self.drift_threshold = (drift_threshold if drift_threshold is not None
+                                else float(os.getenv('RISK_STATS_DRIFT_THRESHOLD', '0.05')))
+        self._schema_ready = False
+        # product_risk var mı? (okuma yolunda transaction'ı bozmamak için önceden bakılır)
+        self._available_checked_at = 0.0
+
+    def ensure_schema(self):
+        """product_risk tablosunu (yoksa) oluştur"""
+        if self._schema_ready:
+            return
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(CREATE_PRODUCT_RISK_SQL)
+            conn.commit()
+            cur.close()
+        self._schema_ready = True
+
+    def refresh_table(self, source_table: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Bir kategorinin saklı skorlarını artımlı güncelle
+
+        Args:
+            source_table: Kaynak ürün tablosu
+            force: Tüm satırları yeniden hesapla
+
+        Returns:
+            Özet (toplam, yeniden hesaplanan, silinen, süre)
+        """
+        started = time.time()
+        self.ensure_schema()
+
+        frame = load_table_frame(self.db_pool, source_table, self.schema_catalog.id_column(source_table))
+        frame['product_id'] = frame['product_id'].astype(str)
+        frame = frame.drop_duplicates('product_id', keep='last')
+
+        avg_price = self.stats_cache.get_average_price(source_table)
+
+        def brand_match_count(brand):
+            return self.stats_cache.brand_match_count(source_table, brand)
+
+        frame['stats_brand_count'] = [brand_match_count(brand) for brand in frame['brand']]
+
+        with self.db_pool.cursor() as cur:
+            cur.execute("""
+                SELECT product_id, price, rating, brand, stats_avg_price, stats_brand_count
+                FROM product_risk
+                WHERE source_table = %s
+            """, (source_table,))
+            stored = {row[0]: row[1:] for row in cur.fetchall()}
+
+        changed = np.array([
+            force or self._needs_refresh(stored.get(pid), price, rating, brand, avg_price, brand_count)
+            for pid, price, rating, brand, brand_count in zip(
+                frame['product_id'], frame['price'], frame['rating'], frame['brand'], frame['stats_brand_count']
+            )
+        ], dtype=bool)
+
+        to_score = frame[changed]
+        scored = score_frame(to_score, avg_price, brand_match_count) if len(to_score) else to_score
+        valid = scored['overall_risk'].notna() if len(scored) else pd.Series(dtype=bool)
+
+        rows = [
+            (source_table, r.product_id, r.price, r.rating, r.brand, avg_price, int(r.stats_brand_count),
+             float(r.price_risk), float(r.rating_risk), float(r.competition_risk), float(r.overall_risk),
+             r.risk_level, r.seller_recommendation, float(r.quick_risk_score))
+            for r in scored[valid].itertuples(index=False)
+        ] if len(scored) else []
+
+        # Kaynakta artık olmayan ya da skorlanamayan ürünlerin kayıtları silinir
+        current_ids = set(frame['product_id'])
+        removed = [pid for pid in stored if pid not in current_ids]
+        if len(scored):
+            removed += list(scored.loc[~valid, 'product_id'])
+
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            if rows:
+                execute_values(cur, """
+                    INSERT INTO product_risk (
+                        source_table, product_id, price, rating, brand, stats_avg_price, stats_brand_count,
+                        price_risk, rating_risk, competition_risk, overall_risk, risk_level,
+                        seller_recommendation, quick_risk_score
+                    ) VALUES %s
+                    ON CONFLICT (source_table, product_id) DO UPDATE SET
+                        price = EXCLUDED.price,
+                        rating = EXCLUDED.rating,
+                        brand = EXCLUDED.brand,
+                        stats_avg_price = EXCLUDED.stats_avg_price,
+                        stats_brand_count = EXCLUDED.stats_brand_count,
+                        price_risk = EXCLUDED.price_risk,
+                        rating_risk = EXCLUDED.rating_risk,
+                        competition_risk = EXCLUDED.competition_risk,
+                        overall_risk = EXCLUDED.overall_risk,
+                        risk_level = EXCLUDED.risk_level,
+                        seller_recommendation = EXCLUDED.seller_recommendation,
+                        quick_risk_score = EXCLUDED.quick_risk_score,
+                        computed_at = CURRENT_TIMESTAMP
+                """, rows, page_size=1000)
+            if removed:
+                cur.execute("""
+                    DELETE FROM product_risk
+                    WHERE source_table = %s AND product_id = ANY(%s)
+                """, (source_table, removed))
+            conn.commit()
+            cur.close()
+
+        summary = {
+            'source_table': source_table,
+            'total': len(frame),
+            'recomputed': len(rows),
+            'removed': len(removed),
+            'duration_seconds': round(time.time() - started, 3)
+        }
+        logger.info(f"💾 {source_table} risk skorları güncellendi: {summary}")
+        return summary
+
+    def _needs_refresh(self, stored_row, price, rating, brand, avg_price, brand_count) -> bool:
+        """Saklı skor bu girdiler için hâlâ geçerli mi?"""
+        if stored_row is None:
+            return True
+        old_price, old_rating, old_brand, old_avg_price, old_brand_count = stored_row
+        if old_price != price or old_rating != rating or old_brand != brand:
+            return True
+        return (_relative_change(old_avg_price, avg_price) > self.drift_threshold or
+                _relative_change(old_brand_count, brand_count) > self.drift_threshold)
+
+    def is_available(self, cur) -> bool:
+        """product_risk tablosu var mı (olumsuz sonuç 60 sn önbelleklenir)"""
+        if self._schema_ready:
+            return True
+        if time.time() - self._available_checked_at < 60:
+            return False
+        cur.execute("SELECT to_regclass('product_risk')")
+        self._schema_ready = cur.fetchone()[0] is not None
+        self._available_checked_at = time.time()
+        return self._schema_ready
+
+    def fetch_stored(self, cur, source_table: str, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Verilen ürünlerin saklı skorlarını getir (çağıranın cursor'ı ile)
+
+        Returns:
+            product_id -> {'inputs': (price, rating, brand), 'risk_analysis': {...}}
+        """
+        if not product_ids or not self.is_available(cur):
+            return {}
+
+        cur.execute(f"""
+            SELECT product_id, price, rating, brand, {', '.join(RISK_COLUMNS)}
+            FROM product_risk
+            WHERE source_table = %s AND product_id = ANY(%s)
+        """, (source_table, [str(pid) for pid in product_ids]))
+
+        stored = {}
+        for row in cur.fetchall():
+            stored[row[0]] = {
+                'inputs': (row[1], row[2], row[3]),
+                'risk_analysis': dict(zip(RISK_COLUMNS, row[4:]))
+            }
+        return stored
+
+    def top_risks(self, source_table: Optional[str] = None, limit: int = 20,
+                  descending: bool = True) -> List[Dict[str, Any]]:
+        """overall_risk'e göre sıralı saklı skorlar (idx_product_risk_overall)"""
+        order = 'DESC' if descending else 'ASC'
+        where = "WHERE source_table = %s" if source_table else ""
+        params = ([source_table] if source_table else []) + [limit]
+
+        with self.db_pool.cursor() as cur:
+            cur.execute(f"""
+                SELECT source_table, product_id, price, rating, brand,
+                       {', '.join(RISK_COLUMNS)}, quick_risk_score, computed_at
+                FROM product_risk
+                {where}
+                ORDER BY overall_risk {order}
+                LIMIT %s
+            """, params)
+            columns = [desc[0] for desc in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+class RiskRefreshWorker:
+    """
+    Saklı risk skorlarını arka planda periyodik olarak güncelleyen iş parçacığı
+
+    Her gunicorn worker'ında başlatılır ama turları sadece 'risk_refresh' advisory lock'unu
+    tutan süreç çalıştırır; diğerleri her turda kilidi yeniden dener. Lider süreç ölürse
+    kilit bağlantıyla birlikte bırakılır ve sonraki turda başka bir worker devralır.
+    """
+
+    LOCK_NAME = 'risk_refresh'
+
+    def __init__(self, risk_store: RiskStore, list_tables, interval_seconds: Optional[float] = None):
+        """
+        Args:
+            risk_store: RiskStore
+            list_tables: Güncellenecek kaynak tabloları döndüren fonksiyon
+            interval_seconds: Turlar arası bekleme (RISK_REFRESH_INTERVAL_SECONDS)
+        """
+        self.risk_store = risk_store
+        self.list_tables = list_tables
+        self.interval_seconds = (interval_seconds if interval_seconds is not None
+                                 else float(os.getenv('RISK_REFRESH_INTERVAL_SECONDS', '600')))
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader_lock = AdvisoryLock(risk_store.db_pool.db_config, self.LOCK_NAME)
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_lock.held
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='risk-refresh', daemon=True)
+        self._thread.start()
+        logger.info(f"🔄 Risk skoru güncelleyici başlatıldı ({self.interval_seconds} sn)")
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> List[Dict[str, Any]]:
+        """Tüm tabloları bir kez güncelle"""
+        summaries = []
+        for source_table in self.list_tables():
+            try:
+                summaries.append(self.risk_store.refresh_table(source_table))
+            except Exception as e:
+                logger.warning(f"⚠️ {source_table} risk skorları güncellenemedi: {e}")
+        self.last_run = {'finished_at': time.time(), 'tables': summaries}
+        return summaries
+
+    def _run(self):
+        was_leader = False
+        try:
+            while not self._stop.is_set():
+                if self._leader_lock.try_acquire():
+                    if not was_leader:
+                        logger.info(f"👑 Risk güncelleme lideri bu süreç (pid {os.getpid()})")
+                    was_leader = True
+                    self.run_once()
+                else:
+                    was_leader = False
+                    logger.debug("Risk güncellemesini başka bir süreç yürütüyor")
+                self._stop.wait(self.interval_seconds)
+        finally:
+            self._leader_lock.release()
+
+
+if __name__ == "__main__":
+    # Tüm kategoriler için saklı skorları bir kez güncelle (embedding modeli yüklenmez)
+    from create_missing_embeddings import load_db_config
+    from db_pool import get_pool
+    from table_stats_cache import TableStatsCache
+
+    db_pool = get_pool(load_db_config())
+    store = RiskStore(db_pool, TableStatsCache(db_pool))
+
+    tables = [table.replace('_embeddings', '') for table in store.schema_catalog.embedding_tables()]
+
+    for table in tables:
+        store.refresh_table(table, force='--force' in sys.argv)
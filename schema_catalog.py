@@ -0,0 +1,184 @@
+# schema_catalog.py
+import threading
+import time
+import os
+import logging
+from typing import Dict, Any, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Katalogda tutulan ilişki türleri: tablo, bölümlenmiş tablo, view, materialized view
+RELATION_KINDS = ['r', 'p', 'v', 'm']
+
+
+class SchemaCatalog:
+    """
+    public şemasındaki tablo ve sütunların önbelleği
+
+    Embedding tablosu listesi, tablo sütunları ve id sütunu seçimi için her istekte
+    information_schema sorgulamak yerine katalog tek sorguyla yüklenir.
+
+    Geçersiz kılma:
+    - TTL dolunca (SCHEMA_CATALOG_TTL_SECONDS)
+    - DDL değişince: pg_class imzası (ilişki adı, sütun sayısı, xmin) en fazla
+      SCHEMA_CATALOG_CHANGE_CHECK_SECONDS aralıkla kontrol edilir
+    - invalidate() ile açıkça (uygulamanın kendi DDL'inden sonra)
+
+    Veritabanı sorguları kilit dışında yapılır. Yeniden yükleme tek thread'de yapılır;
+    yükleme sürerken diğer okuyucular mevcut kataloğu kullanmaya devam eder (katalog
+    hiç yoksa ya da invalidate edildiyse yüklemeyi beklerler).
+    """
+
+    def __init__(self, db_pool, ttl_seconds: Optional[float] = None, change_check_seconds: Optional[float] = None):
+        self.db_pool = db_pool
+        self.ttl_seconds = (ttl_seconds if ttl_seconds is not None
+                            else float(os.getenv('SCHEMA_CATALOG_TTL_SECONDS', '300')))
+        self.change_check_seconds = (change_check_seconds if change_check_seconds is not None
+                                     else float(os.getenv('SCHEMA_CATALOG_CHANGE_CHECK_SECONDS', '10')))
+
+        self._lock = threading.RLock()
+        # Aynı anda tek yükleme
+        self._load_lock = threading.Lock()
+        self._catalog: Optional[Dict[str, Any]] = None
+        # invalidate() sayacı; yükleme sürerken geçersiz kılınırsa eski sonuç saklanmaz
+        self._generation = 0
+        self.loads = 0
+        self.hits = 0
+
+    def embedding_tables(self) -> List[str]:
+        """Mevcut *_embeddings tabloları (alfabetik; bölümlenmiş üst tablolar hariç)"""
+        return list(self._get()['embedding_tables'])
+
+    def table_exists(self, table_name: str) -> bool:
+        return table_name in self._get()['columns']
+
+    def relation_kind(self, table_name: str) -> Optional[str]:
+        """pg_class.relkind: r (tablo), p (bölümlenmiş tablo), v (view), m (materialized view)"""
+        return self._get()['kinds'].get(table_name)
+
+    def columns(self, table_name: str) -> List[str]:
+        """Tablonun sütunları (tanım sırasıyla); tablo yoksa boş liste"""
+        return list(self._get()['columns'].get(table_name, []))
+
+    def columns_by_table(self, table_names: List[str]) -> Dict[str, List[str]]:
+        """Verilen tablolardan mevcut olanların sütunları"""
+        columns = self._get()['columns']
+        return {name: list(columns[name]) for name in table_names if name in columns}
+
+    def id_column(self, table_name: str) -> str:
+        """Tablo yapısına göre ürün id sütunu (product_id varsa o, yoksa id)"""
+        return 'product_id' if 'product_id' in self._get()['columns'].get(table_name, []) else 'id'
+
+    def invalidate(self):
+        """Kataloğu düşür; sonraki erişimde yeniden yüklenir"""
+        with self._lock:
+            self._catalog = None
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            catalog = self._catalog
+            return {
+                'tables': len(catalog['columns']) if catalog else 0,
+                'embedding_tables': list(catalog['embedding_tables']) if catalog else [],
+                'loaded_at': catalog['loaded_at'] if catalog else None,
+                'loads': self.loads,
+                'hits': self.hits
+            }
+
+    def _get(self) -> Dict[str, Any]:
+        with self._lock:
+            catalog = self._catalog
+            now = time.time()
+            fresh = catalog is not None and now - catalog['loaded_at'] < self.ttl_seconds
+            if fresh and now - catalog['checked_at'] < self.change_check_seconds:
+                self.hits += 1
+                return catalog
+            if fresh:
+                # Diğer thread'ler kontrol sürerken mevcut kataloğu kullanmaya devam etsin
+                catalog['checked_at'] = now
+
+        if fresh:
+            if self._signature() == catalog['signature']:
+                with self._lock:
+                    self.hits += 1
+                return catalog
+            logger.info("🔄 Şema değişti, katalog yenileniyor")
+
+        return self._reload(catalog)
+
+    def _reload(self, current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Kataloğu tek thread'de yeniden yükle; yükleme sürüyorsa mevcut kataloğu döndür"""
+        if not self._load_lock.acquire(blocking=current is None):
+            return current
+        try:
+            with self._lock:
+                latest = self._catalog
+                if latest is not None and latest is not current:
+                    # Kilidi beklerken başka bir thread yükledi
+                    return latest
+                generation = self._generation
+
+            catalog = self._load()
+            with self._lock:
+                self.loads += 1
+                if generation == self._generation:
+                    self._catalog = catalog
+            return catalog
+        finally:
+            self._load_lock.release()
+
+    def _signature(self) -> Optional[tuple]:
+        """public şemasındaki ilişkilerin DDL imzası (oluşturma/silme/yeniden adlandırma/sütun değişikliği)"""
+        try:
+            with self.db_pool.cursor() as cur:
+                cur.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(hashtext(c.relname || ':' || c.relnatts || ':' || c.xmin::text)), 0)
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = 'public'
+                    AND c.relkind = ANY(%s::"char"[])
+                """, (RELATION_KINDS,))
+                return tuple(cur.fetchone())
+        except Exception as e:
+            logger.warning(f"⚠️ Şema imzası okunamadı: {e}")
+            return None
+
+    def _load(self) -> Dict[str, Any]:
+        signature = self._signature()
+
+        with self.db_pool.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname, c.relkind, a.attname
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_attribute a ON a.attrelid = c.oid
+                WHERE n.nspname = 'public'
+                AND c.relkind = ANY(%s::"char"[])
+                AND NOT c.relispartition
+                AND a.attnum > 0
+                AND NOT a.attisdropped
+                ORDER BY c.relname, a.attnum
+            """, (RELATION_KINDS,))
+            rows = cur.fetchall()
+
+        columns: Dict[str, List[str]] = {}
+        kinds: Dict[str, str] = {}
+        for table_name, kind, column_name in rows:
+            columns.setdefault(table_name, []).append(column_name)
+            kinds[table_name] = kind
+
+        now = time.time()
+        catalog = {
+            'columns': columns,
+            'kinds': kinds,
+            'embedding_tables': sorted(name for name in columns
+                                       if name.endswith('_embeddings') and kinds[name] != 'p'),
+            'signature': signature,
+            'loaded_at': now,
+            'checked_at': now
+        }
+        logger.info(f"📋 Şema kataloğu yüklendi: {len(columns)} tablo, "
+                    f"embedding tabloları: {catalog['embedding_tables']}")
+        return catalog
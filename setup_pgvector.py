@@ -3,6 +3,10 @@ from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import logging
 import sys
 import os
+from risk_store import CREATE_PRODUCT_RISK_SQL
+from embedding_store import (CREATE_EMBEDDING_MODELS_SQL, EMBEDDING_MODEL_VERSION, ensure_model_columns,
+                             registered_table_model, register_if_consistent)
+from model_registry import QUERY_MODEL_NAME
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -138,7 +142,9 @@ def setup_pgvector(db_config):
                 product_name TEXT,
                 combined_text TEXT,
                 embedding vector(384),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                embedding_model VARCHAR(255),
+                embedding_model_version VARCHAR(50)
             );
             
             CREATE INDEX IF NOT EXISTS idx_{table}_embedding 
@@ -149,6 +155,23 @@ def setup_pgvector(db_config):
             cur.execute(create_embedding_table)
             logger.info(f"✅ {table}_embeddings tablosu oluşturuldu")
         
+        # Embedding tablosu -> model/sürüm kaydı
+        cur.execute(CREATE_EMBEDDING_MODELS_SQL)
+        logger.info("✅ embedding_table_models tablosu oluşturuldu")
+        
+        # Arama kaydı olmayan tabloları karşılaştırmaz; sadece sorgu modelinin vektörlerini
+        # içeren (ya da boş) tablolar sorgu modeliyle etiketlenir
+        for table in tables:
+            # Etiket sütunları olmadan oluşturulmuş eski tablolar
+            ensure_model_columns(cur, f"{table}_embeddings")
+            if registered_table_model(cur, f"{table}_embeddings") is None:
+                if register_if_consistent(cur, f"{table}_embeddings", QUERY_MODEL_NAME, EMBEDDING_MODEL_VERSION, 384):
+                    logger.info(f"✅ {table}_embeddings {QUERY_MODEL_NAME} v{EMBEDDING_MODEL_VERSION} olarak kaydedildi")
+        
+        # Kalıcı risk skorları
+        cur.execute(CREATE_PRODUCT_RISK_SQL)
+        logger.info("✅ product_risk tablosu oluşturuldu")
+        
         cur.close()
         conn.close()
         
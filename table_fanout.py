@@ -0,0 +1,161 @@
+# table_fanout.py
+import threading
+import time
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Optional, TypeVar
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class FanoutResult:
+    """Fan-out sonucu: tamamlanan tabloların sonuçları ve eksik kalanlar"""
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.failed: Dict[str, str] = {}
+        self.timed_out: list = []
+        self.duration_ms = 0.0
+
+    @property
+    def is_partial(self) -> bool:
+        return bool(self.failed or self.timed_out)
+
+
+class TableFanout:
+    """
+    Tablo başına sorguları havuzdaki ayrı bağlantılarda eşzamanlı çalıştırır
+
+    Her görev havuzdan kendi bağlantısını alır ve sorgusu statement_timeout ile sınırlanır;
+    toplam gecikme tabloların toplamı değil en yavaş tablo kadardır. Hata veren ya da süresi
+    dolan tablolar sonuca girmez (kısmi sonuç), diğer tabloların sonuçları döner.
+
+    Çağıran thread havuzdan bağlantı tutarken run() çağırmamalıdır; görevler aynı havuzdan
+    bağlantı beklediği için havuz tükenebilir.
+    """
+
+    def __init__(self, db_pool, max_workers: Optional[int] = None, table_timeout: Optional[float] = None):
+        """
+        Args:
+            db_pool: Paylaşılan DatabasePool
+            max_workers: Aynı anda çalışan tablo sorgusu (TABLE_FANOUT_WORKERS; 1: sıralı)
+            table_timeout: Tablo başına süre sınırı, saniye (TABLE_QUERY_TIMEOUT_SECONDS)
+        """
+        self.db_pool = db_pool
+        self.max_workers = (max_workers if max_workers is not None
+                            else int(os.getenv('TABLE_FANOUT_WORKERS', os.getenv('DB_POOL_MAX', '10'))))
+        self.table_timeout = (table_timeout if table_timeout is not None
+                              else float(os.getenv('TABLE_QUERY_TIMEOUT_SECONDS', '10')))
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self.runs = 0
+        self.partial_runs = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def run(self, tasks: Dict[str, Callable[[Any], T]], label: str = 'sorgu') -> FanoutResult:
+        """
+        Görevleri çalıştır ve sonuçları topla
+
+        Args:
+            tasks: Tablo adı -> cursor alan ve sonucu döndüren fonksiyon
+            label: Log mesajları için işlem adı
+
+        Returns:
+            FanoutResult (results: tablo adı -> görev sonucu)
+        """
+        started = time.monotonic()
+        outcome = FanoutResult()
+
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            # Sıralı modda her tablo kendi süresini alır
+            for name, task in tasks.items():
+                self._collect(outcome, name, lambda: self._run_task(task, time.monotonic()))
+        else:
+            executor = self._get_executor()
+            futures = {executor.submit(self._run_task, task, started): name for name, task in tasks.items()}
+            # Havuz beklemesi dahil en fazla tablo süresi + pay kadar beklenir
+            done, not_done = wait(futures, timeout=self._deadline(started) + 1.0 - time.monotonic())
+            for future in done:
+                self._collect(outcome, futures[future], future.result)
+            for future in not_done:
+                # Başlamamış görev iptal edilir; başlamış olan statement_timeout ile kendiliğinden biter
+                future.cancel()
+                outcome.timed_out.append(futures[future])
+
+        outcome.duration_ms = round((time.monotonic() - started) * 1000, 1)
+        with self._lock:
+            self.runs += 1
+            self.partial_runs += int(outcome.is_partial)
+            self.timeouts += len(outcome.timed_out)
+            self.failures += len(outcome.failed)
+
+        if outcome.is_partial:
+            logger.warning(f"⚠️ {label}: kısmi sonuç ({len(outcome.results)}/{len(tasks)} tablo, "
+                           f"zaman aşımı: {outcome.timed_out}, hata: {list(outcome.failed)})")
+        return outcome
+
+    def _collect(self, outcome: FanoutResult, name: str, get_result: Callable[[], T]):
+        try:
+            outcome.results[name] = get_result()
+        except TimeoutError:
+            outcome.timed_out.append(name)
+        except Exception as e:
+            logger.warning(f"⚠️ {name} sorgu hatası: {e}")
+            outcome.failed[name] = str(e)
+
+    def _run_task(self, task: Callable[[Any], T], started: float) -> T:
+        remaining = self._deadline(started) - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError()
+
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                # Sorgu sunucu tarafında da kesilsin; süre dolan görev bağlantıyı bekletmez
+                cur.execute("SET LOCAL statement_timeout = %s", (max(1, int(remaining * 1000)),))
+                result = task(cur)
+                conn.commit()
+                return result
+            except Exception as e:
+                conn.rollback()
+                if getattr(e, 'pgcode', None) == '57014':  # query_canceled
+                    raise TimeoutError() from e
+                raise
+            finally:
+                cur.close()
+
+    def _deadline(self, started: float) -> float:
+        return started + self.table_timeout
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Süreç başına executor; fork edilen worker ebeveynin (ölü) thread'lerini kullanmaz"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='table-fanout')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'table_timeout_seconds': self.table_timeout,
+                'runs': self.runs,
+                'partial_runs': self.partial_runs,
+                'timeouts': self.timeouts,
+                'failures': self.failures
+            }
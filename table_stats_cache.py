@@ -0,0 +1,294 @@
+# table_stats_cache.py
+import re
+import threading
+import time
+import os
+import logging
+from typing import Callable, Dict, Any, Optional
+
+from partitioned_storage import PRODUCTS_TABLE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATS_BACKEND_MEMORY = 'memory'
+STATS_BACKEND_MATERIALIZED_VIEW = 'materialized_view'
+STATS_BACKENDS = (STATS_BACKEND_MEMORY, STATS_BACKEND_MATERIALIZED_VIEW)
+
+# Fiyat yüzdelikleri (percentile_cont)
+PRICE_PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+# PostgreSQL lower(): tr_* yerellerinde I -> ı, İ -> i; diğerlerinde İ -> i (Python 'i̇' üretir)
+_TURKISH_CASE = str.maketrans({'I': 'ı', 'İ': 'i'})
+_DEFAULT_CASE = str.maketrans({'İ': 'i'})
+
+
+def fold_case(text: str, turkish_case: bool = False) -> str:
+    """Metni veritabanının LC_CTYPE'ına göre küçült (ILIKE karşılaştırması)"""
+    return text.translate(_TURKISH_CASE if turkish_case else _DEFAULT_CASE).lower()
+
+
+def ilike_matcher(pattern: str, turkish_case: bool = False) -> Callable[[str], bool]:
+    """
+    PostgreSQL `ILIKE pattern` eşleştiricisi
+
+    % herhangi bir dizi, _ tek karakter ile eşleşir, \\ sonraki karakteri kaçışlar;
+    harfler fold_case ile küçültülür.
+    """
+    regex = []
+    chars = iter(fold_case(pattern, turkish_case))
+    for char in chars:
+        if char == '\\':
+            regex.append(re.escape(next(chars, char)))
+        elif char == '%':
+            regex.append('.*')
+        elif char == '_':
+            regex.append('.')
+        else:
+            regex.append(re.escape(char))
+    compiled = re.compile(''.join(regex), re.DOTALL)
+    return lambda text: compiled.fullmatch(fold_case(text, turkish_case)) is not None
+
+
+class TableStatsCache:
+    """
+    Kaynak tablo başına fiyat ve marka istatistikleri önbelleği
+
+    Risk skorlamasının ürün başına attığı AVG(price) ve `brand ILIKE '%marka%'` sayım
+    sorguları yerine tablo başına bir kez yüklenen istatistikler kullanılır.
+
+    Geçersiz kılma:
+    - TTL dolunca (TABLE_STATS_TTL_SECONDS)
+    - Tablo değişince: pg_stat_user_tables ekleme/güncelleme/silme sayaçları en fazla
+      TABLE_STATS_CHANGE_CHECK_SECONDS aralıkla kontrol edilir (birleşik tablolara
+      taşınmış kategoride view yerine products_<kategori> bölümünün sayaçları)
+    - invalidate() ile açıkça
+
+    materialized_view backend'inde istatistikler {tablo}_price_stats_mv ve
+    {tablo}_brand_stats_mv görünümlerinden okunur; değişiklikte REFRESH edilir.
+    """
+
+    def __init__(self, db_pool, ttl_seconds: Optional[float] = None, backend: Optional[str] = None,
+                 change_check_seconds: Optional[float] = None):
+        self.db_pool = db_pool
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('TABLE_STATS_TTL_SECONDS', '300'))
+        self.change_check_seconds = (change_check_seconds if change_check_seconds is not None
+                                     else float(os.getenv('TABLE_STATS_CHANGE_CHECK_SECONDS', '10')))
+        self.backend = backend or os.getenv('TABLE_STATS_BACKEND', STATS_BACKEND_MEMORY)
+        if self.backend not in STATS_BACKENDS:
+            raise ValueError(f"❌ Geçersiz istatistik backend'i: {self.backend} (seçenekler: {STATS_BACKENDS})")
+
+        self._lock = threading.RLock()
+        self._table_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source_table: str) -> Dict[str, Any]:
+        """
+        Tablonun istatistiklerini döndür; yoksa, süresi dolduysa ya da tablo değiştiyse yükle
+
+        Veritabanı sorguları kilit dışında yapılır; aynı tablo için eşzamanlı yüklemeler
+        tablo kilidiyle tek yüklemeye indirilir.
+        """
+        with self._lock:
+            entry = self._entries.get(source_table)
+            now = time.time()
+            fresh = entry is not None and now - entry['loaded_at'] < self.ttl_seconds
+            if fresh and now - entry['checked_at'] < self.change_check_seconds:
+                self.hits += 1
+                return entry
+            if fresh:
+                # Diğer thread'ler kontrol sürerken mevcut girdiyi kullanmaya devam etsin
+                entry['checked_at'] = now
+
+        if fresh:
+            if self._change_counter(source_table) == entry['change_counter']:
+                with self._lock:
+                    self.hits += 1
+                return entry
+            logger.info(f"🔄 {source_table} değişti, istatistikler yenileniyor")
+
+        with self._lock:
+            table_lock = self._table_locks.setdefault(source_table, threading.Lock())
+
+        with table_lock:
+            with self._lock:
+                current = self._entries.get(source_table)
+                if current is not None and current is not entry and time.time() - current['loaded_at'] < self.ttl_seconds:
+                    # Kilidi beklerken başka bir thread yükledi
+                    self.hits += 1
+                    return current
+                self.misses += 1
+
+            loaded = self._load(source_table)
+            with self._lock:
+                self._entries[source_table] = loaded
+            return loaded
+
+    def get_average_price(self, source_table: str):
+        """Sıfırdan büyük fiyatların ortalaması (yoksa None)"""
+        return self.get(source_table)['avg_price']
+
+    def brand_match_count(self, source_table: str, brand) -> int:
+        """
+        `brand ILIKE '%marka%'` sayımının önbellekten karşılığı
+
+        Marka sayıları üzerinde ILIKE ile aynı anlamda eşleşme yapılır: markadaki % ve _
+        joker karakterdir, harf küçültme veritabanının yereline (Türkçe I/İ) uyar. Sonuç
+        marka başına saklanır.
+        """
+        entry = self.get(source_table)
+        needle = str(brand)
+        with self._lock:
+            matches = entry['brand_matches']
+            if needle not in matches:
+                matcher = ilike_matcher(f"%{needle}%", entry.get('turkish_case', False))
+                matches[needle] = sum(count for name, count in entry['brand_counts'].items() if matcher(name))
+            return matches[needle]
+
+    def invalidate(self, source_table: Optional[str] = None):
+        """Bir tablonun (ya da hepsinin) istatistiklerini düşür"""
+        with self._lock:
+            if source_table is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(source_table, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Önbellek durumu"""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'tables': sorted(self._entries.keys()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _change_counter(self, source_table: str) -> Optional[int]:
+        """
+        Tablonun toplam ekleme+güncelleme+silme sayacı
+
+        View'ın istatistik satırı olmaz; taşınmış kategoride sayaçlar verinin durduğu
+        bölümden okunur.
+        """
+        try:
+            with self.db_pool.cursor() as cur:
+                cur.execute("""
+                    SELECT s.n_tup_ins + s.n_tup_upd + s.n_tup_del
+                    FROM pg_class c
+                    JOIN pg_stat_user_tables s
+                      ON s.relid = CASE WHEN c.relkind = 'v' THEN to_regclass(%s) ELSE c.oid END
+                    WHERE c.oid = to_regclass(%s)
+                """, (f"{PRODUCTS_TABLE}_{source_table}", source_table))
+                row = cur.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.warning(f"⚠️ {source_table} değişiklik sayacı okunamadı: {e}")
+            return None
+
+    def _load(self, source_table: str) -> Dict[str, Any]:
+        """İstatistikleri seçilen backend'den yükle"""
+        change_counter = self._change_counter(source_table)
+
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            if self.backend == STATS_BACKEND_MATERIALIZED_VIEW:
+                price_row, brand_rows = self._load_from_materialized_views(cur, source_table)
+            else:
+                price_row, brand_rows = self._load_from_table(cur, source_table)
+            turkish_case = self._turkish_case(cur)
+            conn.commit()
+            cur.close()
+
+        avg_price, min_price, max_price, percentiles = price_row if price_row else (None, None, None, None)
+        now = time.time()
+
+        entry = {
+            'avg_price': avg_price,
+            'min_price': min_price,
+            'max_price': max_price,
+            'price_percentiles': dict(zip(PRICE_PERCENTILES, percentiles or [])),
+            'brand_counts': {name: count for name, count in brand_rows},
+            'brand_matches': {},
+            'turkish_case': turkish_case,
+            'change_counter': change_counter,
+            'loaded_at': now,
+            'checked_at': now
+        }
+        logger.info(f"📊 {source_table} istatistikleri yüklendi ({len(entry['brand_counts'])} marka)")
+        return entry
+
+    @staticmethod
+    def _turkish_case(cur) -> bool:
+        """Veritabanı yereli Türkçe mi (ICU yereli varsa o, yoksa LC_CTYPE)"""
+        cur.execute("""
+            SELECT COALESCE(to_jsonb(d) ->> 'datlocale', to_jsonb(d) ->> 'daticulocale', d.datctype)
+            FROM pg_database d
+            WHERE d.datname = current_database()
+        """)
+        row = cur.fetchone()
+        return bool(row and row[0] and re.match(r'(?i)tr([_-]|$)|turkish', row[0]))
+
+    def _load_from_table(self, cur, source_table: str):
+        """Kaynak tablodan doğrudan topla"""
+        cur.execute(f"""
+            SELECT
+                AVG(price),
+                MIN(price),
+                MAX(price),
+                percentile_cont(%s::float8[]) WITHIN GROUP (ORDER BY price)
+            FROM {source_table}
+            WHERE price > 0
+        """, (list(PRICE_PERCENTILES),))
+        price_row = cur.fetchone()
+
+        cur.execute(f"""
+            SELECT brand, COUNT(*)
+            FROM {source_table}
+            WHERE brand IS NOT NULL
+            GROUP BY brand
+        """)
+        return price_row, cur.fetchall()
+
+    def _load_from_materialized_views(self, cur, source_table: str):
+        """Materialized view'lardan oku; ilk kullanımda oluştur, değişiklikte yenile"""
+        price_view = f"{source_table}_price_stats_mv"
+        brand_view = f"{source_table}_brand_stats_mv"
+
+        cur.execute("SELECT to_regclass(%s), to_regclass(%s)", (price_view, brand_view))
+        price_exists, brand_exists = cur.fetchone()
+
+        if price_exists is None:
+            cur.execute(f"""
+                CREATE MATERIALIZED VIEW {price_view} AS
+                SELECT
+                    1 AS id,
+                    AVG(price) AS avg_price,
+                    MIN(price) AS min_price,
+                    MAX(price) AS max_price,
+                    percentile_cont(ARRAY{list(PRICE_PERCENTILES)}::float8[]) WITHIN GROUP (ORDER BY price) AS percentiles
+                FROM {source_table}
+                WHERE price > 0
+            """)
+            # REFRESH ... CONCURRENTLY tekil indeks ister
+            cur.execute(f"CREATE UNIQUE INDEX ON {price_view} (id)")
+        if brand_exists is None:
+            cur.execute(f"""
+                CREATE MATERIALIZED VIEW {brand_view} AS
+                SELECT brand, COUNT(*) AS product_count
+                FROM {source_table}
+                WHERE brand IS NOT NULL
+                GROUP BY brand
+            """)
+            cur.execute(f"CREATE UNIQUE INDEX ON {brand_view} (brand)")
+
+        if price_exists is not None and brand_exists is not None:
+            # Önbellek geçersiz kılındıysa görünümler de eskidir
+            cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {price_view}")
+            cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {brand_view}")
+
+        cur.execute(f"SELECT avg_price, min_price, max_price, percentiles FROM {price_view}")
+        price_row = cur.fetchone()
+        cur.execute(f"SELECT brand, product_count FROM {brand_view}")
+        return price_row, cur.fetchall()
@@ -95,6 +95,612 @@ class TestSystem(unittest.TestCase):
         for table, data in stats.items():
             print(f"   - {table}: {data['total_products']} ürün")
 
+class TestRiskEngine(unittest.TestCase):
+    """Vektörel risk motoru skaler yol ile aynı sonucu vermeli (veritabanı gerektirmez)"""
+    
+    def test_batch_matches_scalar(self):
+        from decimal import Decimal
+        import numpy as np
+        from rag_service import RAGService
+        from risk_engine import score_arrays, quick_risk_scores
+        
+        brand_counts = {'Samsung': 60, 'Arçelik': 25, 'LG': 12, 'Vestel': 3}
+        
+        def brand_match_count(brand):
+            needle = str(brand).lower()
+            return sum(count for name, count in brand_counts.items() if needle in name.lower())
+        
+        class StatsStub:
+            def get_average_price(self, source_table):
+                return Decimal('10000.00')
+            
+            def brand_match_count(self, source_table, brand):
+                return brand_match_count(brand)
+        
+        rag = RAGService.__new__(RAGService)
+        rag.stats_cache = StatsStub()
+        
+        rng = np.random.default_rng(42)
+        prices = [Decimal(str(round(p, 2))) for p in rng.uniform(100, 25000, 500)] + [None, Decimal('0')]
+        ratings = [Decimal(str(round(r, 2))) for r in rng.uniform(1, 5, 500)] + [Decimal('4.5'), None]
+        brands = list(rng.choice(list(brand_counts) + ['', None, 'Apple'], 502))
+        
+        scores = score_arrays(prices, ratings, brands, Decimal('10000.00'), brand_match_count)
+        quick = quick_risk_scores(prices, ratings)
+        
+        for i, (price, rating, brand) in enumerate(zip(prices, ratings, brands)):
+            product = rag._calculate_risk_metrics({'price': price, 'rating': rating, 'brand': brand}, 'test')
+            expected = product.get('risk_analysis')
+            
+            self.assertEqual(bool(scores['valid'][i]), expected is not None)
+            if expected is not None:
+                for key, value in expected.items():
+                    self.assertEqual(scores[key][i], value, f"{key} farklı (satır {i})")
+            
+            self.assertEqual(quick[i], rag._calculate_quick_risk_score(float(price or 0), float(rating or 0)))
+
+class TestEmbeddingStore(unittest.TestCase):
+    """Backfill'in model kaydı aramanın model kontrolünde görünmeli (veritabanı gerektirmez)"""
+    
+    class RegistryCursor:
+        """embedding_table_models sorgularını bellekte yanıtlayan cursor"""
+        
+        def __init__(self, foreign_vectors=False):
+            self.models = {}
+            self.foreign_vectors = foreign_vectors
+            self._result = []
+        
+        def execute(self, sql, params=()):
+            sql = ' '.join(sql.split())
+            if sql.startswith('INSERT INTO embedding_table_models'):
+                self.models[params[0]] = tuple(params[1:])
+                self._result = []
+            elif sql.startswith('SELECT to_regclass'):
+                self._result = [('embedding_table_models',)]
+            elif sql.startswith('SELECT table_name, model_name'):
+                self._result = [(name,) + model for name, model in self.models.items()]
+            elif sql.startswith('SELECT model_name, model_version'):
+                model = self.models.get(params[0])
+                self._result = [model[:2]] if model else []
+            elif sql.startswith('SELECT 1 FROM'):
+                self._result = [(1,)] if self.foreign_vectors else []
+            else:
+                self._result = []
+        
+        def fetchone(self):
+            return self._result[0] if self._result else None
+        
+        def fetchall(self):
+            return list(self._result)
+    
+    def _store(self, cursor, strict=True):
+        from contextlib import contextmanager
+        from embedding_store import EmbeddingStore
+        
+        class Pool:
+            @contextmanager
+            def cursor(self):
+                yield cursor
+        
+        return EmbeddingStore(Pool(), cache_seconds=0, strict=strict)
+    
+    def test_backfill_registration_is_checked_by_search(self):
+        from embedding_store import register_if_consistent, registered_table_model
+        
+        cursor = self.RegistryCursor()
+        # Backfill kaynak tablo adıyla kaydeder, arama embedding tablosu adıyla okur
+        self.assertTrue(register_if_consistent(cursor, 'telephone_products', 'model-a', '1', 384))
+        self.assertEqual(registered_table_model(cursor, 'telephone_embeddings'), ('model-a', '1'))
+        
+        store = self._store(cursor)
+        tables = ['telephone_embeddings', 'computer_embeddings']
+        self.assertEqual(store.compatible_tables(tables, 'model-a', '1'), ['telephone_embeddings'])
+        self.assertEqual(store.compatible_tables(tables, 'model-a', '2'), [])
+        self.assertEqual(store.compatible_tables(tables, 'model-b', '1'), [])
+        # Kayıtsız tablolar sadece strict kapalıyken aranır
+        self.assertEqual(self._store(cursor, strict=False).compatible_tables(tables, 'model-a', '1'), tables)
+    
+    def test_table_with_foreign_vectors_is_not_registered(self):
+        from embedding_store import register_if_consistent
+        
+        cursor = self.RegistryCursor(foreign_vectors=True)
+        self.assertFalse(register_if_consistent(cursor, 'klima_products', 'model-a', '1', 384))
+        self.assertEqual(self._store(cursor).compatible_tables(['klima_embeddings'], 'model-a', '1'), [])
+
+class TestVectorIndex(unittest.TestCase):
+    """Bellek içi vektör indeksi: upsert, tablo maskesi, aday filtresi, tek yükleme (veritabanı gerektirmez)"""
+    
+    class Pool:
+        """Tablo adı -> satırlar; _load_table'ın sunucu tarafı cursor okumasını taklit eder"""
+        
+        def __init__(self, tables, delay=0.0):
+            self.tables = tables
+            self.delay = delay
+            self.loads = 0
+        
+        def connection(self):
+            from contextlib import contextmanager
+            pool = self
+            
+            class Cursor:
+                def execute(self, sql, params=()):
+                    table_name = sql.split('FROM')[1].split()[0]
+                    rows = pool.tables.get(table_name, [])
+                    if params:
+                        rows = [row for row in rows if row[4] >= params[0]]
+                    self.rows = sorted(rows, key=lambda row: row[4])
+                
+                def fetchmany(self, size):
+                    batch, self.rows = self.rows[:size], self.rows[size:]
+                    return batch
+                
+                def close(self):
+                    pass
+            
+            class Connection:
+                def cursor(self, name=None):
+                    return Cursor()
+                
+                def commit(self):
+                    pass
+                
+                def rollback(self):
+                    pass
+            
+            @contextmanager
+            def checkout():
+                pool.loads += 1
+                time.sleep(pool.delay)
+                yield Connection()
+            
+            return checkout()
+    
+    @staticmethod
+    def row(product_id, vector, created_at=1):
+        import numpy as np
+        return (product_id, f"ürün {product_id}", f"metin {product_id}", np.asarray(vector, dtype=np.float32), created_at)
+    
+    def _index(self, pool):
+        from vector_index import VectorIndex
+        return VectorIndex(pool, dimension=3, full_reload_seconds=0)
+    
+    def test_search_ranks_and_filters_by_table(self):
+        pool = self.Pool({
+            'telephone_embeddings': [self.row('t1', [1, 0, 0]), self.row('t2', [0, 1, 0])],
+            'klima_embeddings': [self.row('k1', [0.9, 0.1, 0])],
+        })
+        index = self._index(pool)
+        self.assertEqual(index.warm_up(['telephone_embeddings', 'klima_embeddings']), 3)
+        
+        results = index.search([1, 0, 0], limit=2)
+        self.assertEqual([r['product_id'] for r in results], ['t1', 'k1'])
+        self.assertEqual(results[0]['source_table'], 'telephone')
+        self.assertAlmostEqual(results[0]['similarity'], 1.0, places=5)
+        
+        results = index.search([1, 0, 0], limit=5, table_names=['klima_embeddings'])
+        self.assertEqual([r['product_id'] for r in results], ['k1'])
+        self.assertEqual(index.search([1, 0, 0], table_names=['computer_embeddings']), [])
+        
+        results = index.search([1, 0, 0], limit=5, candidates=[('telephone_embeddings', 't2'), ('x', 'y')])
+        self.assertEqual(results, [])  # t2'nin benzerliği 0, min_similarity'yi geçmez
+        results = index.search([0, 1, 0], limit=5, candidates=[('telephone_embeddings', 't2')])
+        self.assertEqual([r['product_id'] for r in results], ['t2'])
+    
+    def test_refresh_upserts_changed_and_new_rows(self):
+        pool = self.Pool({'telephone_embeddings': [self.row('t1', [1, 0, 0], 1)]})
+        index = self._index(pool)
+        index.warm_up(['telephone_embeddings'])
+        
+        pool.tables['telephone_embeddings'] = [self.row('t1', [0, 0, 1], 2), self.row('t2', [0, 1, 0], 2)]
+        index.refresh(['telephone_embeddings'])
+        
+        self.assertEqual(index.size, 2)
+        self.assertEqual(index.search([0, 0, 1], limit=1)[0]['product_id'], 't1')
+        self.assertEqual(index.search([0, 1, 0], limit=1)[0]['product_id'], 't2')
+    
+    def test_cold_index_loads_once_under_concurrency(self):
+        import threading
+        
+        pool = self.Pool({'telephone_embeddings': [self.row('t1', [1, 0, 0])]}, delay=0.05)
+        index = self._index(pool)
+        threads = [threading.Thread(target=index.refresh_if_stale, args=(['telephone_embeddings'], 60))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(pool.loads, 1)
+        self.assertTrue(index.is_loaded)
+
+class TestTableFanout(unittest.TestCase):
+    """Tablo başına eşzamanlı sorgular: zaman aşımı ve kısmi sonuç (veritabanı gerektirmez)"""
+    
+    class Pool:
+        def connection(self):
+            from contextlib import contextmanager
+            
+            class Cursor:
+                def execute(self, sql, params=()):
+                    pass
+                
+                def close(self):
+                    pass
+            
+            class Connection:
+                def cursor(self):
+                    return Cursor()
+                
+                def commit(self):
+                    pass
+                
+                def rollback(self):
+                    pass
+            
+            @contextmanager
+            def checkout():
+                yield Connection()
+            
+            return checkout()
+    
+    class QueryCanceled(Exception):
+        pgcode = '57014'
+    
+    def _tasks(self):
+        def slow(cur):
+            time.sleep(2.0)
+            return 'slow'
+        
+        def broken(cur):
+            raise ValueError('bozuk tablo')
+        
+        def canceled(cur):
+            raise self.QueryCanceled()
+        
+        return {
+            'telephone': lambda cur: 'telephone',
+            'klima': lambda cur: 'klima',
+            'slow': slow,
+            'broken': broken,
+            'canceled': canceled,
+        }
+    
+    def test_concurrent_partial_results(self):
+        from table_fanout import TableFanout
+        
+        fanout = TableFanout(self.Pool(), max_workers=5, table_timeout=0.2)
+        started = time.monotonic()
+        outcome = fanout.run(self._tasks())
+        elapsed = time.monotonic() - started
+        fanout.shutdown()
+        
+        self.assertEqual(outcome.results, {'telephone': 'telephone', 'klima': 'klima'})
+        self.assertEqual(sorted(outcome.timed_out), ['canceled', 'slow'])
+        self.assertEqual(list(outcome.failed), ['broken'])
+        self.assertTrue(outcome.is_partial)
+        # En yavaş tablo beklenmez: süre sınırı + pay kadar
+        self.assertLess(elapsed, 0.2 + 1.0 + 0.4)
+        self.assertEqual(fanout.stats()['partial_runs'], 1)
+    
+    def test_sequential_mode_same_semantics(self):
+        from table_fanout import TableFanout
+        
+        tasks = self._tasks()
+        del tasks['slow']
+        outcome = TableFanout(self.Pool(), max_workers=1, table_timeout=0.2).run(tasks)
+        
+        self.assertEqual(outcome.results, {'telephone': 'telephone', 'klima': 'klima'})
+        self.assertEqual(outcome.timed_out, ['canceled'])
+        self.assertEqual(list(outcome.failed), ['broken'])
+    
+    def test_complete_run_is_not_partial(self):
+        from table_fanout import TableFanout
+        
+        outcome = TableFanout(self.Pool(), max_workers=4).run({'a': lambda cur: 1, 'b': lambda cur: 2})
+        self.assertEqual(outcome.results, {'a': 1, 'b': 2})
+        self.assertFalse(outcome.is_partial)
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    """Eşzamanlı sorguların mikro batch'lenmesi (model gerektirmez)"""
+    
+    @staticmethod
+    def encoder(calls, delay=0.0):
+        import numpy as np
+        
+        def encode_batch(texts):
+            calls.append(list(texts))
+            time.sleep(delay)
+            return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+        
+        return encode_batch
+    
+    def test_lone_request_does_not_wait_for_window(self):
+        from embedding_batcher import EmbeddingBatcher
+        
+        calls = []
+        batcher = EmbeddingBatcher(self.encoder(calls), max_batch_size=8, max_wait_ms=500)
+        started = time.perf_counter()
+        vector = batcher.encode('tek sorgu', timeout=5)
+        
+        self.assertLess(time.perf_counter() - started, 0.25)
+        self.assertEqual(vector[0], len('tek sorgu'))
+        self.assertEqual(batcher.stats()['immediate_batches'], 1)
+    
+    def test_concurrent_requests_are_coalesced(self):
+        import threading
+        from embedding_batcher import EmbeddingBatcher
+        
+        calls = []
+        batcher = EmbeddingBatcher(self.encoder(calls, delay=0.05), max_batch_size=16, max_wait_ms=20)
+        texts = [f"sorgu {'x' * i}" for i in range(12)] + ['sorgu ', 'sorgu ']
+        results = {}
+        
+        def worker(index, text):
+            results[index] = batcher.encode(text, timeout=5)
+        
+        threads = [threading.Thread(target=worker, args=(i, text)) for i, text in enumerate(texts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Her çağıran kendi metninin vektörünü alır
+        for index, text in enumerate(texts):
+            self.assertEqual(results[index][0], len(text))
+        self.assertLess(len(calls), len(texts))
+        # Aynı batch'teki tekrarlar bir kez encode edilir
+        for texts_in_call in calls:
+            self.assertEqual(len(texts_in_call), len(set(texts_in_call)))
+        self.assertEqual(batcher.stats()['requests'], len(texts))
+    
+    def test_encode_error_reaches_every_caller(self):
+        from embedding_batcher import EmbeddingBatcher
+        
+        def failing(texts):
+            raise RuntimeError('model hatası')
+        
+        batcher = EmbeddingBatcher(failing, max_wait_ms=0)
+        with self.assertRaises(RuntimeError):
+            batcher.encode('sorgu', timeout=5)
+
+class TestTableStatsCache(unittest.TestCase):
+    """Önbellekteki marka sayımı `brand ILIKE '%marka%'` ile aynı sonucu vermeli (veritabanı gerektirmez)"""
+    
+    def _cache(self, brand_counts, turkish_case):
+        from table_stats_cache import TableStatsCache
+        
+        cache = TableStatsCache(db_pool=None, ttl_seconds=3600, change_check_seconds=3600)
+        now = time.time()
+        cache._entries['klima'] = {
+            'avg_price': None, 'min_price': None, 'max_price': None, 'price_percentiles': {},
+            'brand_counts': brand_counts, 'brand_matches': {}, 'turkish_case': turkish_case,
+            'change_counter': None, 'loaded_at': now, 'checked_at': now
+        }
+        return cache
+    
+    def test_ilike_wildcards(self):
+        from table_stats_cache import ilike_matcher
+        
+        self.assertTrue(ilike_matcher('%samsung%')('SAMSUNG Electronics'))
+        self.assertTrue(ilike_matcher('%l_%')('LG'))
+        self.assertFalse(ilike_matcher('%l_%')('L'))
+        self.assertTrue(ilike_matcher('%a%k%')('Arçelik'))
+        # Kaçışlı joker karakter düz eşleşir
+        self.assertTrue(ilike_matcher('%100\\%%')('Pamuk 100% Kulaklık'))
+        self.assertFalse(ilike_matcher('%100\\%%')('1000 Kulaklık'))
+    
+    def test_turkish_case_folding(self):
+        from table_stats_cache import ilike_matcher
+        
+        # tr_TR: I -> ı, İ -> i
+        self.assertTrue(ilike_matcher('%ı%', turkish_case=True)('KLIMA'))
+        self.assertFalse(ilike_matcher('%i%', turkish_case=True)('KLIMA'))
+        self.assertTrue(ilike_matcher('%istanbul%', turkish_case=True)('İSTANBUL'))
+        # Diğer yereller: I -> i, İ -> i
+        self.assertTrue(ilike_matcher('%i%')('KLIMA'))
+        self.assertTrue(ilike_matcher('%istanbul%')('İSTANBUL'))
+    
+    def test_brand_match_count_uses_ilike_semantics(self):
+        brand_counts = {'Samsung': 60, 'SAMSUNG TR': 5, 'Arçelik': 25, 'LG': 12, 'ISI Klima': 4, 'A_B': 2, 'AxB': 3}
+        
+        cache = self._cache(brand_counts, turkish_case=False)
+        self.assertEqual(cache.brand_match_count('klima', 'samsung'), 65)
+        self.assertEqual(cache.brand_match_count('klima', 'isi'), 4)
+        # _ joker karakter: A_B ve AxB ikisi de eşleşir (ILIKE ile aynı)
+        self.assertEqual(cache.brand_match_count('klima', 'a_b'), 5)
+        self.assertEqual(cache.brand_match_count('klima', 'Vestel'), 0)
+        
+        # tr_TR'de 'ISI' -> 'ısı', 'isi' eşleşmez
+        self.assertEqual(self._cache(brand_counts, turkish_case=True).brand_match_count('klima', 'isi'), 0)
+        self.assertEqual(self._cache(brand_counts, turkish_case=True).brand_match_count('klima', 'ısı'), 4)
+
+class TestTopK(unittest.TestCase):
+    """Sınırlı top-k heap'i ve sıralı tablo sonuçlarının birleştirilmesi"""
+    
+    @staticmethod
+    def item(name, similarity):
+        return {'product_id': name, 'similarity': similarity}
+    
+    def test_keeps_best_k_in_descending_order(self):
+        from topk import TopK
+        
+        top = TopK(3)
+        for name, similarity in [('a', 0.2), ('b', 0.9), ('c', 0.5), ('d', 0.1), ('e', 0.7)]:
+            top.push(self.item(name, similarity))
+        
+        self.assertEqual([r['product_id'] for r in top.results()], ['b', 'e', 'c'])
+        self.assertEqual(len(top), 3)
+        self.assertEqual(top.threshold, 0.5)
+        self.assertFalse(top.push(self.item('f', 0.5)))  # Eşiği aşmayan girmez
+    
+    def test_ties_keep_first_seen(self):
+        from topk import TopK
+        
+        top = TopK(2)
+        top.extend([self.item('a', 0.5), self.item('b', 0.5), self.item('c', 0.5)])
+        self.assertEqual([r['product_id'] for r in top.results()], ['a', 'b'])
+    
+    def test_threshold_and_empty_limits(self):
+        from topk import TopK
+        
+        top = TopK(2)
+        self.assertIsNone(top.threshold)
+        top.push(self.item('a', 0.3))
+        self.assertIsNone(top.threshold)  # Heap dolmadan eşik yok
+        
+        empty = TopK(0)
+        self.assertFalse(empty.push(self.item('a', 1.0)))
+        self.assertEqual(empty.results(), [])
+    
+    def test_merge_top_k_matches_full_sort_and_is_lazy(self):
+        from topk import merge_top_k
+        
+        tables = {
+            'telephone': [self.item('t1', 0.95), self.item('t2', 0.6), self.item('t3', 0.1)],
+            'klima': [self.item('k1', 0.8), self.item('k2', 0.7)],
+            'computer': [],
+        }
+        consumed = []
+        
+        def tracked(name, items):
+            for item in items:
+                consumed.append(name)
+                yield item
+        
+        merged = merge_top_k([tracked(name, items) for name, items in tables.items()], 3)
+        
+        expected = sorted((item for items in tables.values() for item in items),
+                          key=lambda item: item['similarity'], reverse=True)[:3]
+        self.assertEqual(merged, expected)
+        # t3 hiç okunmaz (ilk 3'e girmesi mümkün değil)
+        self.assertLessEqual(consumed.count('telephone'), 2)
+        self.assertEqual(merge_top_k(tables.values(), 0), [])
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Sorgu embedding önbelleği: LRU, TTL, model sürümü ve SQLite disk katmanı"""
+    
+    class Clock:
+        """embedding_cache.time yerine geçen elle ilerletilen saat"""
+        def __init__(self):
+            self.now = 1000.0
+        
+        def time(self):
+            return self.now
+    
+    def setUp(self):
+        import tempfile
+        from unittest import mock
+        import embedding_cache
+        
+        self.clock = self.Clock()
+        patcher = mock.patch.object(embedding_cache, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.disk_path = os.path.join(tmp.name, 'query_embeddings.sqlite')
+    
+    @staticmethod
+    def vector(value):
+        import numpy as np
+        return np.full(4, value, dtype=np.float32)
+    
+    def disk_rows(self):
+        import sqlite3
+        from contextlib import closing
+        with closing(sqlite3.connect(self.disk_path)) as db:
+            return db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+    
+    def test_lru_eviction_and_hits(self):
+        from embedding_cache import EmbeddingCache
+        
+        cache = EmbeddingCache(max_size=2, ttl_seconds=60, disk_path='', model_version='v1')
+        cache.put('m', 'a', self.vector(1))
+        cache.put('m', 'b', self.vector(2))
+        self.assertIsNotNone(cache.get('m', 'a'))  # a en yeni kullanılan olur
+        cache.put('m', 'c', self.vector(3))        # b çıkarılır
+        
+        self.assertIsNone(cache.get('m', 'b'))
+        self.assertEqual(float(cache.get('m', 'a')[0]), 1.0)
+        self.assertEqual(float(cache.get('m', 'c')[0]), 3.0)
+        stats = cache.stats()
+        self.assertEqual((stats['size'], stats['hits'], stats['misses']), (2, 3, 1))
+        self.assertEqual(stats['hit_rate'], 0.75)
+    
+    def test_ttl_expiry(self):
+        from embedding_cache import EmbeddingCache
+        
+        cache = EmbeddingCache(max_size=8, ttl_seconds=10, disk_path='', model_version='v1')
+        cache.put('m', 'a', self.vector(1))
+        self.clock.now += 9
+        self.assertIsNotNone(cache.get('m', 'a'))
+        self.clock.now += 1
+        self.assertIsNone(cache.get('m', 'a'))
+        self.assertEqual(cache.stats()['size'], 0)
+    
+    def test_model_and_version_are_part_of_key(self):
+        from embedding_cache import EmbeddingCache
+        
+        cache = EmbeddingCache(max_size=8, ttl_seconds=60, disk_path=self.disk_path, model_version='v1')
+        cache.put('m', 'a', self.vector(1))
+        self.assertIsNone(cache.get('other-model', 'a'))
+        
+        # Model sürümü değişince eski disk satırları kullanılmaz
+        upgraded = EmbeddingCache(max_size=8, ttl_seconds=60, disk_path=self.disk_path, model_version='v2')
+        self.assertIsNone(upgraded.get('m', 'a'))
+    
+    def test_disk_tier_survives_restart(self):
+        from embedding_cache import EmbeddingCache
+        
+        EmbeddingCache(max_size=8, ttl_seconds=60, disk_path=self.disk_path,
+                       model_version='v1').put('m', 'a', self.vector(5))
+        
+        restarted = EmbeddingCache(max_size=8, ttl_seconds=60, disk_path=self.disk_path, model_version='v1')
+        self.assertEqual(float(restarted.get('m', 'a')[0]), 5.0)
+        self.assertIsNotNone(restarted.get('m', 'a'))  # İkinci okuma bellekten
+        self.assertEqual((restarted.disk_hits, restarted.hits), (1, 1))
+        
+        self.clock.now += 60
+        expired = EmbeddingCache(max_size=8, ttl_seconds=60, disk_path=self.disk_path, model_version='v1')
+        self.assertIsNone(expired.get('m', 'a'))
+    
+    def test_disk_prune_drops_expired_and_oldest_rows(self):
+        from embedding_cache import EmbeddingCache
+        
+        cache = EmbeddingCache(max_size=8, ttl_seconds=100, disk_path=self.disk_path,
+                               disk_max_rows=2, model_version='v1')
+        cache.DISK_PRUNE_EVERY = 3
+        
+        cache.put('m', 'stale', self.vector(0))
+        self.clock.now += 200
+        for i, text in enumerate(['a', 'b']):
+            self.clock.now += 1
+            cache.put('m', text, self.vector(i))
+        self.assertEqual(self.disk_rows(), 2)  # Süresi dolan satır temizlendi
+        
+        for text in ['c', 'd', 'e']:
+            self.clock.now += 1
+            cache.put('m', text, self.vector(9))
+        self.assertEqual(self.disk_rows(), 2)
+        
+        restarted = EmbeddingCache(max_size=8, ttl_seconds=100, disk_path=self.disk_path, model_version='v1')
+        self.assertIsNone(restarted.get('m', 'c'))
+        self.assertIsNotNone(restarted.get('m', 'd'))
+        self.assertIsNotNone(restarted.get('m', 'e'))
+    
+    def test_disabled_cache_and_query_normalization(self):
+        from embedding_cache import EmbeddingCache, normalize_query
+        
+        cache = EmbeddingCache(max_size=0, ttl_seconds=60, disk_path='', model_version='v1')
+        cache.put('m', 'a', self.vector(1))
+        self.assertIsNone(cache.get('m', 'a'))
+        self.assertEqual(cache.stats()['misses'], 0)
+        
+        self.assertEqual(normalize_query('  Samsung\tGalaxy \n S24 '), 'Samsung Galaxy S24')
+        self.assertEqual(normalize_query('u\u0308t\u00fc'), '\u00fct\u00fc')  # NFC: ayrışık ü birleşir
+        self.assertEqual(normalize_query('iPhone'), 'iPhone')  # Büyük/küçük harf korunur
+
 def run_tests():
     """Test suite'i çalıştır"""
     print("="*60)
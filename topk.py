@@ -0,0 +1,61 @@
+# topk.py
+import heapq
+import itertools
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class TopK:
+    """
+    En yüksek benzerlikli k sonucu tutan sınırlı min-heap
+
+    Bellek O(k): yeni sonuç sadece heap'teki en kötü sonuçtan iyiyse eklenir.
+    Eşit benzerliklerde önce gelen sonuç korunur (sıralı listedeki ile aynı).
+    """
+
+    def __init__(self, k: int, key: str = 'similarity'):
+        self.k = k
+        self.key = key
+        self._heap: List[tuple] = []
+        # Eşit skorlarda dict karşılaştırılmasın; önce gelen sonuç kalır
+        self._counter = itertools.count()
+
+    @property
+    def threshold(self) -> Optional[float]:
+        """Heap doluysa girebilmek için aşılması gereken skor"""
+        return self._heap[0][0] if len(self._heap) >= self.k else None
+
+    def push(self, item: Dict[str, Any]) -> bool:
+        """Sonucu ekle; top-k'ya girmediyse False"""
+        if self.k <= 0:
+            return False
+        score = item[self.key]
+        entry = (score, -next(self._counter), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def extend(self, items: Iterable[Dict[str, Any]]):
+        for item in items:
+            self.push(item)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def results(self) -> List[Dict[str, Any]]:
+        """Skora göre azalan sırada sonuçlar"""
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
+
+
+def merge_top_k(sorted_lists: Iterable[Iterable[Dict[str, Any]]], k: int,
+                key: str = 'similarity') -> List[Dict[str, Any]]:
+    """
+    Skora göre azalan sıralı tablo sonuçlarını tembel birleştir, ilk k sonucu döndür
+
+    Her listeden sadece ilk k'ya girecek kadar eleman okunur (heapq.merge + islice).
+    """
+    merged = heapq.merge(*sorted_lists, key=lambda item: item[key], reverse=True)
+    return list(itertools.islice(merged, max(k, 0)))
@@ -0,0 +1,337 @@
+# vector_index.py
+import numpy as np
+import threading
+import time
+import os
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Warm-up / refresh sırasında sunucu tarafı cursor'dan kaçar satır çekilecek
+FETCH_BATCH_SIZE = 5000
+
+
+def to_float32_vector(embedding_data) -> Optional[np.ndarray]:
+    """pgvector değerini (metin ya da dizi) float32 NumPy vektörüne çevir"""
+    if embedding_data is None:
+        return None
+    if isinstance(embedding_data, str):
+        # '[0.1,0.2,...]' formatı - eleman eleman Python float'ı üretmeden parse et
+        vector = np.fromstring(embedding_data.strip().strip('[]'), dtype=np.float32, sep=',')
+    else:
+        vector = np.asarray(embedding_data, dtype=np.float32)
+    return vector if vector.size else None
+
+
+class VectorIndex:
+    """
+    Bellekte tutulan vektör indeksi
+
+    Tüm *_embeddings tablolarını tek bir bitişik, önceden normalize edilmiş float32
+    matrise yükler. product_id, product_name, combined_text ve kaynak tablo bilgisi
+    matrisin satırlarıyla paralel dizilerde tutulur. Arama tek bir matris-vektör
+    çarpımı ve argpartition ile top-k seçimidir.
+
+    Yeni embedding'ler created_at üzerinden artımlı olarak eklenir. created_at
+    değişmeden güncellenen ya da silinen satırlar artımlı yenilemede görünmez; bunlar
+    için indeks VECTOR_INDEX_FULL_RELOAD_SECONDS aralıkla tamamen yeniden yüklenir.
+
+    Veritabanından okuma kilit dışında yapılır: tam yükleme ayrı bir indekse yapılıp
+    kilit altında yer değiştirilir, artımlı yenileme sadece parça yazarken kilitler.
+    Aramalar kilidi sadece anlık görüntü almak için tutar; yükleme sırasında ve
+    birbirlerini beklemez.
+    """
+
+    def __init__(self, db_pool, dimension: int = 384, full_reload_seconds: Optional[float] = None):
+        self.db_pool = db_pool
+        self.dimension = dimension
+        self.full_reload_seconds = (full_reload_seconds if full_reload_seconds is not None
+                                    else float(os.getenv('VECTOR_INDEX_FULL_RELOAD_SECONDS', '600')))
+        self._lock = threading.RLock()
+        # Aynı anda tek yükleme (arama kilidinden bağımsız)
+        self._load_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """İndeksi boşalt"""
+        self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+        self._size = 0
+        self._product_ids: List[Any] = []
+        self._product_names: List[Any] = []
+        self._combined_texts: List[Any] = []
+        self._tables: List[str] = []
+        # Satır başına tablo kodu; tablo filtresi tek np.isin ile uygulanır
+        self._table_codes = np.zeros(0, dtype=np.int32)
+        self._codes_by_table: Dict[str, int] = {}
+        # (tablo, product_id) -> matris satırı; upsert için
+        self._positions: Dict[Tuple[str, Any], int] = {}
+        # Tablo başına görülen en büyük created_at
+        self._watermarks: Dict[str, Any] = {}
+        self.last_refresh: Optional[float] = None
+        self.last_full_reload: Optional[float] = None
+
+    _STATE_FIELDS = ('_matrix', '_size', '_product_ids', '_product_names', '_combined_texts', '_tables',
+                     '_table_codes', '_codes_by_table', '_positions', '_watermarks',
+                     'last_refresh', 'last_full_reload')
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.last_refresh is not None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def warm_up(self, table_names: List[str]) -> int:
+        """Verilen tabloları sıfırdan yükle; yeni indeks hazır olunca eskisiyle değiştirilir"""
+        with self._load_lock:
+            return self._full_load(table_names)
+
+    def reload(self, table_names: List[str]) -> int:
+        """Tam yeniden yükleme (warm_up ile aynı)"""
+        return self.warm_up(table_names)
+
+    def refresh(self, table_names: List[str]) -> int:
+        """Sadece son yüklemeden sonra eklenen (created_at) embedding'leri ekle"""
+        with self._load_lock:
+            return self._incremental_load(table_names)
+
+    def refresh_if_stale(self, table_names: List[str], max_age_seconds: float) -> int:
+        """
+        İndeks yüklenmemişse ya da tam yükleme aralığı dolduysa yükle, eskiyse artımlı yenile
+
+        Aynı anda tek istek yükler: durum yükleme kilidi alındıktan sonra yeniden kontrol
+        edilir. İndeks yüklüyse diğer istekler beklemez, mevcut indeksle devam eder.
+        """
+        if not self._is_stale(max_age_seconds):
+            return 0
+        if not self._load_lock.acquire(blocking=not self.is_loaded):
+            return 0
+        try:
+            # Kilidi beklerken başka bir istek yüklemiş olabilir
+            if self._needs_full_reload():
+                return self._full_load(table_names)
+            if self._is_stale(max_age_seconds):
+                return self._incremental_load(table_names)
+            return 0
+        finally:
+            self._load_lock.release()
+
+    def _needs_full_reload(self) -> bool:
+        if not self.is_loaded:
+            return True
+        return self.full_reload_seconds > 0 and time.time() - self.last_full_reload >= self.full_reload_seconds
+
+    def _is_stale(self, max_age_seconds: float) -> bool:
+        return self._needs_full_reload() or time.time() - self.last_refresh >= max_age_seconds
+
+    def _full_load(self, table_names: List[str]) -> int:
+        """Yeni indekse yükle ve kilit altında yer değiştir (_load_lock tutulurken çağrılır)"""
+        fresh = VectorIndex(self.db_pool, self.dimension, self.full_reload_seconds)
+        loaded = fresh._load(table_names)
+        fresh.last_full_reload = fresh.last_refresh
+        with self._lock:
+            for field in self._STATE_FIELDS:
+                setattr(self, field, getattr(fresh, field))
+        logger.info(f"✅ Vektör indeksi yüklendi: {loaded} vektör, {len(table_names)} tablo")
+        return loaded
+
+    def _incremental_load(self, table_names: List[str]) -> int:
+        """Watermark'tan sonrasını ekle (_load_lock tutulurken çağrılır)"""
+        loaded = self._load(table_names)
+        if loaded:
+            logger.info(f"🔄 Vektör indeksine {loaded} yeni vektör eklendi")
+        return loaded
+
+    def _load(self, table_names: List[str]) -> int:
+        """Tabloları (watermark'tan itibaren) oku ve indekse yaz"""
+        loaded = 0
+        with self.db_pool.connection() as conn:
+            for table_name in table_names:
+                try:
+                    loaded += self._load_table(conn, table_name)
+                    conn.commit()
+                except Exception as e:
+                    logger.warning(f"⚠️ {table_name} indekse yüklenemedi: {e}")
+                    conn.rollback()
+                    continue
+
+        self.last_refresh = time.time()
+        return loaded
+
+    def _load_table(self, conn, table_name: str) -> int:
+        """Tek tabloyu sunucu tarafı cursor ile parça parça yükle; kilit sadece parça yazılırken tutulur"""
+        with self._lock:
+            watermark = self._watermarks.get(table_name)
+
+        # Aynı created_at'e sahip satırları kaçırmamak için >= kullanılır; tekrarlar upsert ile ezilir
+        where = "WHERE embedding IS NOT NULL"
+        params: Tuple = ()
+        if watermark is not None:
+            where += " AND created_at >= %s"
+            params = (watermark,)
+
+        cur = conn.cursor(name=f"vector_index_{int(time.time() * 1000)}")
+        cur.itersize = FETCH_BATCH_SIZE
+        cur.execute(f"""
+            SELECT product_id, product_name, combined_text, embedding, created_at
+            FROM {table_name}
+            {where}
+            ORDER BY created_at
+        """, params)
+
+        loaded = 0
+        while True:
+            rows = cur.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+
+            vectors = []
+            metadata = []
+            for product_id, product_name, combined_text, embedding, created_at in rows:
+                vector = to_float32_vector(embedding)
+                if vector is None or vector.shape[0] != self.dimension:
+                    continue
+                vectors.append(vector)
+                metadata.append((product_id, product_name, combined_text))
+                if created_at is not None and (watermark is None or created_at > watermark):
+                    watermark = created_at
+
+            if vectors:
+                with self._lock:
+                    self._upsert(table_name, np.vstack(vectors), metadata)
+                loaded += len(vectors)
+
+        cur.close()
+        if watermark is not None:
+            with self._lock:
+                self._watermarks[table_name] = watermark
+        return loaded
+
+    def _upsert(self, table_name: str, vectors: np.ndarray, metadata: List[Tuple[Any, Any, Any]]):
+        """Normalize edilmiş vektörleri matrise yaz; var olan ürünlerin satırını güncelle"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0  # Sıfır vektör sıfır olarak kalır (skor 0)
+        vectors = vectors / norms
+
+        new_rows = [i for i, (product_id, _, _) in enumerate(metadata)
+                    if (table_name, product_id) not in self._positions]
+        self._ensure_capacity(self._size + len(new_rows))
+        code = self._codes_by_table.setdefault(table_name, len(self._codes_by_table))
+
+        for i, (product_id, product_name, combined_text) in enumerate(metadata):
+            key = (table_name, product_id)
+            position = self._positions.get(key)
+            if position is None:
+                position = self._size
+                self._positions[key] = position
+                self._size += 1
+                self._product_ids.append(product_id)
+                self._product_names.append(product_name)
+                self._combined_texts.append(combined_text)
+                self._tables.append(table_name)
+                self._table_codes[position] = code
+            else:
+                self._product_names[position] = product_name
+                self._combined_texts[position] = combined_text
+            self._matrix[position] = vectors[i]
+
+    def _ensure_capacity(self, required: int):
+        """Matris kapasitesini gerekirse ikiye katlayarak büyüt"""
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+        new_capacity = max(required, capacity * 2, 1024)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        table_codes = np.zeros(new_capacity, dtype=np.int32)
+        table_codes[:self._size] = self._table_codes[:self._size]
+        self._table_codes = table_codes
+
+    def search(self, query_embedding, limit: int = 10, table_names: Optional[List[str]] = None,
+               min_similarity: float = 0.0,
+               candidates: Optional[List[Tuple[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Sorguya en yakın `limit` ürünü döndür
+
+        Args:
+            query_embedding: Sorgu vektörü
+            limit: Maksimum sonuç sayısı
+            table_names: Sadece bu embedding tablolarında ara (None ise hepsi)
+            min_similarity: Bu değerin altındaki sonuçları at
+            candidates: Sadece bu (embedding tablosu, product_id) çiftlerini puanla
+                (örn. SQL filtresini geçen ürünler)
+        """
+        query = to_float32_vector(query_embedding)
+        if query is None or query.shape[0] != self.dimension or limit <= 0:
+            return []
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        # Kilit altında sadece referanslar alınır; çarpım ve top-k seçimi kilit dışında
+        # yapılır (NumPy çarpım sırasında GIL'i bırakır, aramalar birbirini beklemez).
+        # Yükleme matrisi büyütürken yeni dizi ayırır, tam yükleme alanları yenileriyle
+        # değiştirir; anlık görüntüdeki ilk `size` satır geçerli kalır.
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return []
+            matrix = self._matrix
+            table_codes = self._table_codes
+            product_ids, product_names = self._product_ids, self._product_names
+            combined_texts, tables = self._combined_texts, self._tables
+            if candidates is not None:
+                rows = np.fromiter((self._positions[key] for key in set(candidates) if key in self._positions),
+                                   dtype=np.int64)
+                allowed_codes = None
+            else:
+                rows = None
+                allowed_codes = (None if table_names is None else
+                                 [self._codes_by_table[t] for t in table_names if t in self._codes_by_table])
+
+        if rows is not None:
+            # Sadece aday satırları puanla
+            if rows.size == 0:
+                return []
+            scores = matrix[rows] @ query
+        else:
+            scores = matrix[:size] @ query
+            if allowed_codes is not None:
+                mask = np.isin(table_codes[:size], allowed_codes)
+                scores = np.where(mask, scores, -np.inf)
+
+        k = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            position = int(rows[i]) if rows is not None else int(i)
+            similarity = float(scores[i])
+            if not similarity > min_similarity:
+                continue
+            results.append({
+                'product_id': product_ids[position],
+                'product_name': product_names[position],
+                'combined_text': combined_texts[position],
+                'similarity': similarity,
+                'source_table': tables[position].replace('_embeddings', '')
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """İndeks durumu"""
+        with self._lock:
+            return {
+                'vectors': self._size,
+                'capacity': int(self._matrix.shape[0]),
+                'memory_bytes': int(self._matrix.nbytes),
+                'tables': sorted(self._codes_by_table),
+                'last_refresh': self.last_refresh,
+                'last_full_reload': self.last_full_reload
+            }